@@ -0,0 +1,282 @@
+"""Нагрузочный тест HTTP API (valutatrade_hub.api.server).
+
+Запускает сервер в отдельном процессе на копии data/ во временном
+каталоге (или использует уже работающий, --url), затем --clients
+параллельных клиентов с keep-alive соединениями выполняют смесь
+операций buy / sell / portfolio / rate в течение --duration секунд.
+
+Отчёт: пропускная способность (запросов/с), ошибки и перцентили
+задержки p50 / p95 / p99 по каждой операции и в целом.
+
+    python benchmarks/api_load.py --clients 16 --duration 10
+    python benchmarks/api_load.py --url http://127.0.0.1:8000 --json out.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parent.parent
+SRC = ROOT / "src"
+SERVER_CODE = (
+    "import sys; from valutatrade_hub.api.server import main; sys.exit(main())"
+)
+DEFAULT_MIX = "buy=3,sell=2,portfolio=3,rate=2"
+CURRENCIES = ("EUR", "BTC", "ETH")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Перцентиль по методу ближайшего ранга (значения уже отсортированы)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _parse_mix(value: str) -> Dict[str, int]:
+    mix: Dict[str, int] = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = int(weight or 1)
+    unknown = set(mix) - {"buy", "sell", "portfolio", "rate"}
+    if unknown:
+        raise ValueError(f"Неизвестные операции в --mix: {', '.join(unknown)}")
+    return mix
+
+
+# сервер закрыл keep-alive соединение, пока оно простаивало
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+CONNECTION_ERROR_STATUS = 0  # статус в выборке: ответа нет
+
+
+class Client:
+    """Один клиент: собственный пользователь и keep-alive соединение."""
+
+    def __init__(self, host: str, port: int, name: str, seed: int) -> None:
+        self._conn = http.client.HTTPConnection(host, port, timeout=30)
+        self._name = name
+        self._rng = random.Random(seed)
+        self._token = ""
+        self._reused = False  # по соединению уже был запрос
+        self.samples: List[Tuple[str, float, int]] = []
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[int, Dict[str, Any]]:
+        headers = {"Content-Type": "application/json"}
+        if self._token:
+            headers["Authorization"] = f"Bearer {self._token}"
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        try:
+            return self._send(method, path, data, headers)
+        except STALE_CONNECTION_ERRORS:
+            if not self._reused:
+                raise
+            # сервер закрывает простаивающие соединения, если пул занят;
+            # запрос он не читал — повторяем по новому соединению
+            self._conn.close()
+            return self._send(method, path, data, headers)
+
+    def _send(
+        self,
+        method: str,
+        path: str,
+        data: Optional[bytes],
+        headers: Dict[str, str],
+    ) -> Tuple[int, Dict[str, Any]]:
+        self._reused = self._conn.sock is not None
+        self._conn.request(method, path, body=data, headers=headers)
+        response = self._conn.getresponse()
+        return response.status, json.loads(response.read() or b"{}")
+
+    def setup(self) -> None:
+        credentials = {"username": self._name, "password": "load-test"}
+        self.request("POST", "/register", credentials)
+        status, payload = self.request("POST", "/login", credentials)
+        if status != 200:
+            raise RuntimeError(f"login {self._name}: {status} {payload}")
+        self._token = payload["token"]
+        # стартовый остаток, чтобы продажи не упирались в нулевой баланс
+        for code in CURRENCIES:
+            self.request("POST", "/buy", {"currency": code, "amount": 1000})
+
+    def run(self, ops: List[str], weights: List[int], deadline: float) -> None:
+        while time.perf_counter() < deadline:
+            op = self._rng.choices(ops, weights)[0]
+            code = self._rng.choice(CURRENCIES)
+            started = time.perf_counter()
+            try:
+                if op in ("buy", "sell"):
+                    amount = round(self._rng.uniform(0.01, 1.0), 4)
+                    status, _ = self.request(
+                        "POST", f"/{op}", {"currency": code, "amount": amount}
+                    )
+                elif op == "portfolio":
+                    status, _ = self.request("GET", "/portfolio")
+                else:
+                    status, _ = self.request("GET", f"/rate?from={code}&to=USD")
+            except (OSError, http.client.HTTPException):
+                # отказ соединения — ошибка в отчёте, а не падение клиента
+                status = CONNECTION_ERROR_STATUS
+                self._conn.close()
+            self.samples.append((op, time.perf_counter() - started, status))
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def _start_server(workers: int, workdir: Path) -> Tuple[subprocess.Popen, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [str(SRC), env.get("PYTHONPATH", "")])
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-c", SERVER_CODE, "--port", "0", "--workers", str(workers)],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    line = proc.stdout.readline().strip() if proc.stdout else ""
+    if not line.startswith("Listening on "):
+        proc.kill()
+        raise RuntimeError("Сервер не запустился.")
+    return proc, line[len("Listening on "):]
+
+
+def _report(
+    samples: List[Tuple[str, float, int]],
+    elapsed: float,
+    clients: int,
+) -> Dict[str, Any]:
+    by_op: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for op, latency, status in samples:
+        by_op.setdefault(op, []).append(latency * 1000)
+        if status >= 400 or status == CONNECTION_ERROR_STATUS:
+            errors[op] = errors.get(op, 0) + 1
+    by_op["all"] = [latency * 1000 for _, latency, _ in samples]
+    errors["all"] = sum(errors.values())
+
+    result: Dict[str, Any] = {
+        "clients": clients,
+        "elapsed_s": round(elapsed, 3),
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "operations": {},
+    }
+    for op, values in by_op.items():
+        values.sort()
+        result["operations"][op] = {
+            "count": len(values),
+            "errors": errors.get(op, 0),
+            "p50_ms": round(percentile(values, 50), 3),
+            "p95_ms": round(percentile(values, 95), 3),
+            "p99_ms": round(percentile(values, 99), 3),
+            "max_ms": round(values[-1], 3) if values else 0.0,
+        }
+    return result
+
+
+def _print_report(result: Dict[str, Any]) -> None:
+    print(
+        f"Клиентов: {result['clients']}, запросов: {result['requests']} "
+        f"за {result['elapsed_s']:.1f} с -> {result['throughput_rps']:.1f} req/s"
+    )
+    print(f"{'операция':<10} {'кол-во':>8} {'ошибки':>7} "
+          f"{'p50 мс':>9} {'p95 мс':>9} {'p99 мс':>9} {'max мс':>9}")
+    for op, stats in result["operations"].items():
+        print(
+            f"{op:<10} {stats['count']:>8} {stats['errors']:>7} "
+            f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+            f"{stats['p99_ms']:>9.2f} {stats['max_ms']:>9.2f}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="адрес работающего сервера")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", dest="json_path", help="сохранить отчёт в файл")
+    options = parser.parse_args()
+    mix = _parse_mix(options.mix)
+
+    tmp = tempfile.TemporaryDirectory()
+    server: Optional[subprocess.Popen] = None
+    try:
+        url = options.url
+        if url is None:
+            workdir = Path(tmp.name)
+            if (ROOT / "data").is_dir():
+                shutil.copytree(ROOT / "data", workdir / "data")
+            server, url = _start_server(options.workers, workdir)
+        parts = urlsplit(url)
+        host, port = parts.hostname or "127.0.0.1", parts.port or 80
+
+        run_id = f"{os.getpid()}_{int(time.time())}"
+        clients = [
+            Client(host, port, f"load_{run_id}_{i}", options.seed + i)
+            for i in range(options.clients)
+        ]
+        for client in clients:
+            client.setup()
+
+        started = time.perf_counter()
+        deadline = started + options.duration
+        threads = [
+            threading.Thread(
+                target=client.run,
+                args=(list(mix), list(mix.values()), deadline),
+            )
+            for client in clients
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        for client in clients:
+            client.close()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        tmp.cleanup()
+
+    samples = [sample for client in clients for sample in client.samples]
+    result = _report(samples, elapsed, options.clients)
+    _print_report(result)
+    if options.json_path:
+        with open(options.json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
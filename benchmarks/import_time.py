@@ -0,0 +1,133 @@
+"""Замер времени старта CLI.
+
+1. `python -X importtime` для valutatrade_hub.cli.interface: суммарное
+   время импорта и самые «тяжёлые» модули.
+2. Полный запуск `get-rate` в batch-режиме против локального кеша курсов
+   (копия data/ во временном каталоге, сеть не нужна).
+
+Бюджет запуска считается сверх старта «голого» интерпретатора
+(`python -c pass`), чтобы результат не зависел от скорости машины. Он
+больше бюджета импорта: команда сама открывает хранилище курсов и пишет
+журнал действий, а это ещё ~30 мс сверх импорта.
+Скрипт завершается с кодом 1, если медиана превышает бюджет:
+
+    python benchmarks/import_time.py --import-budget-ms 60 --run-budget-ms 90
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+SRC = ROOT / "src"
+TARGET = "valutatrade_hub.cli.interface"
+RUN_CODE = f"import sys; from {TARGET} import main; sys.exit(main())"
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    # без записи байткода прогрев не наполняет __pycache__, и каждый замер
+    # включает компиляцию изменённых модулей
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [str(SRC), env.get("PYTHONPATH", "")])
+    )
+    return env
+
+
+def measure_import() -> Tuple[float, List[Tuple[float, float, str]]]:
+    """Суммарное время импорта TARGET (мс) и строки отчёта importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {TARGET}"],
+        env=_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows: List[Tuple[float, float, str]] = []
+    total = 0.0
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        module = name.strip()
+        rows.append((int(self_us) / 1000, int(cumulative_us) / 1000, module))
+        if module == TARGET:
+            total = int(cumulative_us) / 1000
+    return total, rows
+
+
+def measure_run(workdir: Path, script: str, code: str = RUN_CODE) -> float:
+    """Время полного запуска CLI (интерпретатор + импорт + команда), мс."""
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", code, "--script", "-"],
+        cwd=workdir,
+        env=_env(),
+        input=script,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return (time.perf_counter() - started) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--import-budget-ms", type=float, default=60.0)
+    parser.add_argument("--run-budget-ms", type=float, default=90.0)
+    parser.add_argument("--script", default="get-rate --from USD --to EUR\n")
+    options = parser.parse_args()
+
+    # первый прогон прогревает __pycache__ и в замер не входит
+    measure_import()
+    samples = [measure_import() for _ in range(options.repeat)]
+    import_ms = statistics.median(total for total, _ in samples)
+    _, rows = min(samples, key=lambda sample: sample[0])
+
+    print(f"Импорт {TARGET}: медиана {import_ms:.1f} мс "
+          f"(бюджет {options.import_budget_ms:.0f} мс)")
+    print(f"Самые тяжёлые модули (self / cumulative, мс), топ-{options.top}:")
+    heavy = sorted(rows, key=lambda row: row[0], reverse=True)
+    for self_ms, cumulative_ms, module in heavy[: options.top]:
+        print(f"  {self_ms:6.1f} / {cumulative_ms:6.1f}  {module}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        if (ROOT / "data").is_dir():
+            shutil.copytree(ROOT / "data", workdir / "data")
+        measure_run(workdir, options.script)
+        bare = [
+            measure_run(workdir, "", code="pass") for _ in range(options.repeat)
+        ]
+        runs = [measure_run(workdir, options.script) for _ in range(options.repeat)]
+    bare_ms = statistics.median(bare)
+    run_ms = statistics.median(runs) - bare_ms
+    print(f"Старт интерпретатора: медиана {bare_ms:.1f} мс")
+    print(f"Запуск CLI ({options.script.strip()!r}) сверх интерпретатора: "
+          f"медиана {run_ms:.1f} мс (бюджет {options.run_budget_ms:.0f} мс)")
+
+    failed = False
+    if import_ms > options.import_budget_ms:
+        print("ПРЕВЫШЕН бюджет импорта.")
+        failed = True
+    if run_ms > options.run_budget_ms:
+        print("ПРЕВЫШЕН бюджет запуска.")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Микробенчмарк накладных расходов @log_action и метрик.
+
+Сравнивает время вызова пустой функции: без декоратора, только
+MetricsRegistry.observe, и с @log_action (логгер на уровне WARNING,
+чтобы не мерить запись в файл). Работает во временном каталоге:
+metrics.json и logs/ рабочей копии не трогаются.
+
+    python benchmarks/log_action_overhead.py --calls 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from valutatrade_hub.decorators import log_action  # noqa: E402
+from valutatrade_hub.logging_config import configure_logging  # noqa: E402
+from valutatrade_hub.metrics import MetricsRegistry  # noqa: E402
+
+
+def _per_call_ns(func: Callable[[], object], calls: int, repeats: int) -> float:
+    """Лучшее из repeats время одного вызова, нс."""
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter_ns()
+        for _ in range(calls):
+            func()
+        best = min(best, (time.perf_counter_ns() - started) / calls)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        configure_logging().setLevel(logging.WARNING)
+        registry = MetricsRegistry()
+
+        def bare() -> None:
+            return None
+
+        def observe_only() -> None:
+            registry.observe("BENCH_OBSERVE", 0.0001)
+
+        @log_action("BENCH", verbose=False)
+        def decorated(user: object = None) -> None:
+            return None
+
+        results = [
+            ("без декоратора", _per_call_ns(bare, options.calls, options.repeats)),
+            (
+                "observe()",
+                _per_call_ns(observe_only, options.calls, options.repeats),
+            ),
+            (
+                "@log_action",
+                _per_call_ns(decorated, options.calls, options.repeats),
+            ),
+        ]
+        registry.reset()
+        os.chdir(ROOT)
+
+    baseline = results[0][1]
+    print(f"Вызовов: {options.calls} x {options.repeats} повторов (лучший)")
+    for name, ns in results:
+        print(f"{name:<16} {ns:>9.0f} нс/вызов  (+{ns - baseline:.0f} нс)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""Стресс-тест конкурентных сделок: параллельные сделки не теряют обновлений.
+
+В пустом временном каталоге регистрируются --users пользователей; на
+каждого запускается --threads-per-user потоков, каждый делает --trades
+пар «купить amount / продать amount/2». Все потоки (разных и одних и тех
+же пользователей) работают одновременно. В конце баланс каждого
+пользователя обязан равняться сумме успешно выполненных сделок; сделки,
+исчерпавшие повторы при конфликте версий, считаются отдельно.
+
+    python benchmarks/stress_locks.py --users 8 --threads-per-user 4 --trades 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from valutatrade_hub.core import usecases  # noqa: E402
+from valutatrade_hub.core.exceptions import PortfolioConflictError  # noqa: E402
+from valutatrade_hub.core.models import User  # noqa: E402
+from valutatrade_hub.core.utils import load_portfolio_for_user  # noqa: E402
+from valutatrade_hub.logging_config import configure_logging  # noqa: E402
+
+CURRENCY = "EUR"
+
+
+class Tally:
+    """Итог сделок по пользователям (общий для потоков)."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.balances: Dict[int, float] = {}
+        self.conflicts = 0
+        self.errors: List[str] = []
+
+    def applied(self, user_id: int, delta: float) -> None:
+        with self.lock:
+            self.balances[user_id] = self.balances.get(user_id, 0.0) + delta
+
+
+def _worker(
+    user: User,
+    trades: int,
+    amount: float,
+    barrier: threading.Barrier,
+    tally: Tally,
+) -> None:
+    barrier.wait()
+    steps = [
+        (usecases.buy_currency, amount, amount),
+        (usecases.sell_currency, amount / 2, -amount / 2),
+    ]
+    for _ in range(trades):
+        for trade, size, delta in steps:
+            try:
+                trade(user=user, currency_code=CURRENCY, amount=size)
+            except PortfolioConflictError:
+                with tally.lock:
+                    tally.conflicts += 1
+            except Exception as exc:  # прочие ошибки — провал теста
+                with tally.lock:
+                    tally.errors.append(f"{user.username}: {exc!r}")
+            else:
+                tally.applied(user.user_id, delta)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--threads-per-user", type=int, default=4)
+    parser.add_argument("--trades", type=int, default=50)
+    parser.add_argument("--amount", type=float, default=1.0)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # data/ и logs/ создаются относительно cwd
+        # журнал операций в консоль здесь только мешает
+        configure_logging().setLevel(logging.WARNING)
+
+        users = [
+            usecases.register_user(f"stress_{i}", "stress-pass")
+            for i in range(options.users)
+        ]
+        threads_total = options.users * options.threads_per_user
+        barrier = threading.Barrier(threads_total)
+        tally = Tally()
+        threads = [
+            threading.Thread(
+                target=_worker,
+                args=(user, options.trades, options.amount, barrier, tally),
+            )
+            for user in users
+            for _ in range(options.threads_per_user)
+        ]
+
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        lost = 0
+        for user in users:
+            expected = tally.balances.get(user.user_id, 0.0)
+            wallet = load_portfolio_for_user(user).wallets.get(CURRENCY)
+            balance = wallet.balance if wallet is not None else 0.0
+            if abs(balance - expected) > 1e-9:
+                lost += 1
+                print(f"  {user.username}: баланс {balance}, ожидалось {expected}")
+        os.chdir(ROOT)
+
+    operations = threads_total * options.trades * 2
+    print(
+        f"Потоков: {threads_total}, операций: {operations} за {elapsed:.2f} с "
+        f"({operations / elapsed:.0f} оп/с)"
+    )
+    print(f"Сделок, исчерпавших повторы при конфликте: {tally.conflicts}")
+    for error in tally.errors:
+        print(f"  ошибка: {error}")
+    if lost or tally.errors:
+        print(f"ПРОВАЛ: потеряны обновления у {lost} пользователей.")
+        return 1
+    print(f"OK: балансы всех {options.users} пользователей сходятся.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""Многопроцессный стресс-тест общего каталога данных.
+
+--writers процессов делают сделки (купить amount / продать amount/2) по
+всем --users пользователям вперемешку, одновременно --readers процессов
+читают портфели. Все работают с одним data/ во временном каталоге, как
+несколько воркеров в проде. Проверяется, что:
+
+- ни одно обновление не потеряно (итоговые балансы равны сумме
+  успешных сделок; исчерпавшие повторы при конфликте считаются отдельно);
+- читатели не блокируют друг друга (отчёт: чтений в секунду).
+
+    python benchmarks/stress_processes.py --writers 4 --readers 4 --trades 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+SRC = ROOT / "src"
+CURRENCY = "EUR"
+
+
+def _setup(workdir: str) -> None:
+    sys.path.insert(0, str(SRC))
+    os.chdir(workdir)
+    from valutatrade_hub.logging_config import configure_logging
+
+    configure_logging().setLevel(logging.WARNING)
+
+
+def _writer(
+    workdir: str,
+    index: int,
+    users: int,
+    trades: int,
+    amount: float,
+    start: Any,
+    results: Any,
+) -> None:
+    _setup(workdir)
+    from valutatrade_hub.core import usecases
+    from valutatrade_hub.core.exceptions import PortfolioConflictError
+    from valutatrade_hub.core.utils import load_users
+
+    by_id = {user.user_id: user for user in load_users()}
+    ids = sorted(by_id)[:users]
+    applied: Dict[int, float] = {}
+    conflicts = 0
+    steps = [
+        (usecases.buy_currency, amount, amount),
+        (usecases.sell_currency, amount / 2, -amount / 2),
+    ]
+    start.wait()
+    started = time.perf_counter()
+    for step in range(trades):
+        user = by_id[ids[(index + step) % len(ids)]]
+        for trade, size, delta in steps:
+            try:
+                trade(user=user, currency_code=CURRENCY, amount=size)
+            except PortfolioConflictError:
+                conflicts += 1
+            else:
+                applied[user.user_id] = applied.get(user.user_id, 0.0) + delta
+    elapsed = time.perf_counter() - started
+    results.put(("writer", trades * 2, elapsed, applied, conflicts))
+
+
+def _reader(workdir: str, start: Any, stop: Any, results: Any) -> None:
+    _setup(workdir)
+    from valutatrade_hub.core import usecases
+    from valutatrade_hub.core.utils import load_users
+
+    users = load_users()
+    start.wait()
+    started = time.perf_counter()
+    reads = 0
+    while not stop.is_set():
+        usecases.get_portfolio_summary(users[reads % len(users)])
+        reads += 1
+    results.put(("reader", reads, time.perf_counter() - started, {}, 0))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--trades", type=int, default=100)
+    parser.add_argument("--amount", type=float, default=1.0)
+    options = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory() as workdir:
+        _setup(workdir)
+        from valutatrade_hub.core import usecases
+        from valutatrade_hub.core.utils import load_portfolio_for_user
+
+        users = [
+            usecases.register_user(f"proc_{i}", "stress-pass")
+            for i in range(options.users)
+        ]
+        start, stop = ctx.Event(), ctx.Event()
+        results = ctx.Queue()
+        writers = [
+            ctx.Process(
+                target=_writer,
+                args=(
+                    workdir,
+                    index,
+                    options.users,
+                    options.trades,
+                    options.amount,
+                    start,
+                    results,
+                ),
+            )
+            for index in range(options.writers)
+        ]
+        readers = [
+            ctx.Process(target=_reader, args=(workdir, start, stop, results))
+            for _ in range(options.readers)
+        ]
+        for proc in writers + readers:
+            proc.start()
+
+        started = time.perf_counter()
+        start.set()
+        for proc in writers:
+            proc.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for proc in readers:
+            proc.join()
+
+        stats: Dict[str, List[Any]] = {"writer": [], "reader": []}
+        expected: Dict[int, float] = {user.user_id: 0.0 for user in users}
+        conflicts = 0
+        for _ in writers + readers:
+            kind, count, seconds, applied, proc_conflicts = results.get(timeout=60)
+            stats[kind].append((count, seconds))
+            conflicts += proc_conflicts
+            for user_id, delta in applied.items():
+                expected[user_id] += delta
+
+        lost = []
+        for user in users:
+            wallet = load_portfolio_for_user(user).wallets.get(CURRENCY)
+            balance = wallet.balance if wallet is not None else 0.0
+            if abs(balance - expected[user.user_id]) > 1e-6:
+                lost.append(f"{user.username}: {balance} != {expected[user.user_id]}")
+        os.chdir(ROOT)
+
+    failed = [p for p in writers + readers if p.exitcode != 0]
+    writes = sum(count for count, _ in stats["writer"])
+    reads = sum(count for count, _ in stats["reader"])
+    print(
+        f"Писатели: {options.writers} процессов, {writes} операций за "
+        f"{elapsed:.2f} с ({writes / elapsed:.0f} оп/с)"
+    )
+    print(
+        f"Читатели: {options.readers} процессов, {reads} чтений "
+        f"({reads / elapsed:.0f} чтений/с)"
+    )
+    print(f"Сделок, исчерпавших повторы при конфликте: {conflicts}")
+    for line in lost:
+        print(f"  потеряно: {line}")
+    if lost or failed:
+        print(f"ПРОВАЛ: расхождений {len(lost)}, упавших процессов {len(failed)}.")
+        return 1
+    print(f"OK: балансы всех {options.users} пользователей сходятся.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
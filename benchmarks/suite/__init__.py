@@ -0,0 +1,11 @@
+"""Бенчмарки use case'ов на синтетических данных.
+
+    python -m benchmarks.suite.generator --scale 100k      # только данные
+    python -m benchmarks.suite.runner --scale 1k           # прогон + JSON
+    python -m benchmarks.suite.load --processes 1,2,4,8    # трейдеры в процессах
+
+generator — N пользователей с M кошельками и K записей истории курсов;
+cases — замеряемые сценарии; runner — запуск каждого сценария в
+отдельном процессе на копии данных для каждого хранилища портфелей;
+load — смесь сделок и чтений из нескольких процессов со сверкой балансов.
+"""
@@ -0,0 +1,161 @@
+"""Замеряемые сценарии: подготовка и одна операция.
+
+Подготовка (загрузка пользователей, выбор выборки) не входит в замер.
+Каждый сценарий возвращает функцию op(i) — i-я операция прогона.
+Импортируются в рабочем процессе, уже после выбора хранилища портфелей
+и перехода в каталог с копией данных.
+"""
+
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List
+
+from .common import BENCH_PASSWORD
+from .generator import BASE_CURRENCY, HISTORY_DAYS, WALLET_CURRENCIES
+
+Operation = Callable[[int], Any]
+
+SAMPLE_USERS = 1_000  # из скольких пользователей выбираются участники
+TRADE_AMOUNT = 0.001
+
+
+def _sample_users(rng: random.Random) -> List[Any]:
+    from valutatrade_hub.core.utils import load_users
+
+    users = load_users()
+    return rng.sample(users, min(SAMPLE_USERS, len(users)))
+
+
+def _wallet_codes(user: Any) -> List[str]:
+    from valutatrade_hub.core.utils import load_portfolio_for_user
+
+    codes = sorted(load_portfolio_for_user(user).wallets)
+    return [code for code in codes if code != BASE_CURRENCY] or ["EUR"]
+
+
+def register_user(rng: random.Random) -> Operation:
+    from valutatrade_hub.core import usecases
+
+    prefix = f"bench{rng.getrandbits(32):08x}_"
+
+    def op(i: int) -> Any:
+        return usecases.register_user(f"{prefix}{i}", BENCH_PASSWORD)
+
+    return op
+
+
+def login_user(rng: random.Random) -> Operation:
+    from valutatrade_hub.core import usecases
+
+    names = [user.username for user in _sample_users(rng)]
+
+    def op(i: int) -> Any:
+        return usecases.login_user(names[i % len(names)], BENCH_PASSWORD)
+
+    return op
+
+
+def _trade(rng: random.Random, action: str) -> Operation:
+    from valutatrade_hub.core import usecases
+
+    users = _sample_users(rng)[:100]
+    plan = [(user, rng.choice(_wallet_codes(user))) for user in users]
+    trade = getattr(usecases, action)
+
+    def op(i: int) -> Any:
+        user, code = plan[i % len(plan)]
+        return trade(user, code, TRADE_AMOUNT)
+
+    return op
+
+
+def buy_currency(rng: random.Random) -> Operation:
+    return _trade(rng, "buy_currency")
+
+
+def sell_currency(rng: random.Random) -> Operation:
+    return _trade(rng, "sell_currency")
+
+
+def get_portfolio_summary(rng: random.Random) -> Operation:
+    from valutatrade_hub.core import usecases
+
+    users = _sample_users(rng)
+
+    def op(i: int) -> Any:
+        return usecases.get_portfolio_summary(users[i % len(users)], BASE_CURRENCY)
+
+    return op
+
+
+# ---- Parser Service: история курсов ----
+
+
+def _rates_storage() -> Any:
+    from valutatrade_hub.parser_service.config import ParserConfig
+    from valutatrade_hub.parser_service.storage import RatesStorage
+
+    return RatesStorage(ParserConfig.from_env())
+
+
+def get_rate_asof(rng: random.Random) -> Operation:
+    """Курс на случайный момент истории (прямые и кросс-курсы через USD)."""
+    from valutatrade_hub.core import utils
+
+    codes = [code for code in WALLET_CURRENCIES if code != BASE_CURRENCY]
+    now = datetime.now(timezone.utc)
+    plan = [
+        (
+            rng.choice(codes),
+            rng.choice(WALLET_CURRENCIES),
+            now - timedelta(days=rng.uniform(1, HISTORY_DAYS - 1)),
+        )
+        for _ in range(1_000)
+    ]
+
+    def op(i: int) -> Any:
+        from_code, to_code, moment = plan[i % len(plan)]
+        return utils.get_rate_asof(from_code, to_code, moment)
+
+    return op
+
+
+def load_history(rng: random.Random) -> Operation:
+    """Полное чтение истории (архив + сегменты)."""
+    storage = _rates_storage()
+
+    def op(i: int) -> Any:
+        return len(storage.load_history())
+
+    return op
+
+
+def build_history_index(rng: random.Random) -> Operation:
+    """Построение индекса истории с нуля (первый запрос процесса)."""
+    from valutatrade_hub.parser_service.history_index import HistoryIndex
+
+    storage = _rates_storage()
+
+    def op(i: int) -> Any:
+        return len(HistoryIndex.build(storage.iter_history()))
+
+    return op
+
+
+USE_CASES: Dict[str, Callable[[random.Random], Operation]] = {
+    "register_user": register_user,
+    "login_user": login_user,
+    "buy_currency": buy_currency,
+    "sell_currency": sell_currency,
+    "get_portfolio_summary": get_portfolio_summary,
+}
+
+PARSER_CASES: Dict[str, Callable[[random.Random], Operation]] = {
+    "get_rate_asof": get_rate_asof,
+    "load_history": load_history,
+    "build_history_index": build_history_index,
+}
+
+CASES = {**USE_CASES, **PARSER_CASES}
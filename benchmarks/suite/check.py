@@ -0,0 +1,245 @@
+"""Проверка производительности против сохранённого базового замера.
+
+Быстрый набор сценариев (use case'ы и история курсов на небольшом
+наборе данных) прогоняется --repeats раз, каждый раз в новом процессе.
+По каждой метрике берётся лучший результат повторов.
+
+Проверку проваливают только счётчики ввода-вывода на операцию (чтения,
+записи, байты, обращения к кешам): они не зависят от загрузки машины,
+сравниваются почти точно и ловят лишние перечитывания и перезаписи
+файлов. Время (ops_per_s, p95_ms) и память (peak_rss_kb) на общей
+машине гуляют на десятки процентов от прогона к прогону, поэтому они
+только показываются в отчёте ("gate": false в допуске).
+
+Допуски — в baseline.json: общие (tolerances) и для отдельного
+сценария (cases.<имя>.tolerances). Код выхода 1 при регрессии.
+
+    python -m benchmarks.suite.check                    # make bench-check
+    python -m benchmarks.suite.check --update-baseline  # make bench-baseline
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .common import ROOT
+from .generator import ensure_dataset
+from .runner import environment, run_case
+
+BASELINE_FILE = ROOT / "benchmarks" / "baseline.json"
+
+CHECK_DATASET = {"users": 1_000, "wallets": 3, "history": 20_000}
+# (хранилище портфелей, сценарий)
+CHECK_CASES: List[Tuple[str, str]] = [
+    ("journal", "login_user"),
+    ("journal", "buy_currency"),
+    ("journal", "sell_currency"),
+    ("journal", "get_portfolio_summary"),
+    ("snapshot", "buy_currency"),
+    ("snapshot", "get_portfolio_summary"),
+    ("journal", "get_rate_asof"),
+    ("journal", "load_history"),
+    ("journal", "build_history_index"),
+]
+
+# метрика -> (лучше "higher" | "lower", допуск: доля, абсолютный запас;
+# "gate": false — выход за допуск только отмечается в отчёте)
+DEFAULT_TOLERANCES: Dict[str, Dict[str, Any]] = {
+    "ops_per_s": {"better": "higher", "relative": 0.30, "gate": False},
+    "p95_ms": {"better": "lower", "relative": 0.50, "absolute": 0.05, "gate": False},
+    "peak_rss_kb": {
+        "better": "lower",
+        "relative": 0.15,
+        "absolute": 2048,
+        "gate": False,
+    },
+    "reads_per_op": {"better": "lower", "relative": 0.05, "absolute": 0.05},
+    "writes_per_op": {"better": "lower", "relative": 0.05, "absolute": 0.05},
+    "bytes_read_per_op": {"better": "lower", "relative": 0.10, "absolute": 64},
+    "bytes_written_per_op": {"better": "lower", "relative": 0.10, "absolute": 64},
+    "loads_per_op": {"better": "lower", "relative": 0.05, "absolute": 0.05},
+}
+
+
+def _best(runs: List[Dict[str, Any]], tolerances: Dict[str, Any]) -> Dict[str, float]:
+    """Лучшее значение каждой метрики среди повторов."""
+    best: Dict[str, float] = {}
+    for metric, rule in tolerances.items():
+        values = [run[metric] for run in runs if metric in run]
+        if values:
+            best[metric] = max(values) if rule["better"] == "higher" else min(values)
+    return best
+
+
+def _allowed(baseline: float, rule: Dict[str, Any]) -> float:
+    """Худшее допустимое значение метрики."""
+    margin = abs(baseline) * rule.get("relative", 0.0) + rule.get("absolute", 0.0)
+    return baseline - margin if rule["better"] == "higher" else baseline + margin
+
+
+def compare(
+    current: Dict[str, float],
+    baseline: Dict[str, float],
+    tolerances: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    """Строки сравнения по метрикам: значения, изменение, допуск, статус.
+
+    exceeded — метрика хуже допуска; regressed — и это проваливает
+    проверку (у метрик только для отчёта — никогда).
+    """
+    rows = []
+    for metric, rule in tolerances.items():
+        if metric not in baseline or metric not in current:
+            continue
+        base, value = baseline[metric], current[metric]
+        allowed = _allowed(base, rule)
+        if rule["better"] == "higher":
+            exceeded = value < allowed
+        else:
+            exceeded = value > allowed
+        rows.append(
+            {
+                "metric": metric,
+                "baseline": base,
+                "current": value,
+                "change": (value - base) / base if base else 0.0,
+                "allowed": allowed,
+                "exceeded": exceeded,
+                "regressed": exceeded and rule.get("gate", True),
+            }
+        )
+    return rows
+
+
+def _measure(
+    dataset: Path,
+    backend: str,
+    case: str,
+    options: argparse.Namespace,
+    runs: int,
+) -> List[Dict[str, Any]]:
+    results = [run_case(dataset, backend, case, options) for _ in range(runs)]
+    errors = [run["error"] for run in results if "error" in run]
+    if errors:
+        raise RuntimeError(f"{backend}/{case}: {errors[0]}")
+    return results
+
+
+def _format_value(value: float) -> str:
+    return f"{value:,.0f}" if abs(value) >= 1000 else f"{value:.3f}"
+
+
+def print_diff(name: str, rows: List[Dict[str, Any]]) -> None:
+    status = "РЕГРЕССИЯ" if any(row["regressed"] for row in rows) else "ok"
+    print(f"{name}: {status}")
+    for row in rows:
+        mark = ""
+        if row["regressed"]:
+            mark = "  <-- хуже допуска"
+        elif row["exceeded"]:
+            mark = "  (хуже допуска, только отчёт)"
+        print(
+            f"    {row['metric']:<22} {_format_value(row['baseline']):>12} -> "
+            f"{_format_value(row['current']):>12}  {row['change']:+8.1%}  "
+            f"(допустимо до {_format_value(row['allowed'])}){mark}"
+        )
+
+
+def load_baseline(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", default=str(BASELINE_FILE))
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--ops", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--max-seconds", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cases", help="только эти сценарии (хранилище/сценарий)")
+    return parser
+
+
+def main() -> int:
+    options = build_parser().parse_args()
+    baseline_path = Path(options.baseline)
+    baseline = load_baseline(baseline_path)
+    if baseline is None and not options.update_baseline:
+        print(
+            f"Нет базового замера {baseline_path}; создайте его: "
+            "make bench-baseline",
+            file=sys.stderr,
+        )
+        return 2
+
+    cases = CHECK_CASES
+    if options.cases:
+        wanted = {item.strip() for item in options.cases.split(",")}
+        cases = [case for case in CHECK_CASES if "/".join(case) in wanted]
+
+    dataset = ensure_dataset(seed=options.seed, **CHECK_DATASET)
+    default_tolerances = (baseline or {}).get("tolerances", DEFAULT_TOLERANCES)
+    # при --cases остальные сценарии базового замера сохраняются
+    results: Dict[str, Dict[str, Any]] = dict((baseline or {}).get("cases", {}))
+    regressions: List[str] = []
+
+    for backend, case in cases:
+        name = f"{backend}/{case}"
+        stored = (baseline or {}).get("cases", {}).get(name, {})
+        tolerances = {**default_tolerances, **stored.get("tolerances", {})}
+        try:
+            runs = _measure(dataset, backend, case, options, options.repeats)
+        except RuntimeError as exc:
+            print(f"{name}: ОШИБКА\n{exc}")
+            regressions.append(name)
+            continue
+        current = _best(runs, tolerances)
+
+        if options.update_baseline:
+            entry: Dict[str, Any] = {"metrics": current}
+            if "tolerances" in stored:
+                entry["tolerances"] = stored["tolerances"]
+            results[name] = entry
+            print(f"{name}: " + ", ".join(f"{k}={v}" for k, v in current.items()))
+            continue
+
+        if "metrics" not in stored:
+            print(f"{name}: нет в базовом замере, пропущен")
+            continue
+        rows = compare(current, stored["metrics"], tolerances)
+        print_diff(f"{name} ({len(runs)} прогонов)", rows)
+        if any(row["regressed"] for row in rows):
+            regressions.append(name)
+
+    if options.update_baseline:
+        report = {
+            "meta": {**environment(), **CHECK_DATASET, "ops": options.ops},
+            "tolerances": default_tolerances,
+            "cases": results,
+        }
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"Базовый замер сохранён: {baseline_path}")
+        return 1 if regressions else 0
+
+    if regressions:
+        print(f"\nРегрессии производительности: {', '.join(regressions)}")
+        return 1
+    print("\nРегрессий нет.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
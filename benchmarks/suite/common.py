@@ -0,0 +1,72 @@
+"""Общие пути и статистика для пакета бенчмарков."""
+
+from __future__ import annotations
+
+import json
+import os
+import resource
+import shutil
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+SRC = ROOT / "src"
+
+# масштабы наборов данных: пользователей и записей истории
+SCALES: Dict[str, int] = {
+    "1k": 1_000,
+    "100k": 100_000,
+    "1m": 1_000_000,
+}
+
+BENCH_PASSWORD = "bench-password"
+DATASET_MANIFEST = "dataset.json"
+
+
+def use_src() -> None:
+    """Импортировать valutatrade_hub из рабочей копии, а не установленный."""
+    if str(SRC) not in sys.path:
+        sys.path.insert(0, str(SRC))
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Перцентиль по методу ближайшего ранга (значения уже отсортированы)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def peak_rss_kb() -> int:
+    """Пиковый RSS текущего процесса, КиБ (ru_maxrss: Linux — КиБ, macOS — байты)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def copy_dataset(dataset: Path, workdir: Path) -> None:
+    """Файлы data/ копируются (их меняют сделки), подкаталоги — ссылки."""
+    source = dataset / "data"
+    target = workdir / "data"
+    target.mkdir(parents=True)
+    for entry in source.iterdir():
+        if entry.is_dir():
+            os.symlink(entry.resolve(), target / entry.name)
+        else:
+            shutil.copy2(entry, target / entry.name)
+
+
+def refresh_rates() -> None:
+    """Сдвинуть updated_at курсов на «сейчас», чтобы get_rate брал кеш."""
+    from valutatrade_hub.core.constants import RATES_FILE
+
+    with open(RATES_FILE, "r", encoding="utf-8") as f:
+        rates = json.load(f)
+    now = datetime.now(timezone.utc).isoformat()
+    for info in rates.values():
+        if isinstance(info, dict):
+            info["updated_at"] = now
+    rates["last_refresh"] = now
+    with open(RATES_FILE, "w", encoding="utf-8") as f:
+        json.dump(rates, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,268 @@
+"""Генератор синтетического набора данных для бенчмарков.
+
+В каталоге --out создаётся data/ в формате приложения: users.json
+(N пользователей, у всех пароль BENCH_PASSWORD), portfolios.json
+(M кошельков у каждого), rates.json и история курсов из K записей
+(сегменты через RatesStorage). Файлы пользователей и портфелей пишутся
+потоково, поэтому память не растёт с N. Параметры набора сохраняются
+в dataset.json рядом с data/.
+
+    python -m benchmarks.suite.generator --scale 100k --wallets 3
+    python -m benchmarks.suite.generator --users 5000 --history 20000 --out /tmp/ds
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from .common import BENCH_PASSWORD, DATASET_MANIFEST, SCALES, use_src
+
+# валюты реестра с курсами-заглушками к USD; USD — базовая валюта сделок
+BASE_CURRENCY = "USD"
+WALLET_CURRENCIES = ("EUR", "BTC", "ETH", "USD")
+HISTORY_DAYS = 365
+HISTORY_BATCH = 50_000  # записей истории за один вызов append_history_entries
+DATASET_FORMAT = 1      # увеличить, если меняется содержимое набора
+
+
+def default_dataset_dir(users: int, wallets: int, history: int) -> Path:
+    name = f"valutatrade-bench-u{users}-w{wallets}-h{history}"
+    return Path(tempfile.gettempdir()) / name
+
+
+def _write_json_array(path: Path, items: Iterator[Dict[str, Any]]) -> None:
+    """Записать JSON-массив по элементу (через временный файл)."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for index, item in enumerate(items):
+            f.write(",\n" if index else "\n")
+            f.write(json.dumps(item, ensure_ascii=False))
+        f.write("\n]\n")
+    os.replace(tmp_path, path)
+
+
+def _users(count: int, rng: random.Random, now: datetime) -> Iterator[Dict[str, Any]]:
+    for user_id in range(1, count + 1):
+        salt = "%016x" % rng.getrandbits(64)
+        hashed = hashlib.sha256((BENCH_PASSWORD + salt).encode("utf-8")).hexdigest()
+        yield {
+            "user_id": user_id,
+            "username": f"user{user_id}",
+            "hashed_password": hashed,
+            "salt": salt,
+            "registration_date": (now - timedelta(seconds=user_id)).isoformat(),
+        }
+
+
+def _portfolios(
+    count: int,
+    wallets: int,
+    rng: random.Random,
+) -> Iterator[Dict[str, Any]]:
+    for user_id in range(1, count + 1):
+        codes = rng.sample(WALLET_CURRENCIES, wallets)
+        yield {
+            "user_id": user_id,
+            "version": 1,
+            "wallets": {
+                # запас, чтобы продажи в бенчмарке не упирались в баланс
+                code: {"balance": round(rng.uniform(1_000, 10_000), 4)}
+                for code in codes
+            },
+        }
+
+
+def _rates(now: datetime) -> Dict[str, Any]:
+    from valutatrade_hub.core.constants import RATES_TO_USD
+
+    snapshot: Dict[str, Any] = {}
+    for code in WALLET_CURRENCIES:
+        if code == BASE_CURRENCY:
+            continue
+        snapshot[f"{code}_{BASE_CURRENCY}"] = {
+            "rate": RATES_TO_USD[code],
+            "updated_at": now.isoformat(),
+            "source": "Bench",
+        }
+    snapshot["last_refresh"] = now.isoformat()
+    return snapshot
+
+
+def _history(count: int, rng: random.Random, now: datetime) -> Iterator[Dict[str, Any]]:
+    """K записей по парам CODE_USD, равномерно за HISTORY_DAYS, по времени."""
+    from valutatrade_hub.core.constants import RATES_TO_USD
+
+    codes = [code for code in WALLET_CURRENCIES if code != BASE_CURRENCY]
+    rates = {code: RATES_TO_USD[code] for code in codes}
+    start = now - timedelta(days=HISTORY_DAYS)
+    step = timedelta(days=HISTORY_DAYS) / max(count, 1)
+    for index in range(count):
+        code = codes[index % len(codes)]
+        rates[code] *= 1 + rng.uniform(-0.002, 0.002)
+        ts = (start + step * index).isoformat()
+        yield {
+            "id": f"{code}_{BASE_CURRENCY}_{ts}",
+            "from_currency": code,
+            "to_currency": BASE_CURRENCY,
+            "rate": round(rates[code], 8),
+            "timestamp": ts,
+            "source": "Bench",
+            "meta": {},
+        }
+
+
+def generate(
+    out: Path,
+    users: int,
+    wallets: int,
+    history: int,
+    seed: int = 42,
+) -> Dict[str, Any]:
+    """Создать набор данных в out/data; вернуть его параметры."""
+    if not 1 <= wallets <= len(WALLET_CURRENCIES):
+        raise ValueError(f"--wallets: от 1 до {len(WALLET_CURRENCIES)}")
+    use_src()
+    out = Path(out).resolve()
+    out.mkdir(parents=True, exist_ok=True)
+    os.chdir(out)  # пути приложения (data/...) относительные
+
+    from valutatrade_hub.core.constants import (
+        HISTORY_DIR,
+        PORTFOLIOS_FILE,
+        RATES_FILE,
+        USERS_FILE,
+    )
+    from valutatrade_hub.parser_service.config import ParserConfig
+    from valutatrade_hub.parser_service.storage import RatesStorage
+
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    USERS_FILE.parent.mkdir(parents=True, exist_ok=True)
+
+    _write_json_array(USERS_FILE, _users(users, rng, now))
+    _write_json_array(PORTFOLIOS_FILE, _portfolios(users, wallets, rng))
+    with open(RATES_FILE, "w", encoding="utf-8") as f:
+        json.dump(_rates(now), f, ensure_ascii=False, indent=2)
+
+    if HISTORY_DIR.exists():
+        import shutil
+
+        shutil.rmtree(HISTORY_DIR)
+    storage = RatesStorage(ParserConfig.from_env())
+    batch: List[Dict[str, Any]] = []
+    for entry in _history(history, rng, now):
+        batch.append(entry)
+        if len(batch) >= HISTORY_BATCH:
+            storage.append_history_entries(batch)
+            batch = []
+    if batch:
+        storage.append_history_entries(batch)
+
+    manifest = {
+        "format": DATASET_FORMAT,
+        "users": users,
+        "wallets": wallets,
+        "history": history,
+        "seed": seed,
+        "password": BENCH_PASSWORD,
+        "created_at": now.isoformat(),
+        "generate_seconds": round(time.perf_counter() - started, 3),
+    }
+    with open(out / DATASET_MANIFEST, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def load_manifest(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(Path(path) / DATASET_MANIFEST, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def ensure_dataset(
+    users: int,
+    wallets: int,
+    history: int,
+    out: Optional[Path] = None,
+    seed: int = 42,
+) -> Path:
+    """Каталог с набором данных; генерируется, если его ещё нет."""
+    out = Path(out) if out else default_dataset_dir(users, wallets, history)
+    manifest = load_manifest(out)
+    expected = {
+        "format": DATASET_FORMAT,
+        "users": users,
+        "wallets": wallets,
+        "history": history,
+        "seed": seed,
+    }
+    if manifest is None or any(manifest.get(k) != v for k, v in expected.items()):
+        cwd = os.getcwd()
+        try:
+            generate(out, users, wallets, history, seed)
+        finally:
+            os.chdir(cwd)
+    return out
+
+
+def add_dataset_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--scale",
+        choices=sorted(SCALES),
+        default="1k",
+        help="пользователей и записей истории: 1k, 100k или 1m",
+    )
+    parser.add_argument("--users", type=int, help="N пользователей (вместо --scale)")
+    parser.add_argument("--wallets", type=int, default=3, help="M кошельков у каждого")
+    parser.add_argument(
+        "--history", type=int, help="K записей истории (вместо --scale)"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def dataset_size(options: argparse.Namespace) -> Dict[str, int]:
+    scale = SCALES[options.scale]
+    return {
+        "users": options.users or scale,
+        "wallets": options.wallets,
+        "history": options.history if options.history is not None else scale,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_dataset_arguments(parser)
+    parser.add_argument("--out", help="каталог набора (по умолчанию во временном)")
+    options = parser.parse_args()
+
+    size = dataset_size(options)
+    out = Path(options.out) if options.out else default_dataset_dir(**size)
+    try:
+        manifest = generate(out, seed=options.seed, **size)
+    except ValueError as exc:
+        print(f"Ошибка: {exc}", file=sys.stderr)
+        return 2
+    print(
+        f"Набор данных: {out} — пользователей {manifest['users']}, "
+        f"кошельков {manifest['wallets']}, записей истории {manifest['history']} "
+        f"({manifest['generate_seconds']:.1f} с)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,434 @@
+"""Нагрузочный генератор: одновременные трейдеры в нескольких процессах.
+
+Для каждого числа процессов из --processes (например, 1,2,4,8) на свежей
+копии набора данных запускаются рабочие процессы. Каждый входит под
+--traders синтетическими пользователями (login_user) и --duration секунд
+выполняет взвешенную смесь операций через слой use case'ов (--mix):
+buy, sell, show-portfolio, get-rate. Пользователи у всех процессов
+общие — чем их меньше, тем чаще конфликты версий портфеля.
+
+Итог по шагу: операций в секунду, повторы сделок из-за конфликтов версий
+портфеля (на одну сделку, по метрике TRADE_RETRY), доля конфликтов
+(сделки, исчерпавшие повторы) и ошибок, p50/p95/p99 по каждой операции.
+После шага итоговые балансы сверяются с ожидаемыми (начальный баланс
+плюс успешные сделки всех процессов) — расхождение означает потерянное
+обновление. По таблице шагов видно, с какого числа процессов хранилище
+перестаёт масштабироваться.
+
+    python -m benchmarks.suite.load --processes 1,2,4,8 --duration 10
+    python -m benchmarks.suite.load --backend snapshot --traders 5 \\
+        --mix buy=45,sell=45,show-portfolio=10 --json load.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import multiprocessing as mp
+import os
+import queue
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from .common import (
+    BENCH_PASSWORD,
+    ROOT,
+    copy_dataset,
+    percentile,
+    refresh_rates,
+    use_src,
+)
+from .generator import (
+    BASE_CURRENCY,
+    add_dataset_arguments,
+    dataset_size,
+    ensure_dataset,
+)
+from .runner import BACKENDS, STORAGE_ENV, environment, save_report
+
+OPERATIONS = ("buy", "sell", "show-portfolio", "get-rate")
+TRADES = ("buy", "sell")
+DEFAULT_MIX = "buy=30,sell=20,show-portfolio=35,get-rate=15"
+BALANCE_TOLERANCE = 1e-6
+
+# (имя, user_id, валюты сделок) — план пользователя, общий для процессов
+Trader = Tuple[str, int, List[str]]
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """«buy=30,sell=20,...» -> веса операций; неизвестные имена — ошибка."""
+    mix: Dict[str, float] = {}
+    for item in value.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(
+                f"Неизвестная операция '{name}'; доступны: {', '.join(OPERATIONS)}"
+            )
+        try:
+            mix[name] = float(weight)
+        except ValueError as exc:
+            raise ValueError(f"Вес операции '{name}' должен быть числом") from exc
+        if mix[name] < 0:
+            raise ValueError(f"Вес операции '{name}' не может быть отрицательным")
+    if not any(mix.values()):
+        raise ValueError("Сумма весов --mix должна быть положительной")
+    return mix
+
+
+def _setup(workdir: str, backend: str) -> None:
+    os.environ[STORAGE_ENV] = backend
+    use_src()
+    os.chdir(workdir)
+    from valutatrade_hub.logging_config import configure_logging
+
+    configure_logging().setLevel(logging.WARNING)
+
+
+# ---- рабочий процесс ----
+
+
+def _new_stats() -> Dict[str, Any]:
+    return {"latencies": [], "ok": 0, "conflicts": 0, "errors": {}}
+
+
+def _worker(
+    workdir: str,
+    backend: str,
+    index: int,
+    traders: List[Trader],
+    mix: Dict[str, float],
+    amount: float,
+    duration: float,
+    seed: int,
+    start: Any,
+    results: Any,
+) -> None:
+    _setup(workdir, backend)
+    from valutatrade_hub.core import usecases
+    from valutatrade_hub.core.exceptions import PortfolioConflictError
+    from valutatrade_hub.metrics import MetricsRegistry
+
+    rng = random.Random(seed * 1_000 + index)
+    users = [
+        (usecases.login_user(name, BENCH_PASSWORD), codes)
+        for name, _, codes in traders
+    ]
+    names, weights = list(mix), list(mix.values())
+    stats = {name: _new_stats() for name in names}
+    # успешные сделки процесса: "user_id:валюта" -> изменение баланса
+    ledger: Dict[str, float] = {}
+
+    start.wait()
+    started = time.perf_counter()
+    deadline = started + duration
+    while True:
+        name = rng.choices(names, weights)[0]
+        user, codes = rng.choice(users)
+        code = rng.choice(codes)
+        op_started = time.perf_counter()
+        try:
+            if name == "buy":
+                usecases.buy_currency(user, code, amount, BASE_CURRENCY)
+            elif name == "sell":
+                usecases.sell_currency(user, code, amount, BASE_CURRENCY)
+            elif name == "show-portfolio":
+                usecases.get_portfolio_summary(user, BASE_CURRENCY)
+            else:
+                usecases.get_rate_info(code, BASE_CURRENCY)
+        except PortfolioConflictError:
+            stats[name]["conflicts"] += 1
+        except Exception as exc:
+            errors = stats[name]["errors"]
+            kind = type(exc).__name__
+            errors[kind] = errors.get(kind, 0) + 1
+        else:
+            stats[name]["ok"] += 1
+            if name in TRADES:
+                key = f"{user.user_id}:{code}"
+                delta = amount if name == "buy" else -amount
+                ledger[key] = ledger.get(key, 0.0) + delta
+        finished = time.perf_counter()
+        stats[name]["latencies"].append(finished - op_started)
+        if finished >= deadline:
+            break
+    # счётчик повторов читает управляющий процесс из общего metrics.json
+    MetricsRegistry().flush()
+    results.put(
+        {
+            "index": index,
+            "seconds": time.perf_counter() - started,
+            "stats": stats,
+            "ledger": ledger,
+        }
+    )
+
+
+# ---- управляющий процесс ----
+
+
+def _traders(count: int, seed: int) -> List[Trader]:
+    """Выбрать count пользователей набора и валюты их сделок."""
+    from valutatrade_hub.core.utils import load_portfolio_for_user, load_users
+
+    users = load_users()
+    chosen = random.Random(seed).sample(users, min(count, len(users)))
+    traders = []
+    for user in chosen:
+        codes = sorted(load_portfolio_for_user(user).wallets)
+        codes = [code for code in codes if code != BASE_CURRENCY] or ["EUR"]
+        traders.append((user.username, user.user_id, codes))
+    return traders
+
+
+def _balances(traders: List[Trader]) -> Dict[str, float]:
+    from valutatrade_hub.core.utils import load_portfolio_for_user, load_users
+
+    by_id = {user.user_id: user for user in load_users()}
+    balances: Dict[str, float] = {}
+    for _, user_id, codes in traders:
+        wallets = load_portfolio_for_user(by_id[user_id]).wallets
+        for code in codes:
+            wallet = wallets.get(code)
+            balances[f"{user_id}:{code}"] = wallet.balance if wallet else 0.0
+    return balances
+
+
+def _retries() -> int:
+    """Сколько раз сделки повторялись из-за конфликта версий (все процессы)."""
+    from valutatrade_hub.core.constants import TRADE_RETRY_ACTION
+    from valutatrade_hub.infra.settings import SettingsLoader
+    from valutatrade_hub.metrics import load_histograms
+
+    path = Path(SettingsLoader().get("metrics_file")).resolve()
+    histogram = load_histograms(path).get(TRADE_RETRY_ACTION)
+    return histogram.ok if histogram is not None else 0
+
+
+def _summarize(name: str, stats: Dict[str, Any], seconds: float) -> Dict[str, Any]:
+    latencies = sorted(stats["latencies"])
+    count = len(latencies)
+    errors = sum(stats["errors"].values())
+    return {
+        "operation": name,
+        "ops": count,
+        "ops_per_s": round(count / seconds, 3) if seconds else 0.0,
+        "ok": stats["ok"],
+        "conflicts": stats["conflicts"],
+        "errors": errors,
+        "error_kinds": stats["errors"],
+        "conflict_rate": round(stats["conflicts"] / count, 6) if count else 0.0,
+        "error_rate": round(errors / count, 6) if count else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 4),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 4),
+        "max_ms": round(latencies[-1] * 1000, 4) if latencies else 0.0,
+    }
+
+
+def run_step(
+    dataset: Path,
+    processes: int,
+    mix: Dict[str, float],
+    options: argparse.Namespace,
+) -> Dict[str, Any]:
+    """Один шаг нагрузки: processes процессов на свежей копии данных."""
+    ctx = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="valutatrade-load-") as workdir:
+        copy_dataset(dataset, Path(workdir))
+        _setup(workdir, options.backend)
+        refresh_rates()
+        traders = _traders(options.traders, options.seed)
+        initial = _balances(traders)
+        retries_before = _retries()
+
+        start = ctx.Event()
+        results = ctx.Queue()
+        workers = [
+            ctx.Process(
+                target=_worker,
+                args=(
+                    workdir,
+                    options.backend,
+                    index,
+                    traders,
+                    mix,
+                    options.amount,
+                    options.duration,
+                    options.seed,
+                    start,
+                    results,
+                ),
+            )
+            for index in range(processes)
+        ]
+        for proc in workers:
+            proc.start()
+        started = time.perf_counter()
+        start.set()
+        # результаты забираются до join: большой объект в очереди
+        # не даст процессу завершиться, пока его не прочитают
+        reports = []
+        for _ in workers:
+            try:
+                reports.append(results.get(timeout=options.duration + 120))
+            except queue.Empty:
+                break
+        for proc in workers:
+            proc.join()
+        elapsed = time.perf_counter() - started
+
+        merged = {name: _new_stats() for name in mix}
+        expected = dict(initial)
+        for report in reports:
+            for name, stats in report["stats"].items():
+                target = merged[name]
+                target["latencies"].extend(stats["latencies"])
+                target["ok"] += stats["ok"]
+                target["conflicts"] += stats["conflicts"]
+                for kind, count in stats["errors"].items():
+                    target["errors"][kind] = target["errors"].get(kind, 0) + count
+            for key, delta in report["ledger"].items():
+                expected[key] = expected.get(key, 0.0) + delta
+
+        final = _balances(traders)
+        retries = _retries() - retries_before
+        mismatches = [
+            {"wallet": key, "expected": expected[key], "actual": final.get(key, 0.0)}
+            for key in sorted(expected)
+            if abs(final.get(key, 0.0) - expected[key]) > BALANCE_TOLERANCE
+        ]
+        os.chdir(ROOT)
+
+    operations = [_summarize(name, merged[name], elapsed) for name in mix]
+    total = sum(op["ops"] for op in operations)
+    conflicts = sum(op["conflicts"] for op in operations)
+    errors = sum(op["errors"] for op in operations)
+    trades = sum(op["ops"] for op in operations if op["operation"] in TRADES)
+    all_latencies = sorted(
+        latency for stats in merged.values() for latency in stats["latencies"]
+    )
+    return {
+        "processes": processes,
+        "seconds": round(elapsed, 3),
+        "ops": total,
+        "ops_per_s": round(total / elapsed, 3) if elapsed else 0.0,
+        "retries": retries,
+        "retries_per_trade": round(retries / trades, 6) if trades else 0.0,
+        "conflict_rate": round(conflicts / total, 6) if total else 0.0,
+        "error_rate": round(errors / total, 6) if total else 0.0,
+        "p50_ms": round(percentile(all_latencies, 50) * 1000, 4),
+        "p95_ms": round(percentile(all_latencies, 95) * 1000, 4),
+        "p99_ms": round(percentile(all_latencies, 99) * 1000, 4),
+        "operations": operations,
+        "wallets_checked": len(expected),
+        "lost_updates": mismatches,
+        "failed_processes": sum(1 for proc in workers if proc.exitcode != 0),
+    }
+
+
+def print_step(step: Dict[str, Any]) -> None:
+    ledger = "OK" if not step["lost_updates"] else f"{len(step['lost_updates'])} расх."
+    print(
+        f"{step['processes']:>9} {step['ops']:>8} {step['ops_per_s']:>9.1f} "
+        f"{step['retries_per_trade']:>8.3f} {step['conflict_rate']:>10.2%} "
+        f"{step['error_rate']:>8.2%} "
+        f"{step['p50_ms']:>8.2f} {step['p95_ms']:>8.2f} {step['p99_ms']:>8.2f} "
+        f"{ledger:>8}"
+    )
+    for op in step["operations"]:
+        kinds = ", ".join(f"{k}: {v}" for k, v in op["error_kinds"].items())
+        print(
+            f"{'':>9} {op['operation']:<16} {op['ops']:>8} "
+            f"конфликтов {op['conflicts']:<5} ошибок {op['errors']:<5} "
+            f"p95 {op['p95_ms']:.2f} мс" + (f" ({kinds})" if kinds else "")
+        )
+    for item in step["lost_updates"][:10]:
+        print(
+            f"{'':>9} потеряно: кошелёк {item['wallet']} — "
+            f"{item['actual']} вместо {item['expected']}"
+        )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_dataset_arguments(parser)
+    parser.add_argument("--dataset", help="готовый каталог набора данных")
+    parser.add_argument("--backend", choices=BACKENDS, default="journal")
+    parser.add_argument(
+        "--processes",
+        default="1,2,4",
+        help="числа рабочих процессов через запятую: шаги нагрузки",
+    )
+    parser.add_argument(
+        "--traders",
+        type=int,
+        default=20,
+        help="активных пользователей, общих для всех процессов",
+    )
+    parser.add_argument("--duration", type=float, default=5.0, help="секунд на шаг")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="веса операций")
+    parser.add_argument("--amount", type=float, default=0.001)
+    parser.add_argument("--json", dest="json_path", help="куда сохранить результаты")
+    return parser
+
+
+def main() -> int:
+    parser = build_parser()
+    options = parser.parse_args()
+    try:
+        mix = parse_mix(options.mix)
+        steps = [int(item) for item in options.processes.split(",") if item.strip()]
+    except ValueError as exc:
+        print(f"Ошибка: {exc}", file=sys.stderr)
+        return 2
+    if not steps or min(steps) < 1:
+        print("Ошибка: --processes — положительные числа", file=sys.stderr)
+        return 2
+
+    size = dataset_size(options)
+    if options.dataset:
+        dataset = Path(options.dataset).resolve()
+    else:
+        dataset = ensure_dataset(seed=options.seed, **size)
+    print(
+        f"Набор: {dataset}; хранилище {options.backend}, активных пользователей "
+        f"{options.traders}, смесь {options.mix}, {options.duration:g} с на шаг"
+    )
+    print(
+        f"{'процессов':>9} {'операций':>8} {'оп/с':>9} {'повторы':>8} "
+        f"{'конфликты':>10} "
+        f"{'ошибки':>8} {'p50 мс':>8} {'p95 мс':>8} {'p99 мс':>8} {'балансы':>8}"
+    )
+    results = []
+    for processes in steps:
+        step = run_step(dataset, processes, mix, options)
+        print_step(step)
+        results.append(step)
+
+    report = {
+        "meta": {
+            **environment(),
+            "dataset": str(dataset),
+            **size,
+            "backend": options.backend,
+            "traders": options.traders,
+            "mix": mix,
+            "amount": options.amount,
+            "duration": options.duration,
+        },
+        "steps": results,
+    }
+    target = save_report(report, options.json_path, prefix="load")
+    print(f"Результаты: {target}")
+    failed = any(
+        step["lost_updates"] or step["failed_processes"] for step in results
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
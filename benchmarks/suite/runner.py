@@ -0,0 +1,322 @@
+"""Прогон бенчмарков use case'ов: ops/s, перцентили задержки, пиковый RSS.
+
+Для каждого хранилища портфелей (--backends: snapshot, journal — через
+VALUTATRADE_PORTFOLIO_STORAGE) и каждого сценария (--cases) запускается
+отдельный процесс на свежей копии набора данных: сделки одного сценария
+не влияют на другой, а пиковый RSS относится к одному сценарию. Замер —
+--ops операций после --warmup прогревочных, но не дольше --max-seconds.
+Итог печатается таблицей и сохраняется в JSON (--json) для сравнения.
+
+    python -m benchmarks.suite.runner --scale 1k
+    python -m benchmarks.suite.runner --scale 100k --cases buy_currency,sell_currency \\
+        --backends journal --json results.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .common import (
+    ROOT,
+    copy_dataset,
+    peak_rss_kb,
+    percentile,
+    refresh_rates,
+    use_src,
+)
+from .generator import add_dataset_arguments, dataset_size, ensure_dataset
+
+BACKENDS = ("snapshot", "journal")
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+STORAGE_ENV = "VALUTATRADE_PORTFOLIO_STORAGE"
+
+
+# ---- рабочий процесс: один сценарий на одном хранилище ----
+
+
+IO_FIELDS = ("reads", "writes", "bytes_read", "bytes_written")
+
+
+def measure(
+    op: Any,
+    ops: int,
+    warmup: int,
+    max_seconds: float,
+    name: str = "bench",
+) -> Dict[str, Any]:
+    """Прогнать op(i): warmup раз без замера, затем до ops раз или max_seconds.
+
+    Прогрев тоже ограничен max_seconds: на больших наборах одна операция
+    может идти секунды. Каждая операция идёт в трассируемом запросе
+    (tracing.request): из его итогов берутся чтения и записи файлов,
+    байты и обращения к кешам (loads — попадания плюс промахи) на
+    операцию. В отличие от времени эти числа не шумят.
+    """
+    from valutatrade_hub.tracing import request
+
+    warmup_deadline = time.perf_counter() + max_seconds
+    for i in range(warmup):
+        op(i)
+        if time.perf_counter() >= warmup_deadline:
+            break
+    latencies: List[float] = []
+    io = dict.fromkeys(IO_FIELDS + ("loads",), 0)
+    started = time.perf_counter()
+    deadline = started + max_seconds
+    for i in range(warmup, warmup + ops):
+        op_started = time.perf_counter()
+        with request(name) as trace:
+            op(i)
+        finished = time.perf_counter()
+        latencies.append(finished - op_started)
+        if trace is not None:
+            totals = trace.totals
+            for field in IO_FIELDS:
+                io[field] += getattr(totals, field)
+            io["loads"] += totals.cache_hits + totals.cache_misses
+        if finished >= deadline:
+            break
+    total = time.perf_counter() - started
+    latencies.sort()
+    count = len(latencies)
+    return {
+        "ops": len(latencies),
+        "seconds": round(total, 6),
+        "ops_per_s": round(len(latencies) / total, 3) if total else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 4),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 4),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 4),
+        "max_ms": round(latencies[-1] * 1000, 4),
+        **{f"{field}_per_op": round(value / count, 3) for field, value in io.items()},
+    }
+
+
+def run_worker(options: argparse.Namespace) -> Dict[str, Any]:
+    os.environ[STORAGE_ENV] = options.backend
+    use_src()
+    with tempfile.TemporaryDirectory(prefix="valutatrade-bench-") as tmp:
+        copy_dataset(Path(options.dataset), Path(tmp))
+        os.chdir(tmp)
+        import logging
+
+        from valutatrade_hub.logging_config import configure_logging
+
+        from .cases import CASES
+
+        configure_logging().setLevel(logging.WARNING)
+        refresh_rates()
+        rss_start = peak_rss_kb()
+        op = CASES[options.case](random.Random(options.seed))
+        rss_setup = peak_rss_kb()
+        result = measure(
+            op, options.ops, options.warmup, options.max_seconds, options.case
+        )
+
+        from valutatrade_hub.metrics import MetricsRegistry
+
+        # метрики сбрасываются в data/ копии, пока она ещё существует
+        MetricsRegistry().flush()
+        os.chdir(ROOT)
+    return {
+        "backend": options.backend,
+        "case": options.case,
+        **result,
+        "rss_start_kb": rss_start,
+        "rss_setup_kb": rss_setup,
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+# ---- управляющий процесс ----
+
+
+def run_case(
+    dataset: Path,
+    backend: str,
+    case: str,
+    options: argparse.Namespace,
+) -> Dict[str, Any]:
+    """Запустить сценарий в отдельном процессе; вернуть его результат."""
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.suite.runner",
+        "--worker",
+        "--dataset", str(dataset),
+        "--backend", backend,
+        "--case", case,
+        "--ops", str(options.ops),
+        "--warmup", str(options.warmup),
+        "--max-seconds", str(options.max_seconds),
+        "--seed", str(options.seed),
+    ]
+    env = dict(os.environ)
+    env.pop(STORAGE_ENV, None)
+    proc = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        tail = (proc.stderr or proc.stdout).strip().splitlines()[-5:]
+        return {"backend": backend, "case": case, "error": "\n".join(tail)}
+    return json.loads(lines[-1])
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        proc = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return proc.stdout.strip() or None
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    header = (
+        f"{'хранилище':<10} {'сценарий':<22} {'ops':>6} {'ops/s':>10} "
+        f"{'p50 мс':>9} {'p95 мс':>9} {'p99 мс':>9} {'RSS МиБ':>8} "
+        f"{'чтений/оп':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        if "error" in row:
+            print(f"{row['backend']:<10} {row['case']:<22} ОШИБКА: {row['error']}")
+            continue
+        print(
+            f"{row['backend']:<10} {row['case']:<22} {row['ops']:>6} "
+            f"{row['ops_per_s']:>10.1f} {row['p50_ms']:>9.3f} "
+            f"{row['p95_ms']:>9.3f} {row['p99_ms']:>9.3f} "
+            f"{row['peak_rss_kb'] / 1024:>8.1f} {row['reads_per_op']:>9.2f}"
+        )
+
+
+def _split(value: str, allowed: Any, what: str) -> List[str]:
+    items = [item.strip() for item in value.split(",") if item.strip()]
+    unknown = [item for item in items if item not in allowed]
+    if unknown:
+        raise ValueError(f"Неизвестные {what}: {', '.join(unknown)}")
+    return items
+
+
+def build_parser() -> argparse.ArgumentParser:
+    from .cases import CASES, USE_CASES
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_dataset_arguments(parser)
+    parser.add_argument("--dataset", help="готовый каталог набора данных")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument(
+        "--cases",
+        default=",".join(USE_CASES),
+        help=f"через запятую; доступны: {', '.join(CASES)}",
+    )
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=10.0,
+        help="предел замера одного сценария (медленные сценарии на 1m)",
+    )
+    parser.add_argument("--json", dest="json_path", help="куда сохранить результаты")
+    # рабочий процесс (запускается самим runner)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    return parser
+
+
+def run_suite(options: argparse.Namespace) -> Dict[str, Any]:
+    """Сгенерировать (при необходимости) данные и прогнать все сценарии."""
+    from .cases import CASES
+
+    backends = _split(options.backends, BACKENDS, "хранилища")
+    cases = _split(options.cases, CASES, "сценарии")
+    size = dataset_size(options)
+    if options.dataset:
+        dataset = Path(options.dataset).resolve()
+    else:
+        dataset = ensure_dataset(seed=options.seed, **size)
+
+    meta = {
+        **environment(),
+        "dataset": str(dataset),
+        **size,
+        "ops": options.ops,
+        "warmup": options.warmup,
+        "max_seconds": options.max_seconds,
+    }
+    results = [
+        run_case(dataset, backend, case, options)
+        for backend in backends
+        for case in cases
+    ]
+    return {"meta": meta, "results": results}
+
+
+def save_report(
+    report: Dict[str, Any],
+    path: Optional[str],
+    prefix: str = "usecases",
+) -> Path:
+    if path:
+        target = Path(path)
+    else:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        target = RESULTS_DIR / f"{prefix}-{stamp}.json"
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with open(target, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return target
+
+
+def main() -> int:
+    options = build_parser().parse_args()
+    if options.worker:
+        print(json.dumps(run_worker(options), ensure_ascii=False))
+        return 0
+
+    try:
+        report = run_suite(options)
+    except ValueError as exc:
+        print(f"Ошибка: {exc}", file=sys.stderr)
+        return 2
+    meta = report["meta"]
+    print(
+        f"Набор: пользователей {meta['users']}, кошельков {meta['wallets']}, "
+        f"истории {meta['history']} ({meta['dataset']})"
+    )
+    print_table(report["results"])
+    target = save_report(report, options.json_path)
+    print(f"Результаты: {target}")
+    return 1 if any("error" in row for row in report["results"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
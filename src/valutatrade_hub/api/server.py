@@ -0,0 +1,400 @@
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import selectors
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from ..core import usecases
+from ..core.constants import (
+    API_HOST,
+    API_IDLE_POLL_SECONDS,
+    API_PORT,
+    API_WORKERS,
+    DEFAULT_BASE_CURRENCY,
+)
+from ..core.exceptions import (
+    ApiRequestError,
+    CurrencyNotFoundError,
+    IdempotencyKeyInUseError,
+    InsufficientFundsError,
+    PortfolioConflictError,
+    RateHistoryNotFoundError,
+)
+from ..core.models import User
+from ..core.utils import load_rates, load_users
+from ..logging_config import LOGGER_NAME, configure_logging
+from ..metrics import MetricsRegistry, render_prometheus
+from ..tracing import request as trace_request
+from .sessions import SessionStore
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class HttpError(Exception):
+    """Ошибка запроса с HTTP-статусом (отдаётся клиенту как JSON)."""
+
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        self.status = status
+        super().__init__(message)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Не сериализуется в JSON: {type(value).__name__}")
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    """JSON-эндпоинты над use case'ами core.
+
+    POST /register   {"username", "password"}
+    POST /login      {"username", "password"} -> {"token", ...}
+    POST /logout     (токен)
+    POST /buy        {"currency", "amount", "base"?} (токен)
+    POST /sell       {"currency", "amount", "base"?} (токен)
+    GET  /portfolio  ?base=USD (токен)
+    GET  /rate       ?from=USD&to=EUR[&at=ISO-дата]
+    GET  /health
+    GET  /metrics    текстовый формат Prometheus
+
+    Токен передаётся заголовком `Authorization: Bearer <token>`.
+    Для buy/sell можно передать заголовок `Idempotency-Key`: повтор
+    запроса с тем же ключом вернёт результат первой попытки.
+    """
+
+    server: "ApiServer"
+    protocol_version = "HTTP/1.1"  # keep-alive: одно соединение на клиента
+    timeout = 30                   # предел простоя keep-alive соединения
+    disable_nagle_algorithm = True  # заголовки и тело уходят без задержки ACK
+
+    ROUTES: Dict[Tuple[str, str], str] = {
+        ("POST", "/register"): "_register",
+        ("POST", "/login"): "_login",
+        ("POST", "/logout"): "_logout",
+        ("POST", "/buy"): "_buy",
+        ("POST", "/sell"): "_sell",
+        ("GET", "/portfolio"): "_portfolio",
+        ("GET", "/rate"): "_rate",
+        ("GET", "/health"): "_health",
+        ("GET", "/metrics"): "_metrics",
+    }
+
+    def handle(self) -> None:
+        """Запросы соединения по очереди, как BaseHTTPRequestHandler.handle.
+
+        Между запросами соединение ждёт следующий, только пока пул не
+        занят: если другие соединения ждут свободного потока, простаивающее
+        keep-alive соединение закрывается и поток переходит к ним.
+        """
+        self.handle_one_request()
+        while not self.close_connection:
+            if not self.server.wait_for_request(self.connection, self.timeout):
+                return
+            self.handle_one_request()
+
+    def do_GET(self) -> None:
+        self._handle("GET")
+
+    def do_POST(self) -> None:
+        self._handle("POST")
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("%s " + format, self.address_string(), *args)
+
+    # --- разбор запроса и ответ ---
+
+    def _handle(self, method: str) -> None:
+        parts = urlsplit(self.path)
+        self._query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        name = self.ROUTES.get((method, parts.path.rstrip("/") or "/"))
+
+        try:
+            body = self._read_body()
+            if name is None:
+                raise HttpError(HTTPStatus.NOT_FOUND, f"Нет маршрута {parts.path}")
+            with trace_request(f"{method} {parts.path}"):
+                status, payload = getattr(self, name)(body)
+        except HttpError as exc:
+            status, payload = exc.status, {"error": str(exc)}
+        except (PortfolioConflictError, IdempotencyKeyInUseError) as exc:
+            status, payload = HTTPStatus.CONFLICT, {"error": str(exc)}
+        except (CurrencyNotFoundError, RateHistoryNotFoundError) as exc:
+            status, payload = HTTPStatus.NOT_FOUND, {"error": str(exc)}
+        except (InsufficientFundsError, ValueError) as exc:
+            status, payload = HTTPStatus.BAD_REQUEST, {"error": str(exc)}
+        except ApiRequestError as exc:
+            status, payload = HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(exc)}
+        except Exception:
+            logger.exception("API %s %s failed", method, parts.path)
+            status = HTTPStatus.INTERNAL_SERVER_ERROR
+            payload = {"error": "Внутренняя ошибка сервера."}
+
+        if isinstance(payload, str):
+            self._send_text(status, payload)
+        else:
+            self._send_json(status, payload)
+
+    def _read_body(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Тело запроса — не JSON.") from exc
+        if not isinstance(body, dict):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Ожидается JSON-объект.")
+        return body
+
+    def _send_json(self, status: HTTPStatus, payload: Dict[str, Any]) -> None:
+        raw = json.dumps(payload, ensure_ascii=False, default=_json_default)
+        data = raw.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self._send_connection_header()
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_text(self, status: HTTPStatus, text: str) -> None:
+        data = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self._send_connection_header()
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_connection_header(self) -> None:
+        """Пул занят — закрыть соединение после ответа (клиент узнает об
+        этом из заголовка и откроет новое)."""
+        if self.server.has_waiting_connections():
+            self.send_header("Connection", "close")
+            self.close_connection = True
+
+    def _token(self) -> str:
+        header = self.headers.get("Authorization", "")
+        scheme, _, token = header.partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, "Нужен заголовок Bearer-токена.")
+        return token.strip()
+
+    def _require_user(self) -> User:
+        user = self.server.sessions.get(self._token())
+        if user is None:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, "Сессия не найдена или истекла.")
+        return user
+
+    @staticmethod
+    def _field(body: Dict[str, Any], name: str) -> Any:
+        value = body.get(name)
+        if value is None or value == "":
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"Не указано поле '{name}'.")
+        return value
+
+    def _amount(self, body: Dict[str, Any]) -> float:
+        try:
+            return float(self._field(body, "amount"))
+        except (TypeError, ValueError) as exc:
+            raise HttpError(
+                HTTPStatus.BAD_REQUEST, "'amount' должен быть числом."
+            ) from exc
+
+    # --- эндпоинты ---
+
+    def _register(self, body: Dict[str, Any]) -> Tuple[HTTPStatus, Dict[str, Any]]:
+        user = usecases.register_user(
+            username=str(self._field(body, "username")),
+            password=str(self._field(body, "password")),
+        )
+        return HTTPStatus.CREATED, user.get_user_info()
+
+    def _login(self, body: Dict[str, Any]) -> Tuple[HTTPStatus, Dict[str, Any]]:
+        user = usecases.login_user(
+            username=str(self._field(body, "username")),
+            password=str(self._field(body, "password")),
+        )
+        token, expires_at = self.server.sessions.create(user)
+        return HTTPStatus.OK, {
+            "token": token,
+            "expires_at": datetime.fromtimestamp(expires_at).isoformat(),
+            "user": user.get_user_info(),
+        }
+
+    def _logout(self, body: Dict[str, Any]) -> Tuple[HTTPStatus, Dict[str, Any]]:
+        self.server.sessions.revoke(self._token())
+        return HTTPStatus.OK, {"ok": True}
+
+    def _trade(
+        self,
+        body: Dict[str, Any],
+        trade: Callable[..., Dict[str, Any]],
+    ) -> Tuple[HTTPStatus, Dict[str, Any]]:
+        user = self._require_user()
+        currency = str(self._field(body, "currency"))
+        amount = self._amount(body)
+        base = str(body.get("base") or DEFAULT_BASE_CURRENCY)
+        # конфликты параллельных сделок разрешает use case (compare-and-swap)
+        return HTTPStatus.OK, trade(
+            user=user,
+            currency_code=currency,
+            amount=amount,
+            base_currency=base,
+            idempotency_key=self.headers.get("Idempotency-Key") or None,
+        )
+
+    def _buy(self, body: Dict[str, Any]) -> Tuple[HTTPStatus, Dict[str, Any]]:
+        return self._trade(body, usecases.buy_currency)
+
+    def _sell(self, body: Dict[str, Any]) -> Tuple[HTTPStatus, Dict[str, Any]]:
+        return self._trade(body, usecases.sell_currency)
+
+    def _portfolio(self, body: Dict[str, Any]) -> Tuple[HTTPStatus, Dict[str, Any]]:
+        user = self._require_user()
+        base = self._query.get("base") or DEFAULT_BASE_CURRENCY
+        return HTTPStatus.OK, usecases.get_portfolio_summary(
+            user=user,
+            base_currency=base,
+        )
+
+    def _rate(self, body: Dict[str, Any]) -> Tuple[HTTPStatus, Dict[str, Any]]:
+        from_code = self._field(self._query, "from")
+        to_code = self._field(self._query, "to")
+        at: Optional[datetime] = None
+        if self._query.get("at"):
+            try:
+                at = datetime.fromisoformat(self._query["at"].replace("Z", "+00:00"))
+            except ValueError as exc:
+                raise HttpError(
+                    HTTPStatus.BAD_REQUEST, "'at' — дата в формате ISO 8601."
+                ) from exc
+        return HTTPStatus.OK, usecases.get_rate_info(from_code, to_code, at=at)
+
+    def _health(self, body: Dict[str, Any]) -> Tuple[HTTPStatus, Dict[str, Any]]:
+        return HTTPStatus.OK, {"status": "ok", "sessions": len(self.server.sessions)}
+
+    def _metrics(self, body: Dict[str, Any]) -> Tuple[HTTPStatus, str]:
+        return HTTPStatus.OK, render_prometheus(MetricsRegistry().collect())
+
+
+class ApiServer(HTTPServer):
+    """HTTP-сервер с фиксированным пулом потоков.
+
+    В отличие от ThreadingHTTPServer не создаёт поток на каждое
+    соединение: число одновременно обслуживаемых соединений ограничено
+    workers, остальные ждут в очереди пула. Чтобы простаивающие
+    keep-alive соединения не занимали все потоки, пока новые ждут,
+    соединение, между запросами застающее очередь непустой,
+    закрывается (см. ApiRequestHandler.handle).
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        workers: int = API_WORKERS,
+        sessions: Optional[SessionStore] = None,
+    ) -> None:
+        super().__init__(address, ApiRequestHandler)
+        self.sessions = sessions or SessionStore()
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="api-worker",
+        )
+        self._waiting = 0  # соединений в очереди пула
+        self._waiting_lock = threading.Lock()
+
+    def warm_up(self) -> None:
+        """Прогреть кеши хранилища до первого запроса."""
+        load_users()
+        load_rates()
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        with self._waiting_lock:
+            self._waiting += 1
+        self._pool.submit(self._process_request, request, client_address)
+
+    def has_waiting_connections(self) -> bool:
+        return self._waiting > 0
+
+    def wait_for_request(self, connection: Any, timeout: float) -> bool:
+        """Дождаться данных следующего запроса на соединении.
+
+        False — соединение пора закрыть: истёк timeout или другие
+        соединения ждут свободного потока пула.
+        """
+        deadline = time.monotonic() + timeout
+        with selectors.DefaultSelector() as selector:
+            selector.register(connection, selectors.EVENT_READ)
+            while not self.has_waiting_connections():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                if selector.select(min(API_IDLE_POLL_SECONDS, remaining)):
+                    return True
+        return False
+
+    def _process_request(self, request: Any, client_address: Any) -> None:
+        with self._waiting_lock:
+            self._waiting -= 1
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="project-api",
+        description="HTTP JSON API ValutaTrade Hub.",
+    )
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=API_PORT,
+        help="порт (0 — выбрать свободный)",
+    )
+    parser.add_argument("--workers", type=int, default=API_WORKERS)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа HTTP API."""
+    options = _build_arg_parser().parse_args(argv)
+    configure_logging()
+
+    server = ApiServer((options.host, options.port), workers=options.workers)
+    server.warm_up()
+    host, port = server.server_address[:2]
+    # первая строка stdout — адрес; её читает benchmarks/api_load.py
+    print(f"Listening on http://{host}:{port}", flush=True)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
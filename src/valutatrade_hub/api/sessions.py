@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import secrets
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from ..core.constants import API_SESSION_TTL_SECONDS
+from ..core.models import User
+
+
+class SessionStore:
+    """Токены сессий HTTP API: token -> (пользователь, срок действия).
+
+    Хранятся в памяти процесса сервера; вход через login_user выдаёт
+    новый токен, каждый запрос с токеном продлевает сессию.
+    """
+
+    def __init__(self, ttl_seconds: int = API_SESSION_TTL_SECONDS) -> None:
+        self._ttl = ttl_seconds
+        self._sessions: Dict[str, Tuple[User, float]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, user: User) -> Tuple[str, float]:
+        """Выдать токен пользователю. Возвращает (token, expires_at)."""
+        token = secrets.token_urlsafe(32)
+        expires_at = time.time() + self._ttl
+        with self._lock:
+            self._sessions[token] = (user, expires_at)
+            self._purge_expired()
+        return token, expires_at
+
+    def get(self, token: str) -> Optional[User]:
+        """Пользователь по токену или None (нет такого / истёк)."""
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None:
+                return None
+            user, expires_at = session
+            if expires_at < now:
+                del self._sessions[token]
+                return None
+            self._sessions[token] = (user, now + self._ttl)
+        return user
+
+    def revoke(self, token: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(token, None) is not None
+
+    def _purge_expired(self) -> None:
+        now = time.time()
+        expired = [t for t, (_, exp) in self._sessions.items() if exp < now]
+        for token in expired:
+            del self._sessions[token]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
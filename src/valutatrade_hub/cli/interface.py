@@ -1,22 +1,44 @@
 from __future__ import annotations
 
+import argparse
+import heapq
+import json
+import os
 import shlex
-from typing import Dict, List, Optional
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, TextIO, Tuple
 
-from prettytable import PrettyTable
-
-from ..core.constants import DEFAULT_BASE_CURRENCY, CURRENCY_REGISTRY
+from ..core.constants import (
+    BULK_BATCH_SIZE,
+    BULK_FORMATS,
+    CURRENCY_REGISTRY,
+    DEFAULT_BASE_CURRENCY,
+    PROFILE_ENV,
+)
 from ..core.models import User
 from ..core import usecases
 from ..core.exceptions import (
     InsufficientFundsError,
     CurrencyNotFoundError,
+    BulkImportError,
     ApiRequestError,
+    RateHistoryNotFoundError,
 )
 
 from ..parser_service.config import ParserConfig
-from ..parser_service.updater import RatesUpdater
-from ..parser_service.storage import RatesStorage
+from ..logging_config import configure_logging
+from ..tracing import request as trace_request
+from .output import OUTPUT_FORMATS, read_rows, write_rows
+
+# prettytable, RatesUpdater (а с ним requests), RatesStorage и профайлер
+# импортируются там, где нужны: остальным командам они только удлиняют старт.
+if TYPE_CHECKING:
+    from ..parser_service.storage import RatesStorage
+    from ..profiling import Profiler
+
 
 def _parse_args(tokens: List[str]) -> Dict[str, str]:
     """Примитивный парсер флагов вида --key value."""
@@ -35,23 +57,92 @@ def _parse_args(tokens: List[str]) -> Dict[str, str]:
     return args
 
 
+def _compact_history(
+    storage: RatesStorage,
+    older_than: datetime,
+    action: str,
+) -> None:
+    """Сжатие истории в фоновом потоке: итог пишется в лог."""
+    logger = configure_logging()
+    try:
+        result = storage.compact_history(older_than, action=action)
+    except Exception as exc:  # поток не должен падать молча
+        logger.error("History compaction failed: %s", exc)
+        return
+    logger.info(
+        "History compaction finished: %s %d segments (%d entries).",
+        result["action"],
+        result["segments"],
+        result["entries"],
+    )
+
+
+def _output_format(args: Dict[str, str]) -> Optional[str]:
+    """Формат вывода из --format (table по умолчанию) или None при ошибке."""
+    fmt = (args.get("format") or "table").lower()
+    if fmt not in OUTPUT_FORMATS:
+        print(
+            f"Неизвестный формат '{fmt}'. "
+            f"Доступные: {', '.join(OUTPUT_FORMATS)}."
+        )
+        return None
+    return fmt
+
+
+def _parse_moment(value: str) -> datetime:
+    """ISO-дата из аргумента CLI ('Z' допускается)."""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
 def _require_logged_in(current_user: Optional[User]) -> User:
     if current_user is None:
         raise RuntimeError("Сначала выполните login.")
     return current_user
 
 
-def main() -> None:
-    """Главная точка входа CLI."""
+class CliSession:
+    """Состояние CLI между командами (интерактивно и в пакетном режиме)."""
+
+    def __init__(self) -> None:
+        self.current_user: Optional[User] = None
+        self.finished = False
+        # Profiler при --profile или VALUTATRADE_PROFILE, иначе None
+        self.profiler: Optional[Profiler] = None
+
+
+def execute_line(session: CliSession, line: str) -> bool:
+    """Разобрать и выполнить одну строку. False — команда не удалась."""
+    try:
+        tokens = shlex.split(line)
+    except ValueError as exc:
+        print(f"Ошибка парсинга команды: {exc}")
+        return False
+
+    command = tokens[0]
+    args = _parse_args(tokens[1:])
+
+    if command in {"exit", "quit"}:
+        print("Выход.")
+        session.finished = True
+        return True
+
+    with trace_request(command):
+        if session.profiler is None:
+            return _dispatch(session, command, args)
+        with session.profiler.profile(command):
+            return _dispatch(session, command, args)
+
+
+def _interactive_loop(session: CliSession) -> None:
     print("ValutaTrade Hub CLI")
     print(
         "Доступные команды: register, login, show-portfolio, "
-        "buy, sell, get-rate, exit"
+        "buy, sell, get-rate, place-order, show-orders, cancel-order, "
+        "create-alert, show-alerts, delete-alert, metrics, export, import, "
+        "changes, exit"
     )
 
-    current_user: Optional[User] = None
-
-    while True:
+    while not session.finished:
         try:
             line = input("> ").strip()
         except (EOFError, KeyboardInterrupt):
@@ -61,353 +152,1004 @@ def main() -> None:
         if not line:
             continue
 
-        try:
-            tokens = shlex.split(line)
-        except ValueError as exc:
-            print(f"Ошибка парсинга команды: {exc}")
+        execute_line(session, line)
+
+
+def run_script(
+    session: CliSession,
+    lines: Iterable[str],
+    continue_on_error: bool = False,
+    report: TextIO = sys.stderr,
+) -> int:
+    """Пакетный режим: выполнить команды в одном процессе.
+
+    Пользователь после login и прогретые кеши (индекс истории, синглтоны
+    инфраструктуры) сохраняются между командами. Пустые строки и
+    комментарии (#) пропускаются. Время каждой команды и итог пишутся
+    в report (по умолчанию stderr, чтобы не смешивать с выводом команд).
+    Возвращает код выхода: 0 — все команды успешны, 1 — были ошибки.
+    """
+    executed = 0
+    failed = 0
+    total_ms = 0.0
+
+    for lineno, raw_line in enumerate(lines, start=1):
+        line = raw_line.strip()
+        if not line or line.startswith("#"):
             continue
 
-        command = tokens[0]
-        args_tokens = tokens[1:]
-        args = _parse_args(args_tokens)
+        started = time.perf_counter()
+        try:
+            ok = execute_line(session, line)
+        except Exception as exc:  # одна команда не должна ронять весь скрипт
+            print(f"Ошибка: {exc}")
+            ok = False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        executed += 1
+        total_ms += elapsed_ms
+        status = "OK" if ok else "ERROR"
+        command = line.split(maxsplit=1)[0]
+        print(f"[{lineno}] {command} {status} {elapsed_ms:.1f} ms", file=report)
 
-        if command in {"exit", "quit"}:
-            print("Выход.")
+        if not ok:
+            failed += 1
+            if not continue_on_error:
+                print(
+                    f"Остановлено на строке {lineno} "
+                    "(используйте --continue-on-error).",
+                    file=report,
+                )
+                break
+        if session.finished:
             break
 
-        if command == "register":
-            username = args.get("username")
-            password = args.get("password")
+    print(
+        f"Выполнено команд: {executed}, ошибок: {failed}, "
+        f"время: {total_ms:.1f} ms",
+        file=report,
+    )
+    return 1 if failed else 0
 
-            if not username or not password:
-                print("Использование: register --username <имя> --password <пароль>")
-                continue
 
-            try:
-                user = usecases.register_user(
-                    username=username,
-                    password=password,
-                )
-            except ValueError as exc:
-                print(exc)
-                continue
+def _build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="project",
+        description="ValutaTrade Hub CLI",
+    )
+    parser.add_argument(
+        "--script",
+        metavar="FILE",
+        help="выполнить команды из файла ('-' — из stdin) и выйти",
+    )
+    parser.add_argument(
+        "--continue-on-error",
+        action="store_true",
+        help="в пакетном режиме не останавливаться на ошибке",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="all",
+        metavar="MODES",
+        help=(
+            "профилировать каждую команду: all (по умолчанию) или список "
+            "cpu,memory,io; отчёты — в logs/profiles (также "
+            "переменная VALUTATRADE_PROFILE)"
+        ),
+    )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Главная точка входа CLI."""
+    options = _build_arg_parser().parse_args(argv)
+    session = CliSession()
+    if options.profile is not None or os.getenv(PROFILE_ENV):
+        from ..profiling import Profiler, parse_modes
+
+        try:
+            if options.profile is not None:
+                session.profiler = Profiler(parse_modes(options.profile))
+            else:
+                session.profiler = Profiler.from_env()
+        except ValueError as exc:
+            print(f"Ошибка: {exc}", file=sys.stderr)
+            return 2
+
+    if options.script is None:
+        _interactive_loop(session)
+        return 0
+
+    if options.script == "-":
+        return run_script(session, sys.stdin, options.continue_on_error)
+
+    try:
+        with open(options.script, "r", encoding="utf-8") as f:
+            return run_script(session, f, options.continue_on_error)
+    except OSError as exc:
+        print(f"Не удалось открыть скрипт: {exc}", file=sys.stderr)
+        return 2
+
 
+def _dispatch(session: CliSession, command: str, args: Dict[str, str]) -> bool:
+    """Выполнить одну команду. Возвращает False, если команда не удалась."""
+    if command == "register":
+        username = args.get("username")
+        password = args.get("password")
+
+        if not username or not password:
+            print("Использование: register --username <имя> --password <пароль>")
+            return False
+
+        try:
+            user = usecases.register_user(
+                username=username,
+                password=password,
+            )
+        except ValueError as exc:
+            print(exc)
+            return False
+
+        print(
+            f"Пользователь '{user.username}' зарегистрирован (id={user.user_id}). "
+            f"Войдите: login --username {user.username} --password ****"
+        )
+
+    elif command == "login":
+        username = args.get("username")
+        password = args.get("password")
+
+        if not username or not password:
+            print("Использование: login --username <имя> --password <пароль>")
+            return False
+
+        try:
+            user = usecases.login_user(username=username, password=password)
+        except ValueError as exc:
+            print(exc)
+            return False
+
+        session.current_user = user
+        print(f"Вы вошли как '{user.username}'")
+
+        for note in usecases.take_alert_notifications(user=user):
+            arrow = "↑" if note["direction"] == "above" else "↓"
             print(
-                f"Пользователь '{user.username}' зарегистрирован (id={user.user_id}). "
-                f"Войдите: login --username {user.username} --password ****"
+                f"[уведомление] {note['currency_code']}_"
+                f"{note['base_currency']} {arrow} {note['threshold']}: "
+                f"{note['old_rate']} → {note['new_rate']} "
+                f"({note['fired_at']})"
             )
 
-        elif command == "login":
-            username = args.get("username")
-            password = args.get("password")
+    elif command == "show-portfolio":
+        try:
+            user = _require_logged_in(session.current_user)
+        except RuntimeError as exc:
+            print(exc)
+            return False
 
-            if not username or not password:
-                print("Использование: login --username <имя> --password <пароль>")
-                continue
+        base = args.get("base", DEFAULT_BASE_CURRENCY)
+        fmt = _output_format(args)
+        if fmt is None:
+            return False
 
-            try:
-                user = usecases.login_user(username=username, password=password)
-            except ValueError as exc:
-                print(exc)
-                continue
+        try:
+            summary = usecases.get_portfolio_summary(
+                user=user,
+                base_currency=base,
+            )
+        except ValueError as exc:
+            print(exc)
+            return False
 
-            current_user = user
-            print(f"Вы вошли как '{user.username}'")
+        if fmt != "table":
+            write_rows(
+                "portfolio",
+                (
+                    dict(
+                        item,
+                        username=summary["username"],
+                        base_currency=summary["base_currency"],
+                    )
+                    for item in summary["items"]
+                ),
+                fmt,
+                meta={
+                    "username": summary["username"],
+                    "base_currency": summary["base_currency"],
+                    "total": summary["total"],
+                },
+            )
+            return True
 
-        elif command == "show-portfolio":
-            try:
-                user = _require_logged_in(current_user)
-            except RuntimeError as exc:
-                print(exc)
-                continue
+        print(
+            f"Портфель пользователя '{summary['username']}' "
+            f"(база: {summary['base_currency']}):"
+        )
 
-            base = args.get("base", DEFAULT_BASE_CURRENCY)
+        from prettytable import PrettyTable
 
-            try:
-                summary = usecases.get_portfolio_summary(
-                    user=user,
-                    base_currency=base,
-                )
-            except ValueError as exc:
-                print(exc)
-                continue
+        table = PrettyTable()
+        table.field_names = [
+            "Валюта",
+            "Баланс",
+            f"В {summary['base_currency']}",
+        ]
+
+        for item in summary["items"]:
+            table.add_row(
+                [
+                    item["currency"],
+                    f"{item['balance']:.4f}",
+                    f"{item['value_in_base']:.2f}",
+                ]
+            )
+
+        print(table)
+        print("-" * 33)
+        print(
+            f"ИТОГО: {summary['total']:.2f} {summary['base_currency']}"
+        )
 
+    elif command == "buy":
+        try:
+            user = _require_logged_in(session.current_user)
+        except RuntimeError as exc:
+            print(exc)
+            return False
+
+        currency = args.get("currency")
+        amount_str = args.get("amount")
+
+        if not currency or not amount_str:
             print(
-                f"Портфель пользователя '{summary['username']}' "
-                f"(база: {summary['base_currency']}):"
-            )
-
-            table = PrettyTable()
-            table.field_names = [
-                "Валюта",
-                "Баланс",
-                f"В {summary['base_currency']}",
-            ]
-
-            for item in summary["items"]:
-                table.add_row(
-                    [
-                        item["currency"],
-                        f"{item['balance']:.4f}",
-                        f"{item['value_in_base']:.2f}",
-                    ]
-                )
+                "Использование: buy --currency <код> --amount <количество> "
+                "[--idempotency-key <ключ>]"
+            )
+            return False
+
+        try:
+            amount = float(amount_str)
+        except ValueError:
+            print("'amount' должен быть числом.")
+            return False
 
-            print(table)
-            print("-" * 33)
+        try:
+            result = usecases.buy_currency(
+                user=user,
+                currency_code=currency,
+                amount=amount,
+                idempotency_key=args.get("idempotency-key") or None,
+            )
+        except CurrencyNotFoundError as exc:
+            print(exc)
             print(
-                f"ИТОГО: {summary['total']:.2f} {summary['base_currency']}"
+                "Используйте команду get-rate для проверки доступных валют."
             )
+            return False
+        except ApiRequestError as exc:
+            print(exc)
+            print(
+                "Повторите попытку позже или проверьте подключение."
+            )
+            return False
+        except ValueError as exc:
+            print(exc)
+            return False
 
-        elif command == "buy":
-            try:
-                user = _require_logged_in(current_user)
-            except RuntimeError as exc:
-                print(exc)
-                continue
+        print(
+            f"Покупка выполнена: {result['amount']:.4f} {result['currency']} "
+            f"по курсу {result['rate']:.5f} {result['base_currency']}/"
+            f"{result['currency']}"
+        )
+        print("Изменения в портфеле:")
+        print(
+            f"- {result['currency']}: было {result['old_balance']:.4f} "
+            f"→ стало {result['new_balance']:.4f}"
+        )
+        print(
+            "Оценочная стоимость покупки: "
+            f"{result['estimated_value']:.2f} {result['base_currency']}"
+        )
 
-            currency = args.get("currency")
-            amount_str = args.get("amount")
+    elif command == "sell":
+        try:
+            user = _require_logged_in(session.current_user)
+        except RuntimeError as exc:
+            print(exc)
+            return False
 
-            if not currency or not amount_str:
-                print(
-                    "Использование: buy --currency <код> --amount <количество>"
-                )
-                continue
+        currency = args.get("currency")
+        amount_str = args.get("amount")
 
+        if not currency or not amount_str:
+            print(
+                "Использование: sell --currency <код> --amount <количество> "
+                "[--idempotency-key <ключ>]"
+            )
+            return False
+
+        try:
+            amount = float(amount_str)
+        except ValueError:
+            print("'amount' должен быть числом.")
+            return False
+
+        try:
+            result = usecases.sell_currency(
+                user=user,
+                currency_code=currency,
+                amount=amount,
+                idempotency_key=args.get("idempotency-key") or None,
+            )
+        except InsufficientFundsError as exc:
+            print(exc)
+            return False
+        except CurrencyNotFoundError as exc:
+            print(exc)
+            print(
+                "Используйте команду get-rate для проверки доступных валют."
+            )
+            return False
+        except ApiRequestError as exc:
+            print(exc)
+            print(
+                "Повторите попытку позже или проверьте подключение."
+            )
+            return False
+        except ValueError as exc:
+            print(exc)
+            return False
+
+        print(
+            f"Продажа выполнена: {result['amount']:.4f} {result['currency']} "
+            f"по курсу {result['rate']:.5f} {result['base_currency']}/"
+            f"{result['currency']}"
+        )
+        print("Изменения в портфеле:")
+        print(
+            f"- {result['currency']}: было {result['old_balance']:.4f} "
+            f"→ стало {result['new_balance']:.4f}"
+        )
+        print(
+            "Оценочная выручка: "
+            f"{result['estimated_revenue']:.2f} {result['base_currency']}"
+        )
+
+    elif command == "get-rate":
+        from_currency = args.get("from")
+        to_currency = args.get("to")
+
+        if not from_currency or not to_currency:
+            print(
+                "Использование: get-rate --from <валюта> --to <валюта> "
+                "[--at <YYYY-MM-DDTHH:MM>]"
+            )
+            return False
+
+        at: Optional[datetime] = None
+        if args.get("at"):
             try:
-                amount = float(amount_str)
+                at = _parse_moment(args["at"])
             except ValueError:
-                print("'amount' должен быть числом.")
-                continue
+                print("'at' должен быть датой в формате ISO 8601.")
+                return False
 
-            try:
-                result = usecases.buy_currency(
-                    user=user,
-                    currency_code=currency,
-                    amount=amount,
-                )
-            except CurrencyNotFoundError as exc:
-                print(exc)
-                print(
-                    "Используйте команду get-rate для проверки доступных валют."
-                )
-                continue
-            except ApiRequestError as exc:
-                print(exc)
-                print(
-                    "Повторите попытку позже или проверьте подключение."
-                )
-                continue
-            except ValueError as exc:
-                print(exc)
-                continue
+        fmt = _output_format(args)
+        if fmt is None:
+            return False
 
+        try:
+            info = usecases.get_rate_info(
+                from_currency=from_currency,
+                to_currency=to_currency,
+                at=at,
+            )
+        except CurrencyNotFoundError as exc:
+            print(exc)
             print(
-                f"Покупка выполнена: {result['amount']:.4f} {result['currency']} "
-                f"по курсу {result['rate']:.5f} {result['base_currency']}/"
-                f"{result['currency']}"
+                "Доступные коды:",
+                ", ".join(sorted(CURRENCY_REGISTRY.keys())),
             )
-            print("Изменения в портфеле:")
+            return False
+        except RateHistoryNotFoundError as exc:
+            print(exc)
+            return False
+        except ApiRequestError as exc:
+            print(exc)
             print(
-                f"- {result['currency']}: было {result['old_balance']:.4f} "
-                f"→ стало {result['new_balance']:.4f}"
+                "Повторите попытку позже или проверьте подключение."
             )
+            return False
+
+        if fmt != "table":
+            write_rows("rate", [info], fmt)
+            return True
+
+        updated_at = info["updated_at"].strftime("%Y-%m-%d %H:%M:%S")
+        print(
+            f"Курс {info['from']}→{info['to']}: {info['rate']:.8f} "
+            f"(обновлено: {updated_at})"
+        )
+        print(
+            "Обратный курс "
+            f"{info['to']}→{info['from']}: {info['reverse_rate']:.8f}"
+        )
+
+    elif command == "place-order":
+        try:
+            user = _require_logged_in(session.current_user)
+        except RuntimeError as exc:
+            print(exc)
+            return False
+
+        side = args.get("side")
+        currency = args.get("currency")
+        amount_str = args.get("amount")
+        price_str = args.get("price")
+
+        if not side or not currency or not amount_str or not price_str:
             print(
-                "Оценочная стоимость покупки: "
-                f"{result['estimated_value']:.2f} {result['base_currency']}"
+                "Использование: place-order --side <buy|sell> "
+                "--currency <код> --amount <количество> --price <цена>"
             )
+            return False
 
-        elif command == "sell":
-            try:
-                user = _require_logged_in(current_user)
-            except RuntimeError as exc:
-                print(exc)
-                continue
+        try:
+            amount = float(amount_str)
+            price = float(price_str)
+        except ValueError:
+            print("'amount' и 'price' должны быть числами.")
+            return False
 
-            currency = args.get("currency")
-            amount_str = args.get("amount")
+        try:
+            order = usecases.place_limit_order(
+                user=user,
+                side=side,
+                currency_code=currency,
+                amount=amount,
+                limit_price=price,
+            )
+        except CurrencyNotFoundError as exc:
+            print(exc)
+            return False
+        except ValueError as exc:
+            print(exc)
+            return False
 
-            if not currency or not amount_str:
-                print(
-                    "Использование: sell --currency <код> --amount <количество>"
-                )
-                continue
+        condition = "≤" if order["side"] == "buy" else "≥"
+        print(
+            f"Заявка #{order['order_id']} принята: {order['side']} "
+            f"{order['amount']:.4f} {order['currency_code']}, когда "
+            f"{order['currency_code']}_{order['base_currency']} "
+            f"{condition} {order['limit_price']}"
+        )
 
-            try:
-                amount = float(amount_str)
-            except ValueError:
-                print("'amount' должен быть числом.")
-                continue
+    elif command == "show-orders":
+        try:
+            user = _require_logged_in(session.current_user)
+        except RuntimeError as exc:
+            print(exc)
+            return False
 
-            try:
-                result = usecases.sell_currency(
-                    user=user,
-                    currency_code=currency,
-                    amount=amount,
-                )
-            except InsufficientFundsError as exc:
-                print(exc)
-                continue
-            except CurrencyNotFoundError as exc:
-                print(exc)
-                print(
-                    "Используйте команду get-rate для проверки доступных валют."
-                )
-                continue
-            except ApiRequestError as exc:
-                print(exc)
-                print(
-                    "Повторите попытку позже или проверьте подключение."
-                )
-                continue
-            except ValueError as exc:
-                print(exc)
-                continue
+        orders = usecases.list_limit_orders(user=user)
+        if not orders:
+            print("Открытых заявок нет.")
+            return True
+
+        from prettytable import PrettyTable
+
+        table = PrettyTable()
+        table.field_names = ["ID", "Сторона", "Пара", "Количество", "Цена"]
+        for order in orders:
+            table.add_row(
+                [
+                    order["order_id"],
+                    order["side"],
+                    f"{order['currency_code']}_{order['base_currency']}",
+                    f"{order['amount']:.4f}",
+                    order["limit_price"],
+                ]
+            )
+        print(table)
+
+    elif command == "cancel-order":
+        try:
+            user = _require_logged_in(session.current_user)
+        except RuntimeError as exc:
+            print(exc)
+            return False
+
+        try:
+            order_id = int(args.get("id", ""))
+        except ValueError:
+            print("Использование: cancel-order --id <номер заявки>")
+            return False
 
+        try:
+            usecases.cancel_limit_order(user=user, order_id=order_id)
+        except ValueError as exc:
+            print(exc)
+            return False
+
+        print(f"Заявка #{order_id} отменена.")
+
+    elif command == "create-alert":
+        try:
+            user = _require_logged_in(session.current_user)
+        except RuntimeError as exc:
+            print(exc)
+            return False
+
+        currency = args.get("currency")
+        direction = "above" if "above" in args else "below"
+        threshold_str = args.get(direction)
+
+        if not currency or not threshold_str:
             print(
-                f"Продажа выполнена: {result['amount']:.4f} {result['currency']} "
-                f"по курсу {result['rate']:.5f} {result['base_currency']}/"
-                f"{result['currency']}"
+                "Использование: create-alert --currency <код> "
+                "(--above <порог> | --below <порог>)"
             )
-            print("Изменения в портфеле:")
+            return False
+
+        try:
+            threshold = float(threshold_str)
+        except ValueError:
+            print("Порог должен быть числом.")
+            return False
+
+        try:
+            alert = usecases.create_price_alert(
+                user=user,
+                currency_code=currency,
+                direction=direction,
+                threshold=threshold,
+            )
+        except CurrencyNotFoundError as exc:
+            print(exc)
+            return False
+        except ValueError as exc:
+            print(exc)
+            return False
+
+        print(
+            f"Подписка #{alert['alert_id']} создана: "
+            f"{alert['currency_code']}_{alert['base_currency']} "
+            f"{alert['direction']} {alert['threshold']}"
+        )
+
+    elif command == "show-alerts":
+        try:
+            user = _require_logged_in(session.current_user)
+        except RuntimeError as exc:
+            print(exc)
+            return False
+
+        alerts = usecases.list_price_alerts(user=user)
+        if not alerts:
+            print("Активных подписок нет.")
+            return True
+
+        from prettytable import PrettyTable
+
+        table = PrettyTable()
+        table.field_names = ["ID", "Пара", "Направление", "Порог"]
+        for alert in alerts:
+            table.add_row(
+                [
+                    alert["alert_id"],
+                    f"{alert['currency_code']}_{alert['base_currency']}",
+                    alert["direction"],
+                    alert["threshold"],
+                ]
+            )
+        print(table)
+
+    elif command == "delete-alert":
+        try:
+            user = _require_logged_in(session.current_user)
+        except RuntimeError as exc:
+            print(exc)
+            return False
+
+        try:
+            alert_id = int(args.get("id", ""))
+        except ValueError:
+            print("Использование: delete-alert --id <номер подписки>")
+            return False
+
+        try:
+            usecases.delete_price_alert(user=user, alert_id=alert_id)
+        except ValueError as exc:
+            print(exc)
+            return False
+
+        print(f"Подписка #{alert_id} удалена.")
+
+    elif command == "update-rates":
+        source_filter = args.get("source")
+        if source_filter:
+            source_filter = source_filter.lower()
+
+        from ..parser_service.updater import RatesUpdater
+
+        config = ParserConfig.from_env()
+        updater = RatesUpdater(config)
+
+        try:
+            result = updater.run_update(source_filter=source_filter)
+        except ApiRequestError as exc:
+            print(exc)
             print(
-                f"- {result['currency']}: было {result['old_balance']:.4f} "
-                f"→ стало {result['new_balance']:.4f}"
+                "Обновление курсов завершилось с ошибкой. "
+                "Проверьте подключение или API-ключ."
             )
+            return False
+
+        total = result["total_rates"]
+        last_refresh = result["last_refresh"].isoformat()
+        errors = result["errors"]
+
+        for report in result.get("executed_orders", []):
+            line = (
+                f"Заявка #{report['order_id']} ({report['side']} "
+                f"{report['amount']:.4f} {report['currency_code']} "
+                f"по {report['limit_price']}): {report['status']}"
+            )
+            if report.get("error"):
+                line += f" — {report['error']}"
+            print(line)
+
+        if errors:
+            print(
+                "Update completed with errors. "
+                "Check logs/actions.log for details."
+            )
+        else:
             print(
-                "Оценочная выручка: "
-                f"{result['estimated_revenue']:.2f} {result['base_currency']}"
+                f"Update successful. Total rates updated: {total}. "
+                f"Last refresh: {last_refresh}"
             )
 
-        elif command == "get-rate":
-            from_currency = args.get("from")
-            to_currency = args.get("to")
+    elif command in {"history-compact", "archive-history"}:
+        config = ParserConfig.from_env()
+        days_str = args.get("older-than-days") or str(
+            config.HISTORY_RETENTION_DAYS
+        )
+        # archive-history — прежнее имя команды, всегда архивирует
+        if command == "archive-history":
+            action = "archive"
+        else:
+            action = args.get("action") or config.HISTORY_RETENTION_ACTION
 
-            if not from_currency or not to_currency:
-                print(
-                    "Использование: get-rate --from <валюта> --to <валюта>"
-                )
-                continue
+        try:
+            days = int(days_str)
+        except ValueError:
+            print("'older-than-days' должен быть целым числом.")
+            return False
 
+        older_than = datetime.now(timezone.utc) - timedelta(days=days)
+        from ..parser_service.storage import RatesStorage
+
+        storage = RatesStorage(config)
+
+        if "background" in args:
+            threading.Thread(
+                target=_compact_history,
+                args=(storage, older_than, action),
+                name="history-compaction",
+            ).start()
+            print(
+                "Сжатие истории запущено в фоне "
+                "(результат — в logs/actions.log)."
+            )
+            return True
+
+        try:
+            result = storage.compact_history(older_than, action=action)
+        except ValueError as exc:
+            print(exc)
+            return False
+
+        verb = "в архив" if result["action"] == "archive" else "удалено"
+        print(
+            f"Сегменты старше {older_than.date().isoformat()}: "
+            f"{result['segments']} ({result['entries']} записей) {verb}."
+        )
+
+    elif command == "migrate-history":
+        from ..parser_service.storage import RatesStorage
+
+        storage = RatesStorage(ParserConfig.from_env())
+        count = storage.import_single_file_history()
+        if count:
+            print(f"История из единого файла разложена по сегментам: {count} записей.")
+        else:
+            print("Импортировать нечего: единый файл истории уже в сегментах.")
+
+    elif command == "show-rates":
+        fmt = _output_format(args)
+        if fmt is None:
+            return False
+
+        config = ParserConfig.from_env()
+        from ..parser_service.storage import RatesStorage
+
+        storage = RatesStorage(config)
+        data = storage.load_current_rates()
+
+        if not data:
+            print(
+                "Локальный кеш курсов пуст. "
+                "Выполните 'update-rates', чтобы загрузить данные."
+            )
+            return True
+
+        # top-level format: pair keys + last_refresh (+ служебные строки)
+        last_refresh = data.get("last_refresh")
+        pairs: Iterable[Tuple[str, Dict]] = (
+            (key, value)
+            for key, value in data.items()
+            if isinstance(value, dict) and "rate" in value
+        )
+
+        currency_filter = args.get("currency")
+        top_str = args.get("top")
+
+        if currency_filter:
+            currency_filter = currency_filter.upper()
+            pairs = (
+                (k, v)
+                for k, v in pairs
+                if k.startswith(currency_filter + "_")
+            )
+
+        if top_str:
             try:
-                info = usecases.get_rate_info(
-                    from_currency=from_currency,
-                    to_currency=to_currency,
-                )
-            except CurrencyNotFoundError as exc:
-                print(exc)
-                print(
-                    "Доступные коды:",
-                    ", ".join(sorted(CURRENCY_REGISTRY.keys())),
-                )
-                continue
-            except ApiRequestError as exc:
-                print(exc)
-                print(
-                    "Повторите попытку позже или проверьте подключение."
+                top_n = int(top_str)
+            except ValueError:
+                print("'top' должен быть целым числом.")
+                return False
+            # top-N по убыванию курса: куча на N элементов, без сортировки всех
+            pairs = heapq.nlargest(top_n, pairs, key=lambda item: item[1]["rate"])
+
+        if fmt != "table":
+            write_rows(
+                "rates",
+                (
+                    dict(
+                        info,
+                        pair=pair_key,
+                        from_currency=pair_key.split("_", 1)[0],
+                        to_currency=pair_key.split("_", 1)[-1],
+                    )
+                    for pair_key, info in pairs
+                ),
+                fmt,
+                meta={"last_refresh": last_refresh},
+            )
+            return True
+
+        selected = dict(pairs)
+        if currency_filter and not selected:
+            print(
+                f"Курс для '{currency_filter}' не найден в кеше."
+            )
+            return False
+
+        print(
+            "Rates from cache"
+            + (f" (updated at {last_refresh})" if last_refresh else "")
+            + ":"
+        )
+        for pair_key, info in sorted(selected.items()):
+            print(f"- {pair_key}: {info['rate']}")
+
+    elif command == "show-history":
+        fmt = _output_format(args)
+        if fmt is None:
+            return False
+
+        try:
+            start = _parse_moment(args["from"]) if args.get("from") else None
+            end = _parse_moment(args["to"]) if args.get("to") else None
+        except ValueError:
+            print("'from' и 'to' должны быть датами в формате ISO 8601.")
+            return False
+        if start is not None and start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc)
+        if end is not None and end.tzinfo is None:
+            end = end.replace(tzinfo=timezone.utc)
+
+        pair_filter = (args.get("pair") or "").upper()
+        from ..parser_service.storage import RatesStorage
+
+        storage = RatesStorage(ParserConfig.from_env())
+        # записи идут потоком из нужных сегментов, без загрузки всей истории
+        entries = (
+            entry
+            for entry in storage.iter_history(start, end)
+            if not pair_filter
+            or f"{entry['from_currency']}_{entry['to_currency']}" == pair_filter
+        )
+
+        if fmt != "table":
+            write_rows("history", entries, fmt)
+            return True
+
+        count = 0
+        for entry in entries:
+            print(
+                f"{entry['timestamp']} "
+                f"{entry['from_currency']}_{entry['to_currency']}: "
+                f"{entry['rate']} ({entry['source']})"
+            )
+            count += 1
+        print(f"Записей: {count}")
+
+    elif command == "export":
+        kind = (args.get("kind") or "").lower()
+        fmt = (args.get("format") or "jsonl").lower()
+        if fmt not in BULK_FORMATS:
+            print(f"Неизвестный формат '{fmt}'. Доступные: {', '.join(BULK_FORMATS)}.")
+            return False
+        try:
+            rows = usecases.export_records(kind)
+        except ValueError as exc:
+            print(exc)
+            return False
+
+        output = args.get("output")
+        if not output:
+            write_rows(kind, rows, fmt)
+            return True
+        try:
+            with open(output, "w", encoding="utf-8", newline="") as f:
+                count = write_rows(kind, rows, fmt, stream=f)
+        except OSError as exc:
+            print(f"Не удалось записать файл: {exc}")
+            return False
+        print(f"Выгружено строк: {count} ({kind}, {fmt}) -> {output}")
+
+    elif command == "import":
+        kind = (args.get("kind") or "").lower()
+        path = args.get("input")
+        if not path:
+            print("Укажите файл: --input FILE.")
+            return False
+        default_fmt = "csv" if path.lower().endswith(".csv") else "jsonl"
+        fmt = (args.get("format") or default_fmt).lower()
+        if fmt not in BULK_FORMATS:
+            print(f"Неизвестный формат '{fmt}'. Доступные: {', '.join(BULK_FORMATS)}.")
+            return False
+        try:
+            batch_size = int(args.get("batch-size") or BULK_BATCH_SIZE)
+        except ValueError:
+            print("'batch-size' должен быть целым числом.")
+            return False
+        dry_run = "dry-run" in args
+
+        try:
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                report = usecases.import_records(
+                    kind,
+                    read_rows(kind, f, fmt),
+                    dry_run=dry_run,
+                    batch_size=batch_size,
                 )
-                continue
+        except BulkImportError as exc:
+            report = exc.report
+        except OSError as exc:
+            print(f"Не удалось прочитать файл: {exc}")
+            return False
+        except ValueError as exc:
+            print(exc)
+            return False
 
-            updated_at = info["updated_at"].strftime("%Y-%m-%d %H:%M:%S")
+        title = "Проверка (dry-run)" if dry_run else "Импорт"
+        print(
+            f"{title} {kind}: строк {report['rows']}, записей {report['records']}, "
+            f"строк с ошибками {report['invalid']}."
+        )
+        for error in report["errors"]:
+            print(f"  строка {error['line']}: {error['error']}")
+        hidden = report["invalid"] - len(report["errors"])
+        if hidden > 0:
+            print(f"  ... и ещё {hidden}")
+        if report["invalid"]:
+            print("Ничего не записано: исправьте ошибки и повторите.")
+            return False
+        if dry_run:
             print(
-                f"Курс {info['from']}→{info['to']}: {info['rate']:.8f} "
-                f"(обновлено: {updated_at})"
+                f"Будет загружено записей: {report['records']} "
+                f"(пачек по {batch_size}: {report['batches']})."
             )
+        else:
             print(
-                "Обратный курс "
-                f"{info['to']}→{info['from']}: {info['reverse_rate']:.8f}"
+                f"Загружено записей: {report['imported']} за "
+                f"{report['seconds']:.2f} с (пачек по {batch_size}: "
+                f"{report['batches']})."
             )
 
-        elif command == "update-rates":
-            source_filter = args.get("source")
-            if source_filter:
-                source_filter = source_filter.lower()
+    elif command == "changes":
+        from ..core.constants import CHANGES_POLL_LIMIT
+        from ..infra.changefeed import ChangeConsumer, ChangeFeed
 
-            config = ParserConfig.from_env()
-            updater = RatesUpdater(config)
+        try:
+            limit = int(args.get("limit") or CHANGES_POLL_LIMIT)
+            after = int(args.get("after") or 0)
+        except ValueError:
+            print("'limit' и 'after' должны быть целыми числами.")
+            return False
 
+        name = args.get("consumer")
+        if name is None:
+            events, _ = ChangeFeed().read(after, limit=limit)
+        else:
             try:
-                result = updater.run_update(source_filter=source_filter)
-            except ApiRequestError as exc:
+                consumer = ChangeConsumer(name)
+            except ValueError as exc:
                 print(exc)
+                return False
+            if "lag" in args:
                 print(
-                    "Обновление курсов завершилось с ошибкой. "
-                    "Проверьте подключение или API-ключ."
+                    f"Потребитель '{consumer.name}': offset {consumer.offset}, "
+                    f"не прочитано событий: {consumer.lag()}"
                 )
-                continue
+                return True
+            events = consumer.poll(limit)
+            if "no-commit" not in args:
+                consumer.commit()
+        for event in events:
+            print(json.dumps(event, ensure_ascii=False))
 
-            total = result["total_rates"]
-            last_refresh = result["last_refresh"].isoformat()
-            errors = result["errors"]
+    elif command == "metrics":
+        from ..metrics import MetricsRegistry, render_prometheus, summarize
 
-            if errors:
-                print(
-                    "Update completed with errors. "
-                    "Check logs/actions.log for details."
-                )
-            else:
-                print(
-                    f"Update successful. Total rates updated: {total}. "
-                    f"Last refresh: {last_refresh}"
-                )
+        registry = MetricsRegistry()
+        if "reset" in args:
+            registry.reset()
+            print("Метрики сброшены.")
+            return True
 
-        elif command == "show-rates":
-            config = ParserConfig.from_env()
-            storage = RatesStorage(config)
-            data = storage.load_current_rates()
+        histograms = registry.collect()
+        if "prometheus" in args:
+            print(render_prometheus(histograms), end="")
+            return True
 
-            if not data:
-                print(
-                    "Локальный кеш курсов пуст. "
-                    "Выполните 'update-rates', чтобы загрузить данные."
-                )
-                continue
-
-            # top-level format: pair keys + last_refresh
-            last_refresh = data.get("last_refresh")
-            pairs = {
-                key: value
-                for key, value in data.items()
-                if key != "last_refresh"
-            }
-
-            currency_filter = args.get("currency")
-            top_str = args.get("top")
-
-            if currency_filter:
-                currency_filter = currency_filter.upper()
-                filtered = {
-                    k: v
-                    for k, v in pairs.items()
-                    if k.startswith(currency_filter + "_")
-                }
-                pairs = filtered
-
-                if not pairs:
-                    print(
-                        f"Курс для '{currency_filter}' не найден в кеше."
-                    )
-                    continue
-
-            if top_str:
-                try:
-                    top_n = int(top_str)
-                except ValueError:
-                    print("'top' должен быть целым числом.")
-                    continue
-                # сортируем по убыванию курса
-                sorted_pairs = sorted(
-                    pairs.items(),
-                    key=lambda item: item[1]["rate"],
-                    reverse=True,
-                )
-                pairs = dict(sorted_pairs[:top_n])
+        fmt = _output_format(args)
+        if fmt is None:
+            return False
+        rows = summarize(histograms)
+        if fmt != "table":
+            write_rows("metrics", rows, fmt)
+            return True
+        if not rows:
+            print("Метрик пока нет: выполните хотя бы одну операцию.")
+            return True
 
-            print(
-                "Rates from cache"
-                + (f" (updated at {last_refresh})" if last_refresh else "")
-                + ":"
+        from prettytable import PrettyTable
+
+        table = PrettyTable()
+        table.field_names = [
+            "Операция", "Вызовов", "Ошибок", "p50 мс", "p95 мс", "p99 мс"
+        ]
+        for row in rows:
+            table.add_row(
+                [
+                    row["action"],
+                    row["count"],
+                    row["errors"],
+                    f"{row['p50_ms']:.2f}",
+                    f"{row['p95_ms']:.2f}",
+                    f"{row['p99_ms']:.2f}",
+                ]
             )
-            for pair_key, info in sorted(pairs.items()):
-                print(f"- {pair_key}: {info['rate']}")
+        print(table)
+
+    else:
+        print(f"Неизвестная команда: {command}")
+        return False
+
+    return True
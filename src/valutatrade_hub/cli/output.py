@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import csv
+import json
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
+from ..core.constants import PORTFOLIO_FIELDS, USER_FIELDS
+
+# Версия схемы машиночитаемого вывода. Меняется только при несовместимых
+# изменениях полей; новые поля добавляются в конец списка без смены версии.
+OUTPUT_SCHEMA_VERSION = 1
+
+OUTPUT_FORMATS = ("table", "json", "jsonl", "csv")
+
+# Поля строк по видам вывода (порядок = порядок колонок CSV)
+OUTPUT_SCHEMAS: Dict[str, tuple[str, ...]] = {
+    "portfolio": (
+        "username",
+        "base_currency",
+        "currency",
+        "balance",
+        "value_in_base",
+    ),
+    "rates": (
+        "pair",
+        "from_currency",
+        "to_currency",
+        "rate",
+        "updated_at",
+        "source",
+    ),
+    "rate": ("from", "to", "rate", "reverse_rate", "updated_at"),
+    "history": (
+        "id",
+        "from_currency",
+        "to_currency",
+        "rate",
+        "timestamp",
+        "source",
+    ),
+    "metrics": (
+        "action",
+        "count",
+        "ok",
+        "errors",
+        "mean_ms",
+        "p50_ms",
+        "p95_ms",
+        "p99_ms",
+    ),
+    # export / import: формат совпадает, выгрузку можно загрузить обратно
+    "users": USER_FIELDS,
+    "portfolios": PORTFOLIO_FIELDS,
+}
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def write_rows(
+    kind: str,
+    rows: Iterable[Dict[str, Any]],
+    fmt: str,
+    stream: Optional[TextIO] = None,
+    meta: Optional[Dict[str, Any]] = None,
+) -> int:
+    """Потоково вывести строки вида kind в формате json/jsonl/csv.
+
+    Строки пишутся по одной по мере поступления из итератора, без
+    накопления: большой вывод обрабатывается в постоянной памяти.
+
+    - json: {"schema", "version", "meta", "rows": [...]};
+    - jsonl: по объекту на строку, в каждом — "schema" и "version";
+    - csv: заголовок из полей схемы, затем строки.
+    Возвращает число выведенных строк.
+    """
+    stream = stream or sys.stdout
+    fields = OUTPUT_SCHEMAS[kind]
+    schema = f"valutatrade.{kind}"
+    count = 0
+
+    if fmt == "csv":
+        writer = csv.writer(stream, lineterminator="\n")
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow([_plain(row.get(field)) for field in fields])
+            count += 1
+        return count
+
+    if fmt == "jsonl":
+        for row in rows:
+            record = {"schema": schema, "version": OUTPUT_SCHEMA_VERSION}
+            record.update((field, _plain(row.get(field))) for field in fields)
+            stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+        return count
+
+    if fmt == "json":
+        header = {
+            "schema": schema,
+            "version": OUTPUT_SCHEMA_VERSION,
+            "meta": {key: _plain(value) for key, value in (meta or {}).items()},
+        }
+        # конверт пишем вручную, чтобы не собирать массив rows в памяти
+        stream.write(json.dumps(header, ensure_ascii=False)[:-1] + ', "rows": [')
+        for row in rows:
+            record = {field: _plain(row.get(field)) for field in fields}
+            stream.write(("\n  " if count == 0 else ",\n  "))
+            stream.write(json.dumps(record, ensure_ascii=False))
+            count += 1
+        stream.write("\n]}\n" if count else "]}\n")
+        return count
+
+    raise ValueError(
+        f"Неизвестный формат вывода '{fmt}'. "
+        f"Доступные: {', '.join(OUTPUT_FORMATS)}."
+    )
+
+
+def read_rows(
+    kind: str,
+    stream: TextIO,
+    fmt: str,
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Потоково прочитать строки вида kind из jsonl/csv: (номер строки, поля).
+
+    Обратная операция к write_rows: в памяти одна строка. Поля вне схемы
+    отбрасываются; в CSV пустая ячейка — None. Строка, которую нельзя
+    разобрать, или чужая схема — ValueError с номером строки.
+    """
+    fields = OUTPUT_SCHEMAS[kind]
+    schema = f"valutatrade.{kind}"
+
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        missing = [field for field in fields if field not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f"В заголовке CSV нет колонок: {', '.join(missing)}")
+        for row in reader:
+            yield reader.line_num, {
+                field: (row[field] if row[field] != "" else None) for field in fields
+            }
+        return
+
+    if fmt == "jsonl":
+        for lineno, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                raise ValueError(
+                    f"Строка {lineno}: некорректный JSON ({exc})"
+                ) from None
+            if not isinstance(record, dict):
+                raise ValueError(f"Строка {lineno}: ожидался объект JSON")
+            if record.get("schema", schema) != schema:
+                raise ValueError(
+                    f"Строка {lineno}: схема {record.get('schema')}, ожидалась {schema}"
+                )
+            yield lineno, {field: record.get(field) for field in fields}
+        return
+
+    raise ValueError(
+        f"Неизвестный формат ввода '{fmt}'. Доступные: jsonl, csv."
+    )
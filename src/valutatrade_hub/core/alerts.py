@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import math
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .constants import (
+    ALERT_DIRECTION_ABOVE,
+    ALERT_DIRECTION_BELOW,
+    ALERT_DIRECTIONS,
+    DEFAULT_BASE_CURRENCY,
+    FIRST_ALERT_ID,
+)
+
+# PriceAlert, AlertBook, AlertBooks
+
+
+class PriceAlert:
+    """Подписка на пересечение курсом порога.
+
+    above — курс поднялся до порога или выше (old < threshold <= new);
+    below — курс опустился до порога или ниже (new <= threshold < old).
+    """
+
+    def __init__(
+        self,
+        alert_id: int,
+        user_id: int,
+        currency_code: str,
+        direction: str,
+        threshold: float,
+        base_currency: str = DEFAULT_BASE_CURRENCY,
+        created_at: Optional[datetime] = None,
+    ) -> None:
+        direction = direction.strip().lower()
+        if direction not in ALERT_DIRECTIONS:
+            raise ValueError(
+                "Направление должно быть одним из: "
+                f"{', '.join(ALERT_DIRECTIONS)}."
+            )
+        if threshold <= 0:
+            raise ValueError("Порог должен быть положительным числом.")
+
+        self.alert_id = alert_id
+        self.user_id = user_id
+        self.currency_code = currency_code.strip().upper()
+        self.base_currency = base_currency.strip().upper()
+        self.direction = direction
+        self.threshold = float(threshold)
+        self.created_at = created_at or datetime.utcnow()
+
+    @property
+    def pair(self) -> str:
+        return f"{self.currency_code}_{self.base_currency}"
+
+    # ---- Для JSON ----
+    def to_dict(self) -> dict:
+        return {
+            "alert_id": self.alert_id,
+            "user_id": self.user_id,
+            "currency_code": self.currency_code,
+            "base_currency": self.base_currency,
+            "direction": self.direction,
+            "threshold": self.threshold,
+            "created_at": self.created_at.isoformat(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PriceAlert":
+        return cls(
+            alert_id=data["alert_id"],
+            user_id=data["user_id"],
+            currency_code=data["currency_code"],
+            base_currency=data.get("base_currency", DEFAULT_BASE_CURRENCY),
+            direction=data["direction"],
+            threshold=data["threshold"],
+            created_at=datetime.fromisoformat(data["created_at"]),
+        )
+
+
+class AlertBook:
+    """Подписки одной пары: по направлению отсортированный массив порогов.
+
+    Сработавшие при переходе old -> new подписки образуют непрерывный
+    диапазон массива, который находится двумя bisect: O(log n + k).
+    """
+
+    def __init__(self, pair: str) -> None:
+        self.pair = pair
+        self._keys: Dict[str, List[Tuple[float, int]]] = {
+            direction: [] for direction in ALERT_DIRECTIONS
+        }
+        self._alerts: Dict[str, List[PriceAlert]] = {
+            direction: [] for direction in ALERT_DIRECTIONS
+        }
+
+    @staticmethod
+    def _sort_key(alert: PriceAlert) -> Tuple[float, int]:
+        return alert.threshold, alert.alert_id
+
+    def add(self, alert: PriceAlert) -> None:
+        key = self._sort_key(alert)
+        keys = self._keys[alert.direction]
+        idx = bisect_right(keys, key)
+        keys.insert(idx, key)
+        self._alerts[alert.direction].insert(idx, alert)
+
+    def remove(self, alert: PriceAlert) -> bool:
+        key = self._sort_key(alert)
+        keys = self._keys[alert.direction]
+        idx = bisect_left(keys, key)
+        if idx < len(keys) and keys[idx] == key:
+            del keys[idx]
+            del self._alerts[alert.direction][idx]
+            return True
+        return False
+
+    def pop_fired(self, old_rate: float, new_rate: float) -> List[PriceAlert]:
+        """Снять подписки, пороги которых лежат между old_rate и new_rate."""
+        if new_rate > old_rate:
+            direction = ALERT_DIRECTION_ABOVE
+            keys = self._keys[direction]
+            # old < threshold <= new
+            lo = bisect_right(keys, (old_rate, math.inf))
+            hi = bisect_right(keys, (new_rate, math.inf))
+        elif new_rate < old_rate:
+            direction = ALERT_DIRECTION_BELOW
+            keys = self._keys[direction]
+            # new <= threshold < old
+            lo = bisect_left(keys, (new_rate,))
+            hi = bisect_left(keys, (old_rate,))
+        else:
+            return []
+
+        if lo >= hi:
+            return []
+        fired = self._alerts[direction][lo:hi]
+        del keys[lo:hi]
+        del self._alerts[direction][lo:hi]
+        return fired
+
+    def alerts(self) -> List[PriceAlert]:
+        return [
+            alert
+            for direction in ALERT_DIRECTIONS
+            for alert in self._alerts[direction]
+        ]
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._keys.values())
+
+    # ---- Для JSON ----
+    def to_dict(self) -> dict:
+        return {
+            direction: [alert.to_dict() for alert in self._alerts[direction]]
+            for direction in ALERT_DIRECTIONS
+        }
+
+    @classmethod
+    def from_dict(cls, pair: str, data: dict) -> "AlertBook":
+        book = cls(pair)
+        for direction in ALERT_DIRECTIONS:
+            raw_alerts = data.get(direction, [])
+            alerts = [PriceAlert.from_dict(item) for item in raw_alerts]
+            alerts.sort(key=cls._sort_key)
+            book._alerts[direction] = alerts
+            book._keys[direction] = [cls._sort_key(alert) for alert in alerts]
+        return book
+
+
+class AlertBooks:
+    """Набор подписок по парам + индекс alert_id -> подписка."""
+
+    def __init__(
+        self,
+        books: Optional[Dict[str, AlertBook]] = None,
+        next_id: int = FIRST_ALERT_ID,
+    ) -> None:
+        self._books: Dict[str, AlertBook] = books or {}
+        self._next_id = next_id
+        self._by_id: Dict[int, PriceAlert] = {
+            alert.alert_id: alert
+            for book in self._books.values()
+            for alert in book.alerts()
+        }
+
+    def subscribe(
+        self,
+        user_id: int,
+        currency_code: str,
+        direction: str,
+        threshold: float,
+        base_currency: str = DEFAULT_BASE_CURRENCY,
+    ) -> PriceAlert:
+        alert = PriceAlert(
+            alert_id=self._next_id,
+            user_id=user_id,
+            currency_code=currency_code,
+            direction=direction,
+            threshold=threshold,
+            base_currency=base_currency,
+        )
+        self._next_id += 1
+        book = self._books.get(alert.pair)
+        if book is None:
+            book = self._books[alert.pair] = AlertBook(alert.pair)
+        book.add(alert)
+        self._by_id[alert.alert_id] = alert
+        return alert
+
+    def unsubscribe(self, user_id: int, alert_id: int) -> PriceAlert:
+        alert = self._by_id.get(alert_id)
+        if alert is None or alert.user_id != user_id:
+            raise ValueError(f"Подписка #{alert_id} не найдена.")
+        self.discard(alert_id)
+        return alert
+
+    def discard(self, alert_id: int) -> Optional[PriceAlert]:
+        """Снять подписку по id (без проверки владельца); нет подписки — None."""
+        alert = self._by_id.pop(alert_id, None)
+        if alert is not None:
+            self._books[alert.pair].remove(alert)
+        return alert
+
+    def alerts_for_user(self, user_id: int) -> List[PriceAlert]:
+        alerts = [a for a in self._by_id.values() if a.user_id == user_id]
+        return sorted(alerts, key=lambda a: a.alert_id)
+
+    def fire(
+        self,
+        old_rates: Dict[str, float],
+        new_rates: Dict[str, float],
+    ) -> List[PriceAlert]:
+        """Снять подписки, пороги которых пересечены при смене курсов.
+
+        Пары без предыдущего курса пропускаются: пересечение не определено.
+        """
+        fired: List[PriceAlert] = []
+        for pair, new_rate in new_rates.items():
+            book = self._books.get(pair)
+            old_rate = old_rates.get(pair)
+            if book is None or old_rate is None:
+                continue
+            for alert in book.pop_fired(old_rate, new_rate):
+                self._by_id.pop(alert.alert_id, None)
+                fired.append(alert)
+        return fired
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    # ---- Для JSON ----
+    def to_dict(self) -> dict:
+        return {
+            "next_id": self._next_id,
+            "books": {
+                pair: book.to_dict()
+                for pair, book in sorted(self._books.items())
+                if len(book)
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AlertBooks":
+        books = {
+            pair: AlertBook.from_dict(pair, raw)
+            for pair, raw in data.get("books", {}).items()
+        }
+        return cls(books=books, next_id=data.get("next_id", FIRST_ALERT_ID))
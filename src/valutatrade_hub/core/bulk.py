@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..infra.database import DatabaseManager
+from ..infra.locks import LockManager
+from .constants import (
+    BULK_BATCH_SIZE,
+    BULK_MAX_REPORTED_ERRORS,
+    CHANGE_BULK_IMPORTED,
+    DEFAULT_WALLET_BALANCE,
+    FIRST_PORTFOLIO_VERSION,
+    FIRST_USER_ID,
+    USER_FIELDS,
+)
+from .currencies import get_currency
+from .exceptions import BulkImportError, CurrencyNotFoundError
+
+HEX_DIGITS = frozenset("0123456789abcdef")
+
+# (номер строки входного файла, строка)
+NumberedRow = Tuple[int, Dict[str, Any]]
+
+
+# ===== Экспорт =====
+
+
+def iter_user_rows() -> Iterator[Dict[str, Any]]:
+    """Строки пользователей — словари хранилища, без объектов User."""
+    for item in DatabaseManager().iter_users_raw():
+        yield {field: item.get(field) for field in USER_FIELDS}
+
+
+def iter_portfolio_rows() -> Iterator[Dict[str, Any]]:
+    for item in DatabaseManager().iter_portfolios_raw():
+        base = {
+            "user_id": item["user_id"],
+            "portfolio_version": item.get("version", FIRST_PORTFOLIO_VERSION),
+        }
+        wallets = item.get("wallets") or {}
+        if not wallets:
+            yield dict(base, currency=None, balance=None)
+        for code, wallet in wallets.items():
+            balance = wallet.get("balance", DEFAULT_WALLET_BALANCE)
+            yield dict(base, currency=code, balance=balance)
+
+
+# ===== Проверка строк импорта =====
+
+
+def _integer(row: Dict[str, Any], field: str, minimum: int) -> int:
+    value = row.get(field)
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"'{field}' должен быть целым числом")
+    if value < minimum:
+        raise ValueError(f"'{field}' должен быть не меньше {minimum}")
+    return value
+
+
+def _text(row: Dict[str, Any], field: str) -> str:
+    value = row.get(field)
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"'{field}' не может быть пустым")
+    return value.strip()
+
+
+def _user_record(row: Dict[str, Any], next_id: int) -> Dict[str, Any]:
+    """Проверенная запись users.json; без user_id — следующий свободный."""
+    if row.get("user_id") in (None, ""):
+        user_id = next_id
+    else:
+        user_id = _integer(row, "user_id", FIRST_USER_ID)
+    hashed = _text(row, "hashed_password").lower()
+    if len(hashed) != 64 or not HEX_DIGITS.issuperset(hashed):
+        raise ValueError("'hashed_password' должен быть sha256 в hex (64 символа)")
+    registered = row.get("registration_date")
+    if registered in (None, ""):
+        registration_date = datetime.utcnow()
+    else:
+        try:
+            registration_date = datetime.fromisoformat(str(registered))
+        except ValueError:
+            raise ValueError("'registration_date' — не дата ISO 8601") from None
+    return {
+        "user_id": user_id,
+        "username": _text(row, "username"),
+        "hashed_password": hashed,
+        "salt": _text(row, "salt"),
+        "registration_date": registration_date.isoformat(),
+    }
+
+
+def _wallet(row: Dict[str, Any]) -> Optional[Tuple[str, float]]:
+    """(код, баланс) кошелька строки; None — портфель без кошельков."""
+    code = row.get("currency")
+    if code in (None, ""):
+        if row.get("balance") not in (None, ""):
+            raise ValueError("баланс указан без валюты")
+        return None
+    code = str(code).strip().upper()
+    get_currency(code)
+    try:
+        balance = float(row.get("balance"))  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        raise ValueError("'balance' должен быть числом") from None
+    if not balance >= DEFAULT_WALLET_BALANCE:  # отсекает и NaN
+        raise ValueError("'balance' не может быть отрицательным")
+    return code, balance
+
+
+# ===== Импорт =====
+
+
+def _new_report(kind: str, dry_run: bool, batch_size: int) -> Dict[str, Any]:
+    return {
+        "kind": kind,
+        "dry_run": dry_run,
+        "batch_size": batch_size,
+        "rows": 0,
+        "records": 0,
+        "invalid": 0,
+        "imported": 0,
+        "errors": [],
+    }
+
+
+def _reject(report: Dict[str, Any], line: int, exc: Exception) -> None:
+    report["invalid"] += 1
+    if len(report["errors"]) < BULK_MAX_REPORTED_ERRORS:
+        report["errors"].append({"line": line, "error": str(exc)})
+
+
+def _finish(
+    report: Dict[str, Any],
+    records: Iterator[Dict[str, Any]],
+    append: Callable[[Iterable[Dict[str, Any]], int], int],
+) -> Dict[str, Any]:
+    """Прогнать проверенные записи: в хранилище или (dry-run) вхолостую.
+
+    records в конце бросает BulkImportError, если были ошибки: запись
+    в хранилище тогда отменяется целиком, а ошибка уходит вызывающему
+    с заполненным отчётом (и в журнале операция записывается как ERROR).
+    Отдельных событий о каждой записи лента изменений не получает —
+    только одно bulk.imported.
+    """
+    started = time.perf_counter()
+    try:
+        if report["dry_run"]:
+            for _ in records:
+                pass
+        else:
+            report["imported"] = append(records, report["batch_size"])
+            if report["imported"]:
+                DatabaseManager().record_change(
+                    CHANGE_BULK_IMPORTED,
+                    {"kind": report["kind"], "imported": report["imported"]},
+                )
+    except BulkImportError:
+        report["imported"] = 0
+        raise
+    finally:
+        batch_size = report["batch_size"]
+        report["batches"] = -(-report["records"] // batch_size)
+        report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def import_users(
+    rows: Iterable[NumberedRow],
+    dry_run: bool = False,
+    batch_size: int = BULK_BATCH_SIZE,
+) -> Dict[str, Any]:
+    """Импорт пользователей: проверка и вставка пачками, всё или ничего.
+
+    Строки читаются потоком; в памяти — текущая пачка и множества
+    занятых user_id и имён (для проверки уникальности). Новые записи
+    дописываются в users.json одной заменой файла, без перезаписи на
+    каждую строку. Регистрации на это время ждут structural-блокировку.
+    """
+    db = DatabaseManager()
+    report = _new_report("users", dry_run, batch_size)
+    with LockManager().structural():
+        ids = set()
+        names = set()
+        for item in db.iter_users_raw():
+            ids.add(item["user_id"])
+            names.add(item["username"])
+        next_id = max(ids, default=FIRST_USER_ID - 1) + 1
+
+        def records() -> Iterator[Dict[str, Any]]:
+            nonlocal next_id
+            for line, row in rows:
+                report["rows"] += 1
+                try:
+                    record = _user_record(row, next_id)
+                    if record["user_id"] in ids:
+                        raise ValueError(f"user_id {record['user_id']} уже занят")
+                    if record["username"] in names:
+                        raise ValueError(
+                            f"имя пользователя '{record['username']}' уже занято"
+                        )
+                except ValueError as exc:
+                    _reject(report, line, exc)
+                    continue
+                ids.add(record["user_id"])
+                names.add(record["username"])
+                next_id = max(next_id, record["user_id"] + 1)
+                report["records"] += 1
+                yield record
+            if report["invalid"]:
+                raise BulkImportError("users", report["invalid"], report)
+
+        return _finish(report, records(), db.append_users_raw)
+
+
+def import_portfolios(
+    rows: Iterable[NumberedRow],
+    dry_run: bool = False,
+    batch_size: int = BULK_BATCH_SIZE,
+) -> Dict[str, Any]:
+    """Импорт портфелей (строка на кошелёк), всё или ничего.
+
+    Строки одного портфеля должны идти подряд — так их пишет экспорт;
+    портфель собирается из них и проверяется целиком. Пользователь
+    должен существовать и ещё не иметь портфеля. Блокировка
+    portfolios.json держится весь импорт: сделка не создаст портфель
+    импортируемому пользователю между проверкой и записью.
+    """
+    db = DatabaseManager()
+    report = _new_report("portfolios", dry_run, batch_size)
+    with LockManager().structural(), db.locked(db.portfolios_file):
+        users = {item["user_id"] for item in db.iter_users_raw()}
+        taken = {item["user_id"] for item in db.iter_portfolios_raw()}
+
+        def build(group: List[NumberedRow]) -> Optional[Dict[str, Any]]:
+            first_line, first = group[0]
+            wallets: Dict[str, Dict[str, float]] = {}
+            valid = True
+            try:
+                user_id = _integer(first, "user_id", FIRST_USER_ID)
+                version = _integer(first, "portfolio_version", FIRST_PORTFOLIO_VERSION)
+                if user_id not in users:
+                    raise ValueError(f"пользователь id={user_id} не найден")
+                if user_id in taken:
+                    raise ValueError(f"у пользователя id={user_id} уже есть портфель")
+            except ValueError as exc:
+                _reject(report, first_line, exc)
+                return None
+            taken.add(user_id)
+            for line, row in group:
+                try:
+                    if _integer(row, "portfolio_version", 0) != version:
+                        raise ValueError("разные версии в строках одного портфеля")
+                    wallet = _wallet(row)
+                    if wallet is None:
+                        if len(group) > 1:
+                            raise ValueError("строка без валюты среди кошельков")
+                        continue
+                    if wallet[0] in wallets:
+                        raise ValueError(f"кошелёк {wallet[0]} повторяется")
+                    wallets[wallet[0]] = {"balance": wallet[1]}
+                except (ValueError, CurrencyNotFoundError) as exc:
+                    _reject(report, line, exc)
+                    valid = False
+            if not valid:
+                return None
+            report["records"] += 1
+            return {"user_id": user_id, "version": version, "wallets": wallets}
+
+        def records() -> Iterator[Dict[str, Any]]:
+            group: List[NumberedRow] = []
+            for line, row in rows:
+                report["rows"] += 1
+                if group and row.get("user_id") != group[0][1].get("user_id"):
+                    record = build(group)
+                    if record is not None:
+                        yield record
+                    group = []
+                group.append((line, row))
+            if group:
+                record = build(group)
+                if record is not None:
+                    yield record
+            if report["invalid"]:
+                raise BulkImportError("portfolios", report["invalid"], report)
+
+        return _finish(report, records(), db.append_portfolios_raw)
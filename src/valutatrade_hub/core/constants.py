@@ -15,6 +15,22 @@ USERS_FILE = DATA_DIR / "users.json"
 PORTFOLIOS_FILE = DATA_DIR / "portfolios.json"
 RATES_FILE = DATA_DIR / "rates.json"
 EXCHANGE_RATES_HISTORY_FILE = DATA_DIR / "exchange_rates.json"
+HISTORY_ARCHIVE_FILE = DATA_DIR / "exchange_rates_archive.bin"
+HISTORY_DIR = DATA_DIR / "history"  # сегменты истории + manifest.json
+ORDERS_FILE = DATA_DIR / "orders.json"
+ORDERS_JOURNAL_FILE = DATA_DIR / "orders.journal"  # снятые со стаканов заявки
+ALERTS_FILE = DATA_DIR / "alerts.json"
+ALERTS_JOURNAL_FILE = DATA_DIR / "alerts.journal"  # снятые (сработавшие) подписки
+ALERTS_OUTBOX_DIR = DATA_DIR / "alerts_outbox"  # уведомления: файл на пользователя
+PORTFOLIOS_JOURNAL_FILE = DATA_DIR / "portfolios.journal"
+IDEMPOTENCY_FILE = DATA_DIR / "idempotency.json"
+IDEMPOTENCY_JOURNAL_FILE = DATA_DIR / "idempotency.journal"  # ключи после снимка
+CHANGES_FILE = DATA_DIR / "changes.jsonl"  # лента изменений (CDC)
+CHANGES_OFFSETS_FILE = DATA_DIR / "changes_offsets.json"  # позиции потребителей
+
+# fsync файла и каталога при каждой записи JSON-хранилища: надёжнее при
+# сбое питания, но заметно медленнее
+DB_FSYNC_WRITES = False
 
 # ===== Пользователи =====
 
@@ -37,6 +53,53 @@ RATES_TO_USD: Dict[str, float] = {
 DEFAULT_WALLET_BALANCE = 0.0
 MIN_TRANSACTION_AMOUNT = 0.0
 
+# ===== Портфели: оптимистичные блокировки =====
+
+FIRST_PORTFOLIO_VERSION = 0             # версия ещё не сохранённого портфеля
+TRADE_MAX_RETRIES = 20                  # попыток сделки при конфликте версий
+TRADE_RETRY_BACKOFF_SECONDS = 0.002     # базовая пауза, растёт экспоненциально
+TRADE_RETRY_MAX_BACKOFF_SECONDS = 0.25  # предел паузы между попытками
+TRADE_RETRY_ACTION = "TRADE_RETRY"      # метрика конфликтов версий (пауза повтора)
+
+# Хранение портфелей:
+# - "snapshot" — каждая запись переписывает portfolios.json целиком;
+# - "journal"  — запись дописывает компактную строку в журнал
+#   (portfolios.journal, групповой fsync), portfolios.json — снимок,
+#   который пересобирается, когда журнал вырастает больше порога.
+PORTFOLIO_STORAGE_MODES = ("snapshot", "journal")
+PORTFOLIO_STORAGE = "snapshot"
+PORTFOLIO_JOURNAL_FSYNC = True
+PORTFOLIO_SNAPSHOT_BYTES = 1_048_576  # размер журнала, после которого — снимок
+
+# ===== Ключи идемпотентности сделок =====
+
+IDEMPOTENCY_MAX_KEYS = 1000           # сколько последних ключей помнить
+IDEMPOTENCY_TTL_SECONDS = 24 * 3600   # сколько помнить ключ
+IDEMPOTENCY_PENDING_SECONDS = 60      # сколько ключ без результата считается занятым
+IDEMPOTENCY_SNAPSHOT_BYTES = 262_144  # размер журнала ключей, после которого — снимок
+
+# ===== Экспорт и импорт пользователей и портфелей =====
+
+BULK_KINDS = ("users", "portfolios")
+BULK_FORMATS = ("jsonl", "csv")
+BULK_BATCH_SIZE = 10_000        # строк импорта за одну запись в файл
+BULK_MAX_REPORTED_ERRORS = 20   # сколько ошибок проверки показывать
+# Поля строк экспорта/импорта (порядок = колонки CSV). Портфель — по
+# строке на кошелёк; портфель без кошельков — одна строка с пустой валютой.
+USER_FIELDS = ("user_id", "username", "hashed_password", "salt", "registration_date")
+PORTFOLIO_FIELDS = ("user_id", "portfolio_version", "currency", "balance")
+
+# ===== Лента изменений (CDC) =====
+
+CHANGE_USER_CREATED = "user.created"
+CHANGE_USER_UPDATED = "user.updated"
+CHANGE_USER_DELETED = "user.deleted"
+CHANGE_PORTFOLIO_UPDATED = "portfolio.updated"
+CHANGE_RATES_UPDATED = "rates.updated"
+CHANGE_TRADE_EXECUTED = "trade.executed"
+CHANGE_BULK_IMPORTED = "bulk.imported"  # после него нужен полный снимок
+CHANGES_POLL_LIMIT = 1000       # событий за один poll() по умолчанию
+
 
 class FiatCurrencyConfig(TypedDict):
     kind: Literal["fiat"]
@@ -79,11 +142,74 @@ CURRENCY_REGISTRY: Dict[str, CurrencyConfig] = {
     },
 }
 
+# ===== Лимитные заявки =====
+
+ORDER_SIDE_BUY = "buy"
+ORDER_SIDE_SELL = "sell"
+ORDER_SIDES = (ORDER_SIDE_BUY, ORDER_SIDE_SELL)
+FIRST_ORDER_ID = 1
+ORDERS_SNAPSHOT_BYTES = 262_144  # размер журнала заявок, после которого — снимок
+
+# ===== Ценовые уведомления =====
+
+ALERT_DIRECTION_ABOVE = "above"
+ALERT_DIRECTION_BELOW = "below"
+ALERT_DIRECTIONS = (ALERT_DIRECTION_ABOVE, ALERT_DIRECTION_BELOW)
+FIRST_ALERT_ID = 1
+ALERTS_SNAPSHOT_BYTES = 262_144  # размер журнала подписок, после которого — снимок
+
 # ===== Кэш курсов =====
 
 RATE_FRESHNESS_SECONDS = 300  # 5 минут
 RATES_SOURCE_NAME = "ParserServiceStub"
 
+# ===== История курсов: сегменты, архив, хранение =====
+
+HISTORY_SEGMENT_GRANULARITIES = ("daily", "monthly")
+HISTORY_SEGMENT_GRANULARITY = "monthly"
+HISTORY_ARCHIVE_CODEC = "lzma"      # lzma или zlib
+HISTORY_ARCHIVE_CHUNK_SIZE = 4096   # записей в одном сжатом чанке
+HISTORY_RETENTION_ACTIONS = ("archive", "drop")
+HISTORY_RETENTION_DAYS = 90         # сегменты старше — в архив или удалить
+HISTORY_RETENTION_ACTION = "archive"
+HISTORY_MIGRATION_BATCH = 50_000    # записей за проход при переносе в сегменты
+
+# ===== HTTP API =====
+
+API_HOST = "127.0.0.1"
+API_PORT = 8000
+API_WORKERS = 16                   # потоков обработки соединений
+API_IDLE_POLL_SECONDS = 0.05       # шаг проверки очереди простаивающим соединением
+API_SESSION_TTL_SECONDS = 3600     # время жизни токена сессии
+
+# ===== Метрики операций (log_action) =====
+
+METRICS_FILE = DATA_DIR / "metrics.json"     # накопленные гистограммы всех процессов
+METRICS_PROM_FILE = LOG_DIR / "metrics.prom"  # текстовый формат Prometheus
+METRICS_FLUSH_SECONDS = 10.0                 # как часто процесс сбрасывает метрики
+# верхние границы корзин гистограммы длительности, секунды
+METRICS_BUCKETS_SECONDS = (
+    0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0,
+)
+
+# ===== Трассировка запросов =====
+
+# сводка по каждой команде CLI и запросу API (участки, ввод-вывод, кеш)
+# пишется в журнал операций с request_id
+TRACING_ENABLED = True
+
+# ===== Профилирование (по запросу) =====
+
+PROFILE_ENV = "VALUTATRADE_PROFILE"  # "all" или список режимов через запятую
+PROFILE_MODES = ("cpu", "memory", "io")
+PROFILE_DIR = LOG_DIR / "profiles"   # .pstats и JSON-отчёты по командам
+PROFILE_TOP_ALLOCATIONS = 10         # строк в отчёте tracemalloc
+PROFILE_TOP_FUNCTIONS = 10           # функций в отчёте cProfile
+
 # ===== Логирование =====
 
 LOG_FILE = LOG_DIR / "actions.log"
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+from datetime import datetime
+from typing import Any, Dict, Optional
+
 
 class InsufficientFundsError(Exception):
     """Недостаточно средств на кошельке."""
@@ -29,3 +32,60 @@ class ApiRequestError(Exception):
     def __init__(self, reason: str) -> None:
         self.reason = reason
         super().__init__(f"Ошибка при обращении к внешнему API: {reason}")
+
+
+class RateHistoryNotFoundError(Exception):
+    """В истории курсов нет наблюдений пары на запрошенный момент."""
+
+    def __init__(self, from_code: str, to_code: str, moment: datetime) -> None:
+        self.from_code = from_code
+        self.to_code = to_code
+        self.moment = moment
+        super().__init__(
+            f"Нет истории курса {from_code}->{to_code} на {moment.isoformat()}."
+        )
+
+
+class PortfolioConflictError(Exception):
+    """Портфель изменён параллельно: версия при сохранении не совпала."""
+
+    def __init__(self, user_id: int, expected: int, actual: int) -> None:
+        self.user_id = user_id
+        self.expected = expected
+        self.actual = actual
+        super().__init__(
+            f"Портфель пользователя id={user_id} изменён параллельно "
+            f"(ожидалась версия {expected}, в хранилище {actual})."
+        )
+
+
+class IdempotencyKeyInUseError(Exception):
+    """Сделка с этим ключом идемпотентности ещё выполняется."""
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        super().__init__(
+            f"Запрос с ключом идемпотентности '{key}' ещё выполняется, "
+            "повторите его позже."
+        )
+
+
+class BulkImportError(Exception):
+    """Импорт отклонён: в данных есть ошибки проверки, ничего не записано.
+
+    report — отчёт импорта с первыми ошибками (номера строк), как у
+    успешного импорта.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        errors: int,
+        report: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.kind = kind
+        self.errors = errors
+        self.report = report
+        super().__init__(
+            f"Импорт {kind} отклонён: ошибок проверки {errors}, данные не изменены."
+        )
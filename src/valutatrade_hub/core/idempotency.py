@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .constants import (
+    IDEMPOTENCY_MAX_KEYS,
+    IDEMPOTENCY_PENDING_SECONDS,
+    IDEMPOTENCY_TTL_SECONDS,
+)
+from .exceptions import IdempotencyKeyInUseError
+
+# IdempotencyCache
+
+
+class IdempotencyCache:
+    """Результаты сделок по ключам идемпотентности.
+
+    LRU ограниченного размера: при переполнении вытесняется давно не
+    использованный ключ, а ключи старше ttl_seconds считаются забытыми.
+    Ключи действуют в пределах пользователя. Вместе с результатом
+    хранится сам запрос: тот же ключ с другими параметрами — ошибка,
+    а не повтор. Запись без результата ("result": None) — ключ занят
+    выполняющейся сделкой; через pending_seconds такая отметка
+    считается брошенной (процесс упал до коммита).
+
+    Вытесненные ключи копятся до take_removed(): хранилище записывает
+    их удаление в журнал, иначе повтор журнала вернул бы их.
+    """
+
+    def __init__(
+        self,
+        entries: Optional[Dict[str, Dict[str, Any]]] = None,
+        max_keys: int = IDEMPOTENCY_MAX_KEYS,
+        ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS,
+        pending_seconds: float = IDEMPOTENCY_PENDING_SECONDS,
+    ) -> None:
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict(entries or {})
+        self._max_keys = max_keys
+        self._ttl_seconds = ttl_seconds
+        self._pending_seconds = pending_seconds
+        self._removed: List[str] = []
+
+    @classmethod
+    def wrap(
+        cls,
+        entries: "OrderedDict[str, Dict[str, Any]]",
+        **options: Any,
+    ) -> "IdempotencyCache":
+        """Кеш поверх entries без копии: изменения видны владельцу словаря.
+
+        Так claim меняет разобранное хранилищем состояние на месте, а не
+        копирует все ключи на каждую сделку.
+        """
+        cache = cls(**options)
+        cache._entries = entries
+        return cache
+
+    @staticmethod
+    def scoped(user_id: int, key: str) -> str:
+        return f"{user_id}:{key}"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def take_removed(self) -> List[str]:
+        """Ключи, вытесненные с прошлого вызова (по TTL и по размеру)."""
+        removed, self._removed = self._removed, []
+        return removed
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return now - entry["stored_at"] > self._ttl_seconds
+
+    def _remove(self, scoped: str) -> None:
+        del self._entries[scoped]
+        self._removed.append(scoped)
+
+    def evict_expired(self, now: Optional[float] = None) -> int:
+        """Удалить ключи старше TTL с начала LRU; вернуть их число.
+
+        Просмотр останавливается на первом живом ключе: O(k), а не O(n).
+        Ключ, поднятый get() в конец, мог сохраниться раньше соседей —
+        он удалится позже, а до тех пор get() сам проверяет его возраст.
+        """
+        now = time.time() if now is None else now
+        count = 0
+        while self._entries:
+            scoped, entry = next(iter(self._entries.items()))
+            if not self._expired(entry, now):
+                break
+            self._remove(scoped)
+            count += 1
+        return count
+
+    def get(
+        self,
+        user_id: int,
+        key: str,
+        request: Dict[str, Any],
+        now: Optional[float] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Сохранённый результат по ключу или None, если ключ новый.
+
+        Ключ, занятый выполняющейся сделкой, —
+        IdempotencyKeyInUseError; брошенная отметка — как новый ключ.
+        """
+        now = time.time() if now is None else now
+        self.evict_expired(now)
+        scoped = self.scoped(user_id, key)
+        entry = self._entries.get(scoped)
+        if entry is None:
+            return None
+        if self._expired(entry, now):
+            self._remove(scoped)
+            return None
+        if entry["request"] != request:
+            raise ValueError(
+                f"Ключ идемпотентности '{key}' уже использован для другой операции."
+            )
+        if entry["result"] is None:
+            if now - entry["stored_at"] <= self._pending_seconds:
+                raise IdempotencyKeyInUseError(key)
+            return None
+        self._entries.move_to_end(scoped)
+        return dict(entry["result"])
+
+    def put(
+        self,
+        user_id: int,
+        key: str,
+        request: Dict[str, Any],
+        result: Optional[Dict[str, Any]],
+        now: Optional[float] = None,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Запомнить результат (None — занять ключ); вернуть (ключ, запись)
+        для хранилища."""
+        scoped = self.scoped(user_id, key)
+        entry = {
+            "request": request,
+            "result": result,
+            "stored_at": time.time() if now is None else now,
+        }
+        self._entries[scoped] = entry
+        self._entries.move_to_end(scoped)
+        while len(self._entries) > self._max_keys:
+            self._remove(next(iter(self._entries)))
+        return scoped, entry
+
+    # ---- Для JSON ----
+    def to_dict(self) -> dict:
+        # порядок ключей — порядок LRU (первый вытесняется первым)
+        return {"entries": dict(self._entries)}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "IdempotencyCache":
+        return cls(entries=data.get("entries", {}))
@@ -8,6 +8,7 @@ from typing import Dict, Optional
 from .constants import (
     DEFAULT_BASE_CURRENCY,
     DEFAULT_WALLET_BALANCE,
+    FIRST_PORTFOLIO_VERSION,
     MIN_PASSWORD_LENGTH,
     MIN_TRANSACTION_AMOUNT,
     RATES_TO_USD,
@@ -183,10 +184,12 @@ class Portfolio:
         self,
         user: User,
         wallets: Optional[Dict[str, Wallet]] = None,
+        version: int = FIRST_PORTFOLIO_VERSION,
     ) -> None:
         self._user = user
         self._user_id = user.user_id
         self._wallets: Dict[str, Wallet] = wallets or {}
+        self.version = version
 
     def add_currency(self, currency_code: str) -> Wallet:
         """Добавляет новый кошелёк, если его ещё нет."""
@@ -243,10 +246,26 @@ class Portfolio:
         """Копия словаря кошельков."""
         return dict(self._wallets)
 
+    @property
+    def version(self) -> int:
+        """Версия записи в хранилище, с которой портфель был загружен.
+
+        Растёт на 1 при каждом сохранении; save_portfolio сравнивает её
+        с версией в хранилище (compare-and-swap).
+        """
+        return self._version
+
+    @version.setter
+    def version(self, value: int) -> None:
+        if not isinstance(value, int) or value < FIRST_PORTFOLIO_VERSION:
+            raise ValueError("Версия портфеля должна быть неотрицательным целым.")
+        self._version = value
+
     # ---- Для JSON ----
     def to_dict(self) -> dict:
         return {
             "user_id": self._user_id,
+            "version": self._version,
             "wallets": {
                 code: {"balance": wallet.balance}
                 for code, wallet in self._wallets.items()
@@ -262,4 +281,8 @@ class Portfolio:
                 currency_code=code,
                 balance=w_data.get("balance", DEFAULT_WALLET_BALANCE),
             )
-        return cls(user=user, wallets=wallets_dict)
+        return cls(
+            user=user,
+            wallets=wallets_dict,
+            version=data.get("version", FIRST_PORTFOLIO_VERSION),
+        )
@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .constants import (
+    DEFAULT_BASE_CURRENCY,
+    FIRST_ORDER_ID,
+    MIN_TRANSACTION_AMOUNT,
+    ORDER_SIDE_BUY,
+    ORDER_SIDES,
+)
+
+# LimitOrder, OrderBook, OrderBooks
+
+
+class LimitOrder:
+    """Лимитная заявка: купить/продать amount валюты при достижении цены."""
+
+    def __init__(
+        self,
+        order_id: int,
+        user_id: int,
+        side: str,
+        currency_code: str,
+        amount: float,
+        limit_price: float,
+        base_currency: str = DEFAULT_BASE_CURRENCY,
+        created_at: Optional[datetime] = None,
+    ) -> None:
+        side = side.strip().lower()
+        if side not in ORDER_SIDES:
+            raise ValueError(
+                f"Сторона заявки должна быть одной из: {', '.join(ORDER_SIDES)}."
+            )
+        if amount <= MIN_TRANSACTION_AMOUNT:
+            raise ValueError("'amount' должен быть положительным числом.")
+        if limit_price <= 0:
+            raise ValueError("'price' должен быть положительным числом.")
+
+        self.order_id = order_id
+        self.user_id = user_id
+        self.side = side
+        self.currency_code = currency_code.strip().upper()
+        self.base_currency = base_currency.strip().upper()
+        self.amount = float(amount)
+        self.limit_price = float(limit_price)
+        self.created_at = created_at or datetime.utcnow()
+
+    @property
+    def pair(self) -> str:
+        return f"{self.currency_code}_{self.base_currency}"
+
+    def is_triggered(self, rate: float) -> bool:
+        """buy — курс опустился до лимита, sell — поднялся до лимита."""
+        if self.side == ORDER_SIDE_BUY:
+            return rate <= self.limit_price
+        return rate >= self.limit_price
+
+    # ---- Для JSON ----
+    def to_dict(self) -> dict:
+        return {
+            "order_id": self.order_id,
+            "user_id": self.user_id,
+            "side": self.side,
+            "currency_code": self.currency_code,
+            "base_currency": self.base_currency,
+            "amount": self.amount,
+            "limit_price": self.limit_price,
+            "created_at": self.created_at.isoformat(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LimitOrder":
+        return cls(
+            order_id=data["order_id"],
+            user_id=data["user_id"],
+            side=data["side"],
+            currency_code=data["currency_code"],
+            base_currency=data.get("base_currency", DEFAULT_BASE_CURRENCY),
+            amount=data["amount"],
+            limit_price=data["limit_price"],
+            created_at=datetime.fromisoformat(data["created_at"]),
+        )
+
+
+class OrderBook:
+    """Стакан заявок одной пары.
+
+    Каждая сторона — отсортированный массив ключей и параллельный массив
+    заявок. Ключи подобраны так, что сработавшие заявки всегда лежат
+    в хвосте массива:
+
+    - buy: ключ (limit_price, order_id), срабатывает при limit_price >= rate;
+    - sell: ключ (-limit_price, order_id), срабатывает при limit_price <= rate.
+
+    Поэтому поиск — один bisect, а удаление — срез хвоста длиной k.
+    """
+
+    def __init__(self, pair: str) -> None:
+        self.pair = pair
+        self._keys: Dict[str, List[Tuple[float, int]]] = {
+            side: [] for side in ORDER_SIDES
+        }
+        self._orders: Dict[str, List[LimitOrder]] = {
+            side: [] for side in ORDER_SIDES
+        }
+
+    @staticmethod
+    def _sort_key(order: LimitOrder) -> Tuple[float, int]:
+        if order.side == ORDER_SIDE_BUY:
+            return order.limit_price, order.order_id
+        return -order.limit_price, order.order_id
+
+    @staticmethod
+    def _threshold(side: str, rate: float) -> Tuple[float]:
+        return (rate,) if side == ORDER_SIDE_BUY else (-rate,)
+
+    def add(self, order: LimitOrder) -> None:
+        key = self._sort_key(order)
+        keys = self._keys[order.side]
+        idx = bisect_right(keys, key)
+        keys.insert(idx, key)
+        self._orders[order.side].insert(idx, order)
+
+    def remove(self, order: LimitOrder) -> bool:
+        key = self._sort_key(order)
+        keys = self._keys[order.side]
+        idx = bisect_left(keys, key)
+        if idx < len(keys) and keys[idx] == key:
+            del keys[idx]
+            del self._orders[order.side][idx]
+            return True
+        return False
+
+    def pop_triggered(self, rate: float) -> List[LimitOrder]:
+        """Снять со стакана все заявки, пересечённые курсом rate.
+
+        Стоимость — O(log n + k), где k — число сработавших заявок.
+        """
+        triggered: List[LimitOrder] = []
+        for side in ORDER_SIDES:
+            keys = self._keys[side]
+            idx = bisect_left(keys, self._threshold(side, rate))
+            if idx == len(keys):
+                continue
+            # самые «агрессивные» заявки — в конце хвоста
+            triggered.extend(reversed(self._orders[side][idx:]))
+            del keys[idx:]
+            del self._orders[side][idx:]
+        return triggered
+
+    def orders(self) -> List[LimitOrder]:
+        return [order for side in ORDER_SIDES for order in self._orders[side]]
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._keys.values())
+
+    # ---- Для JSON ----
+    def to_dict(self) -> dict:
+        return {
+            side: [order.to_dict() for order in self._orders[side]]
+            for side in ORDER_SIDES
+        }
+
+    @classmethod
+    def from_dict(cls, pair: str, data: dict) -> "OrderBook":
+        book = cls(pair)
+        for side in ORDER_SIDES:
+            orders = [LimitOrder.from_dict(item) for item in data.get(side, [])]
+            # в файле стороны уже отсортированы — timsort сделает это за O(n)
+            orders.sort(key=cls._sort_key)
+            book._orders[side] = orders
+            book._keys[side] = [cls._sort_key(order) for order in orders]
+        return book
+
+
+class OrderBooks:
+    """Набор стаканов по парам + индекс order_id -> заявка."""
+
+    def __init__(
+        self,
+        books: Optional[Dict[str, OrderBook]] = None,
+        next_id: int = FIRST_ORDER_ID,
+    ) -> None:
+        self._books: Dict[str, OrderBook] = books or {}
+        self._next_id = next_id
+        self._by_id: Dict[int, LimitOrder] = {
+            order.order_id: order
+            for book in self._books.values()
+            for order in book.orders()
+        }
+
+    def place(
+        self,
+        user_id: int,
+        side: str,
+        currency_code: str,
+        amount: float,
+        limit_price: float,
+        base_currency: str = DEFAULT_BASE_CURRENCY,
+    ) -> LimitOrder:
+        order = LimitOrder(
+            order_id=self._next_id,
+            user_id=user_id,
+            side=side,
+            currency_code=currency_code,
+            amount=amount,
+            limit_price=limit_price,
+            base_currency=base_currency,
+        )
+        self._next_id += 1
+        book = self._books.get(order.pair)
+        if book is None:
+            book = self._books[order.pair] = OrderBook(order.pair)
+        book.add(order)
+        self._by_id[order.order_id] = order
+        return order
+
+    def cancel(self, user_id: int, order_id: int) -> LimitOrder:
+        order = self._by_id.get(order_id)
+        if order is None or order.user_id != user_id:
+            raise ValueError(f"Заявка #{order_id} не найдена.")
+        self.discard(order_id)
+        return order
+
+    def discard(self, order_id: int) -> Optional[LimitOrder]:
+        """Снять заявку по id (без проверки владельца); нет заявки — None."""
+        order = self._by_id.pop(order_id, None)
+        if order is not None:
+            self._books[order.pair].remove(order)
+        return order
+
+    def orders_for_user(self, user_id: int) -> List[LimitOrder]:
+        orders = [o for o in self._by_id.values() if o.user_id == user_id]
+        return sorted(orders, key=lambda o: o.order_id)
+
+    def match(self, rates: Dict[str, float]) -> List[LimitOrder]:
+        """Снять со стаканов заявки, сработавшие на новых курсах.
+
+        rates: {"BTC_USD": 55000.0, ...}. Пары без стакана пропускаются.
+        """
+        triggered: List[LimitOrder] = []
+        for pair, rate in rates.items():
+            book = self._books.get(pair)
+            if book is None:
+                continue
+            for order in book.pop_triggered(rate):
+                self._by_id.pop(order.order_id, None)
+                triggered.append(order)
+        return triggered
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    # ---- Для JSON ----
+    def to_dict(self) -> dict:
+        return {
+            "next_id": self._next_id,
+            "books": {
+                pair: book.to_dict()
+                for pair, book in sorted(self._books.items())
+                if len(book)
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OrderBooks":
+        books = {
+            pair: OrderBook.from_dict(pair, raw)
+            for pair, raw in data.get("books", {}).items()
+        }
+        return cls(books=books, next_id=data.get("next_id", FIRST_ORDER_ID))
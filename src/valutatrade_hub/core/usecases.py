@@ -1,32 +1,85 @@
 from __future__ import annotations
 
+import random
+import time
 from datetime import datetime
-from typing import Dict, List
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
 from .currencies import get_currency
+from .exceptions import (
+    ApiRequestError,
+    CurrencyNotFoundError,
+    InsufficientFundsError,
+    PortfolioConflictError,
+)
 from ..decorators import log_action
+from ..tracing import traced
 
 
 from .constants import (
+    BULK_BATCH_SIZE,
+    BULK_KINDS,
+    CHANGE_TRADE_EXECUTED,
     DEFAULT_BASE_CURRENCY,
     MIN_PASSWORD_LENGTH,
+    ORDER_SIDE_BUY,
+    TRADE_MAX_RETRIES,
+    TRADE_RETRY_ACTION,
+    TRADE_RETRY_BACKOFF_SECONDS,
+    TRADE_RETRY_MAX_BACKOFF_SECONDS,
 )
 from .models import User, Portfolio
 
 from .utils import (
+    append_alert_notifications,
+    claim_idempotency_key,
     generate_salt,
     generate_user_id,
     get_rate,
+    get_rate_asof,
+    load_alert_books,
+    load_order_books,
     load_portfolio_for_user,
     load_users,
+    pop_alert_notifications,
+    record_change,
+    release_idempotency_key,
+    remember_idempotent_result,
+    save_alert_books,
+    save_order_books,
     save_portfolio,
+    save_removed_alerts,
+    save_removed_orders,
     save_users,
+    transaction,
 )
 
+if TYPE_CHECKING:
+    from ..infra.locks import LockManager
+
+
+def _locks() -> "LockManager":
+    """Блокировки (и их настройки) загружаются при первой операции, а не
+    при импорте: командам чтения они не нужны."""
+    from ..infra.locks import LockManager
+
+    return LockManager()
+
 
 # ===== Пользователи =====
 
 @log_action("REGISTER", verbose=False)
+@traced()
 def register_user(username: str, password: str) -> User:
     username = username.strip()
     if not username:
@@ -37,35 +90,39 @@ def register_user(username: str, password: str) -> User:
             f"Пароль должен быть не короче {MIN_PASSWORD_LENGTH} символов."
         )
 
-    users = load_users()
-    for user in users:
-        if user.username == username:
-            raise ValueError(f"Имя пользователя '{username}' уже занято.")
-
-    user_id = generate_user_id(users)
-    salt = generate_salt()
-    registration_date = datetime.utcnow()
-
-    # временный пустой хеш — поменяем через change_password
-    new_user = User(
-        user_id=user_id,
-        username=username,
-        hashed_password="",
-        salt=salt,
-        registration_date=registration_date,
-    )
-    new_user.change_password(password)
+    # новый пользователь меняет общую структуру (users.json + портфель);
+    # оба файла записываются одним коммитом
+    with _locks().structural(), transaction():
+        users = load_users()
+        for user in users:
+            if user.username == username:
+                raise ValueError(f"Имя пользователя '{username}' уже занято.")
+
+        user_id = generate_user_id(users)
+        salt = generate_salt()
+        registration_date = datetime.utcnow()
+
+        # временный пустой хеш — поменяем через change_password
+        new_user = User(
+            user_id=user_id,
+            username=username,
+            hashed_password="",
+            salt=salt,
+            registration_date=registration_date,
+        )
+        new_user.change_password(password)
 
-    users.append(new_user)
-    save_users(users)
+        users.append(new_user)
+        save_users(users)
 
-    # создаём пустой портфель
-    portfolio = Portfolio(user=new_user)
-    save_portfolio(portfolio)
+        # создаём пустой портфель
+        portfolio = Portfolio(user=new_user)
+        save_portfolio(portfolio)
 
     return new_user
 
 @log_action("LOGIN", verbose=False)
+@traced()
 def login_user(username: str, password: str) -> User:
     username = username.strip()
     users = load_users()
@@ -82,6 +139,7 @@ def login_user(username: str, password: str) -> User:
 # ===== Портфель =====
 
 
+@traced()
 def get_portfolio_summary(
     user: User,
     base_currency: str = DEFAULT_BASE_CURRENCY,
@@ -123,99 +181,239 @@ def get_portfolio_summary(
 
 # ===== Операции buy / sell =====
 
+
+def _retry_on_conflict(operation: Callable[[], Dict]) -> Dict:
+    """Выполнить операцию над портфелем, повторяя её при конфликте версий.
+
+    Портфели сохраняются через compare-and-swap (save_portfolio): если
+    другой поток или процесс успел записать портфель того же
+    пользователя — при сохранении или к моменту коммита, — операция
+    целиком (вместе со своей транзакцией) перечитывает портфель и
+    повторяется. Пауза перед повтором растёт экспоненциально, со
+    случайным разбросом.
+
+    Каждый конфликт попадает в метрику TRADE_RETRY_ACTION: повтор — как
+    успешное наблюдение длиной в паузу, исчерпанные попытки — как ошибка.
+    """
+    attempt = 0
+    while True:
+        try:
+            return operation()
+        except PortfolioConflictError:
+            from ..metrics import MetricsRegistry
+
+            attempt += 1
+            if attempt >= TRADE_MAX_RETRIES:
+                MetricsRegistry().observe(TRADE_RETRY_ACTION, 0.0, ok=False)
+                raise
+            delay = random.uniform(
+                0,
+                min(
+                    TRADE_RETRY_BACKOFF_SECONDS * (2 ** attempt),
+                    TRADE_RETRY_MAX_BACKOFF_SECONDS,
+                ),
+            )
+            MetricsRegistry().observe(TRADE_RETRY_ACTION, delay)
+            time.sleep(delay)
+
+
+def _record_trade(user: User, request: Dict, balances: Dict, rate: float) -> None:
+    """Событие о сделке в ленту изменений — тем же коммитом, что портфель."""
+    record_change(
+        CHANGE_TRADE_EXECUTED,
+        {
+            "user_id": user.user_id,
+            **request,
+            "rate": rate,
+            "old_balance": balances["old_balance"],
+            "new_balance": balances["new_balance"],
+        },
+    )
+
+
+def _run_trade(operation: Callable[[], Dict]) -> Dict:
+    """Одна попытка сделки — одна transaction(): курс-заглушка
+    (rates.json), портфель и события пишутся одним коммитом. Конфликт
+    версий повторяет попытку целиком (_retry_on_conflict)."""
+
+    def attempt() -> Dict:
+        with transaction():
+            return operation()
+
+    return _retry_on_conflict(attempt)
+
+
+def _idempotent(
+    user: User,
+    idempotency_key: Optional[str],
+    request: Dict,
+    operation: Callable[[], Dict],
+) -> Dict:
+    """Выполнить сделку не более одного раза на ключ идемпотентности.
+
+    Повтор с тем же ключом (например, клиент не дождался ответа и
+    отправил запрос снова) возвращает сохранённый результат первой
+    попытки, ничего не записывая. Ключ занимается до сделки под
+    короткой блокировкой, а результат пишется тем же коммитом, что и
+    сделка; пока она идёт, запрос с тем же ключом получает
+    IdempotencyKeyInUseError. Если сделка не удалась, ключ
+    освобождается. Без ключа сделка просто выполняется.
+    """
+    if idempotency_key is None:
+        return _run_trade(operation)
+
+    stored = claim_idempotency_key(user.user_id, idempotency_key, request)
+    if stored is not None:
+        stored["updated_at"] = datetime.fromisoformat(stored["updated_at"])
+        return stored
+
+    def remembered() -> Dict:
+        result = operation()
+        remember_idempotent_result(
+            user.user_id,
+            idempotency_key,
+            request,
+            dict(result, updated_at=result["updated_at"].isoformat()),
+        )
+        return result
+
+    try:
+        return _run_trade(remembered)
+    except BaseException:
+        release_idempotency_key(user.user_id, idempotency_key)
+        raise
+
+
 @log_action("BUY", verbose=True)
+@traced()
 def buy_currency(
     user: User,
     currency_code: str,
     amount: float,
     base_currency: str = DEFAULT_BASE_CURRENCY,
+    idempotency_key: Optional[str] = None,
 ) -> Dict:
     if amount <= 0:
         raise ValueError("'amount' должен быть положительным числом.")
     get_currency(currency_code)
-    portfolio = load_portfolio_for_user(user)
     code = currency_code.upper()
-
-    try:
-        wallet = portfolio.get_wallet(code)
-        old_balance = wallet.balance
-    except KeyError:
-        wallet = portfolio.add_currency(code)
-        old_balance = 0.0
-
-    wallet.deposit(amount)
-    new_balance = wallet.balance
-
-    # оценочная стоимость покупки в базовой валюте
-    rate, updated_at = get_rate(code, base_currency)
-    estimated_value = amount * rate
-
-    save_portfolio(portfolio)
-
-    return {
+    request = {
+        "action": "buy",
         "currency": code,
         "amount": amount,
-        "old_balance": old_balance,
-        "new_balance": new_balance,
-        "rate": rate,
         "base_currency": base_currency.upper(),
-        "estimated_value": estimated_value,
-        "updated_at": updated_at,
     }
 
+    def apply() -> Dict:
+        portfolio = load_portfolio_for_user(user)
+        try:
+            wallet = portfolio.get_wallet(code)
+            old_balance = wallet.balance
+        except KeyError:
+            wallet = portfolio.add_currency(code)
+            old_balance = 0.0
+
+        wallet.deposit(amount)
+        save_portfolio(portfolio)
+        return {"old_balance": old_balance, "new_balance": wallet.balance}
+
+    def trade() -> Dict:
+        rate, updated_at = get_rate(code, base_currency)
+        balances = apply()
+        _record_trade(user, request, balances, rate)
+        return {
+            "currency": code,
+            "amount": amount,
+            "old_balance": balances["old_balance"],
+            "new_balance": balances["new_balance"],
+            "rate": rate,
+            "base_currency": base_currency.upper(),
+            "estimated_value": amount * rate,
+            "updated_at": updated_at,
+        }
+
+    return _idempotent(user, idempotency_key, request, trade)
+
 @log_action("SELL", verbose=True)
+@traced()
 def sell_currency(
     user: User,
     currency_code: str,
     amount: float,
     base_currency: str = DEFAULT_BASE_CURRENCY,
+    idempotency_key: Optional[str] = None,
 ) -> Dict:
     if amount <= 0:
         raise ValueError("'amount' должен быть положительным числом.")
     get_currency(currency_code)
-    portfolio = load_portfolio_for_user(user)
     code = currency_code.upper()
-
-    try:
-        wallet = portfolio.get_wallet(code)
-    except KeyError as exc:
-        raise ValueError(
-            f"У вас нет кошелька '{code}'. "
-            "Добавьте валюту: она создаётся автоматически при первой покупке."
-        ) from exc
-
-    old_balance = wallet.balance
-
-    if amount > old_balance:
-        raise ValueError(
-            f"Недостаточно средств: доступно {old_balance:.4f} {code}, "
-            f"требуется {amount:.4f} {code}"
-        )
-
-    wallet.withdraw(amount)
-    new_balance = wallet.balance
-
-    rate, updated_at = get_rate(code, base_currency)
-    estimated_revenue = amount * rate
-
-    save_portfolio(portfolio)
-
-    return {
+    request = {
+        "action": "sell",
         "currency": code,
         "amount": amount,
-        "old_balance": old_balance,
-        "new_balance": new_balance,
-        "rate": rate,
         "base_currency": base_currency.upper(),
-        "estimated_revenue": estimated_revenue,
-        "updated_at": updated_at,
     }
 
+    def apply() -> Dict:
+        portfolio = load_portfolio_for_user(user)
+        try:
+            wallet = portfolio.get_wallet(code)
+        except KeyError as exc:
+            raise ValueError(
+                f"У вас нет кошелька '{code}'. "
+                "Добавьте валюту: она создаётся автоматически при первой покупке."
+            ) from exc
+
+        old_balance = wallet.balance
+
+        if amount > old_balance:
+            raise ValueError(
+                f"Недостаточно средств: доступно {old_balance:.4f} {code}, "
+                f"требуется {amount:.4f} {code}"
+            )
+
+        wallet.withdraw(amount)
+        save_portfolio(portfolio)
+        return {"old_balance": old_balance, "new_balance": wallet.balance}
+
+    def trade() -> Dict:
+        rate, updated_at = get_rate(code, base_currency)
+        balances = apply()
+        _record_trade(user, request, balances, rate)
+        return {
+            "currency": code,
+            "amount": amount,
+            "old_balance": balances["old_balance"],
+            "new_balance": balances["new_balance"],
+            "rate": rate,
+            "base_currency": base_currency.upper(),
+            "estimated_revenue": amount * rate,
+            "updated_at": updated_at,
+        }
+
+    return _idempotent(user, idempotency_key, request, trade)
+
 
 # ===== Курс валют =====
 
 
-def get_rate_info(from_currency: str, to_currency: str) -> Dict:
+@traced()
+def get_rate_info(
+    from_currency: str,
+    to_currency: str,
+    at: Optional[datetime] = None,
+) -> Dict:
+    if at is not None:
+        # исторический курс: обратный считаем из прямого, без второго поиска
+        rate, updated_at = get_rate_asof(from_currency, to_currency, at)
+        return {
+            "from": from_currency.upper(),
+            "to": to_currency.upper(),
+            "rate": rate,
+            "reverse_rate": 1.0 / rate if rate else 0.0,
+            "updated_at": updated_at,
+        }
+
     rate, updated_at = get_rate(from_currency, to_currency)
     reverse_rate, _ = get_rate(to_currency, from_currency)
 
@@ -227,3 +425,251 @@ def get_rate_info(from_currency: str, to_currency: str) -> Dict:
         "updated_at": updated_at,
     }
 
+
+# ===== Лимитные заявки =====
+
+@log_action("PLACE_ORDER", verbose=True)
+@traced()
+def place_limit_order(
+    user: User,
+    side: str,
+    currency_code: str,
+    amount: float,
+    limit_price: float,
+    base_currency: str = DEFAULT_BASE_CURRENCY,
+) -> Dict:
+    code = get_currency(currency_code).code
+    base = get_currency(base_currency).code
+    if code == base:
+        raise ValueError("Валюта заявки должна отличаться от базовой.")
+    if base != DEFAULT_BASE_CURRENCY:
+        # Parser Service обновляет курсы только к USD: заявка в другой
+        # базе никогда бы не сработала
+        raise ValueError(
+            f"Заявки принимаются только в базовой валюте {DEFAULT_BASE_CURRENCY}."
+        )
+
+    with _locks().structural():
+        books = load_order_books()
+        order = books.place(
+            user_id=user.user_id,
+            side=side,
+            currency_code=code,
+            amount=amount,
+            limit_price=limit_price,
+            base_currency=base,
+        )
+        save_order_books(books)
+    return order.to_dict()
+
+
+@log_action("CANCEL_ORDER", verbose=True)
+@traced()
+def cancel_limit_order(user: User, order_id: int) -> Dict:
+    with _locks().structural():
+        books = load_order_books()
+        order = books.cancel(user_id=user.user_id, order_id=order_id)
+        save_order_books(books)
+    return order.to_dict()
+
+
+@traced()
+def list_limit_orders(user: User) -> List[Dict]:
+    with _locks().structural():
+        orders = load_order_books().orders_for_user(user.user_id)
+    return [order.to_dict() for order in orders]
+
+
+@traced()
+def execute_triggered_orders(rates: Dict[str, float]) -> List[Dict]:
+    """Исполнить заявки, пересечённые новыми курсами.
+
+    Вызывается RatesUpdater после записи курсов. Стаканы берутся из
+    кеша хранилища и отдают только сработавшие заявки, а снятие
+    записывается строкой журнала: стоимость зависит от числа сработавших
+    заявок, а не от общего числа открытых. Заявки снимаются со стакана до
+    исполнения: при сбое заявка не будет исполнена повторно. Ошибка
+    одной заявки (в том числе конфликт версий портфеля после всех
+    повторов или ошибка ввода-вывода) не прерывает пакет: заявка
+    попадает в отчёт со статусом REJECTED.
+    """
+    # стаканы — под глобальной блокировкой; сами сделки идут без неё,
+    # через compare-and-swap портфеля в buy_currency / sell_currency
+    with _locks().structural():
+        books = load_order_books()
+        triggered = books.match(rates)
+        if not triggered:
+            return []
+        save_removed_orders(books, triggered)
+
+    users_by_id = {user.user_id: user for user in load_users()}
+    executed: List[Dict] = []
+
+    for order in triggered:
+        report = order.to_dict()
+        report["trigger_rate"] = rates[order.pair]
+        user = users_by_id.get(order.user_id)
+        if user is None:
+            report["status"] = "REJECTED"
+            report["error"] = f"Пользователь id={order.user_id} не найден."
+            executed.append(report)
+            continue
+
+        trade = buy_currency if order.side == ORDER_SIDE_BUY else sell_currency
+        try:
+            trade(
+                user=user,
+                currency_code=order.currency_code,
+                amount=order.amount,
+                base_currency=order.base_currency,
+            )
+        except (
+            InsufficientFundsError,
+            CurrencyNotFoundError,
+            ApiRequestError,
+            PortfolioConflictError,
+            ValueError,
+            OSError,
+        ) as exc:
+            report["status"] = "REJECTED"
+            report["error"] = str(exc)
+        else:
+            report["status"] = "FILLED"
+        executed.append(report)
+
+    return executed
+
+
+# ===== Ценовые уведомления =====
+
+@log_action("CREATE_ALERT", verbose=True)
+@traced()
+def create_price_alert(
+    user: User,
+    currency_code: str,
+    direction: str,
+    threshold: float,
+    base_currency: str = DEFAULT_BASE_CURRENCY,
+) -> Dict:
+    code = get_currency(currency_code).code
+    base = get_currency(base_currency).code
+    if code == base:
+        raise ValueError("Валюта подписки должна отличаться от базовой.")
+    if base != DEFAULT_BASE_CURRENCY:
+        # см. place_limit_order: курсы к другим базам не обновляются
+        raise ValueError(
+            f"Подписки принимаются только в базовой валюте {DEFAULT_BASE_CURRENCY}."
+        )
+
+    with _locks().structural():
+        books = load_alert_books()
+        alert = books.subscribe(
+            user_id=user.user_id,
+            currency_code=code,
+            direction=direction,
+            threshold=threshold,
+            base_currency=base,
+        )
+        save_alert_books(books)
+    return alert.to_dict()
+
+
+@log_action("DELETE_ALERT", verbose=True)
+@traced()
+def delete_price_alert(user: User, alert_id: int) -> Dict:
+    with _locks().structural():
+        books = load_alert_books()
+        alert = books.unsubscribe(user_id=user.user_id, alert_id=alert_id)
+        save_alert_books(books)
+    return alert.to_dict()
+
+
+@traced()
+def list_price_alerts(user: User) -> List[Dict]:
+    with _locks().structural():
+        alerts = load_alert_books().alerts_for_user(user.user_id)
+    return [alert.to_dict() for alert in alerts]
+
+
+@traced()
+def fire_price_alerts(
+    old_rates: Dict[str, float],
+    new_rates: Dict[str, float],
+) -> List[Dict]:
+    """Найти подписки, пересечённые при смене курсов old -> new.
+
+    Подписки берутся из кеша хранилища, сработавшие находятся bisect'ом
+    по порогам, а их снятие записывается строкой журнала: без
+    срабатываний файлы не читаются и не пишутся. Сработавшие подписки
+    сначала записываются в outbox (fsync), затем снимаются: при сбое
+    между шагами уведомление может прийти дважды, но не потеряется.
+    """
+    with _locks().structural():
+        books = load_alert_books()
+        fired = books.fire(old_rates, new_rates)
+        if not fired:
+            return []
+
+        fired_at = datetime.utcnow().isoformat()
+        notifications: List[Dict] = []
+        for alert in fired:
+            record = alert.to_dict()
+            record["old_rate"] = old_rates[alert.pair]
+            record["new_rate"] = new_rates[alert.pair]
+            record["fired_at"] = fired_at
+            notifications.append(record)
+
+        append_alert_notifications(notifications)
+        save_removed_alerts(books, fired)
+        return notifications
+
+
+@traced()
+def take_alert_notifications(user: User) -> List[Dict]:
+    """Выдать (и убрать из outbox) уведомления пользователя."""
+    return pop_alert_notifications(user.user_id)
+
+
+# ===== Массовый экспорт и импорт =====
+
+
+def _check_bulk_kind(kind: str) -> None:
+    if kind not in BULK_KINDS:
+        raise ValueError(
+            f"Неизвестный вид данных '{kind}'. Доступные: {', '.join(BULK_KINDS)}."
+        )
+
+
+@traced()
+def export_records(kind: str) -> Iterator[Dict[str, Any]]:
+    """Строки выгрузки ("users" или "portfolios") — потоком, по одной."""
+    from . import bulk  # тянет хранилище: не замедляет старт CLI
+
+    _check_bulk_kind(kind)
+    if kind == "users":
+        return bulk.iter_user_rows()
+    return bulk.iter_portfolio_rows()
+
+
+@log_action("IMPORT", verbose=True)
+@traced()
+def import_records(
+    kind: str,
+    rows: Iterable[Tuple[int, Dict[str, Any]]],
+    dry_run: bool = False,
+    batch_size: int = BULK_BATCH_SIZE,
+) -> Dict:
+    """Проверить и загрузить строки (номер строки, поля) вида kind.
+
+    Всё или ничего: при любой ошибке проверки хранилище не меняется и
+    бросается BulkImportError, в report которого — первые ошибки с
+    номерами строк. dry_run — только проверка и сводка.
+    """
+    from . import bulk
+
+    _check_bulk_kind(kind)
+    if batch_size < 1:
+        raise ValueError("'batch-size' должен быть положительным числом.")
+    if kind == "users":
+        return bulk.import_users(rows, dry_run=dry_run, batch_size=batch_size)
+    return bulk.import_portfolios(rows, dry_run=dry_run, batch_size=batch_size)
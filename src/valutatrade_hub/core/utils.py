@@ -1,36 +1,67 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Tuple
+from typing import TYPE_CHECKING, Any, ContextManager, Dict, List, Optional, Tuple
 
 from .constants import (
+    DEFAULT_BASE_CURRENCY,
     FIRST_USER_ID,
     RATES_SOURCE_NAME,
     RATES_TO_USD,
     SALT_LENGTH,
 )
 from .models import User, Portfolio
-from .exceptions import ApiRequestError
+from .idempotency import IdempotencyCache
+from .exceptions import (
+    ApiRequestError,
+    PortfolioConflictError,
+    RateHistoryNotFoundError,
+)
 from .currencies import get_currency
-from ..infra.database import DatabaseManager
 from ..infra.settings import SettingsLoader
+from ..tracing import traced
 import random
 import string
 
+if TYPE_CHECKING:
+    from ..infra.database import DatabaseManager
+    from .alerts import AlertBooks, PriceAlert
+    from .orders import LimitOrder, OrderBooks
+    from ..parser_service.history_index import HistoryIndex
+
+
+def _db() -> "DatabaseManager":
+    """Синглтон хранилища создаётся при первом обращении, а не при импорте.
+
+    Модуль хранилища тоже загружается здесь: он тянет за собой журналы
+    и ленту изменений, которые не нужны для старта CLI.
+    """
+    from ..infra.database import DatabaseManager
 
-db = DatabaseManager()
-settings = SettingsLoader()
+    return DatabaseManager()
 
 
 # ===== Пользователи =====
 
 
+def transaction() -> ContextManager[None]:
+    """Единица работы над хранилищем (см. DatabaseManager.transaction)."""
+    return _db().transaction()
+
+
+def record_change(kind: str, data: Dict[str, Any]) -> None:
+    """Событие в ленту изменений (в transaction() — вместе с коммитом)."""
+    _db().record_change(kind, data)
+
+
+@traced()
 def load_users() -> List[User]:
-    return db.load_users()
+    return _db().load_users()
 
 
+@traced()
 def save_users(users: List[User]) -> None:
-    db.save_users(users)
+    _db().save_users(users)
 
 
 def generate_user_id(users: List[User]) -> int:
@@ -47,44 +78,156 @@ def generate_salt() -> str:
 # ===== Портфели =====
 
 
+@traced()
 def load_portfolio_for_user(user: User) -> Portfolio:
-    raw_list: List[Dict[str, Any]] = db.load_portfolios_raw()
-    for item in raw_list:
-        if item.get("user_id") == user.user_id:
-            return Portfolio.from_dict(user=user, data=item)
+    item = _db().load_portfolio_raw(user.user_id)
+    if item is not None:
+        return Portfolio.from_dict(user=user, data=item)
 
     portfolio = Portfolio(user=user)
-    save_portfolio(portfolio)
+    try:
+        save_portfolio(portfolio)
+    except PortfolioConflictError:
+        # портфель параллельно создал другой поток или процесс
+        return load_portfolio_for_user(user)
     return portfolio
 
 
+@traced()
 def save_portfolio(portfolio: Portfolio) -> None:
-    raw_list: List[Dict[str, Any]] = db.load_portfolios_raw()
-    updated = False
-    for idx, item in enumerate(raw_list):
-        if item.get("user_id") == portfolio.user_id:
-            raw_list[idx] = portfolio.to_dict()
-            updated = True
-            break
+    """Записать портфель в общий portfolios.json (compare-and-swap).
+
+    Запись проходит, только если версия портфеля в хранилище совпадает
+    с версией, с которой он был загружен; иначе — PortfolioConflictError
+    и ничего не пишется. При успехе версия увеличивается на 1.
+
+    Внутри transaction() версия окончательно сверяется при коммите, под
+    короткой блокировкой portfolios.json: сделки разных пользователей
+    не ждут друг друга, а конфликт отменяет весь коммит. Как именно
+    пишется портфель (весь файл или строка журнала), решает
+    DatabaseManager.save_portfolio_raw.
+    """
+    data = portfolio.to_dict()
+    data["version"] = portfolio.version + 1
+    _db().save_portfolio_raw(data, expected_version=portfolio.version)
+    portfolio.version = data["version"]
+
+
+# ===== Лимитные заявки =====
+
+
+@traced()
+def load_order_books() -> OrderBooks:
+    """Стаканы из кеша хранилища; вызывать под LockManager().structural()."""
+    return _db().load_order_books()
+
+
+@traced()
+def save_order_books(books: OrderBooks) -> None:
+    _db().save_order_books(books)
+
+
+@traced()
+def save_removed_orders(books: OrderBooks, orders: List[LimitOrder]) -> None:
+    """Сохранить снятие заявок со стаканов, не переписывая orders.json."""
+    _db().save_removed_orders(books, orders)
+
+
+# ===== Ключи идемпотентности =====
+
+
+def claim_idempotency_key(
+    user_id: int,
+    key: str,
+    request: Dict[str, Any],
+) -> Optional[Dict[str, Any]]:
+    """Результат сделки по ключу или None — ключ занят для новой сделки.
+
+    Проверка и отметка «выполняется» — одной короткой блокировкой
+    файла ключей, а не на всю сделку: запросы с одним ключом не
+    выполнятся параллельно дважды, сделки с разными ключами друг друга
+    не ждут, а повтор завершённой сделки ничего не пишет. Новый ключ —
+    одна запись журнала вместе с удалением вытесненных ключей: повтор
+    журнала не вернёт их. Ключи меняются на месте, в кеше хранилища,
+    без копии на каждую сделку; разросшийся журнал сворачивается в
+    снимок.
+    """
+    db = _db()
+    with db.locked(db.idempotency_file):
+        cache = IdempotencyCache.wrap(db.load_idempotency_entries())
+        stored = cache.get(user_id, key, request)
+        if stored is not None:
+            return stored
+        claimed = cache.put(user_id, key, request, None)
+        removed = [(scoped, None) for scoped in cache.take_removed()]
+        db.save_idempotency_entries(removed + [claimed])
+        if db.idempotency_snapshot_due():
+            db.save_idempotency_raw(cache.to_dict())
+    return None
+
+
+def remember_idempotent_result(
+    user_id: int,
+    key: str,
+    request: Dict[str, Any],
+    result: Dict[str, Any],
+) -> None:
+    """Записать результат сделки по ключу (в transaction() — при коммите,
+    вместе с самой сделкой)."""
+    scoped, entry = IdempotencyCache().put(user_id, key, request, result)
+    _db().save_idempotency_entry(scoped, entry)
 
-    if not updated:
-        raw_list.append(portfolio.to_dict())
 
-    db.save_portfolios_raw(raw_list)
+def release_idempotency_key(user_id: int, key: str) -> None:
+    """Снять отметку «выполняется»: сделка не удалась, ключ можно повторить."""
+    _db().save_idempotency_entry(IdempotencyCache.scoped(user_id, key), None)
+
+
+# ===== Ценовые уведомления =====
+
+
+@traced()
+def load_alert_books() -> AlertBooks:
+    """Подписки из кеша хранилища; вызывать под LockManager().structural()."""
+    return _db().load_alert_books()
+
+
+@traced()
+def save_alert_books(books: AlertBooks) -> None:
+    _db().save_alert_books(books)
+
+
+@traced()
+def save_removed_alerts(books: AlertBooks, alerts: List[PriceAlert]) -> None:
+    """Сохранить снятие сработавших подписок, не переписывая alerts.json."""
+    _db().save_removed_alerts(books, alerts)
+
+
+@traced()
+def append_alert_notifications(records: List[Dict[str, Any]]) -> None:
+    _db().append_outbox(records)
+
+
+@traced()
+def pop_alert_notifications(user_id: int) -> List[Dict[str, Any]]:
+    """Забрать из outbox уведомления пользователя (чужие не читаются)."""
+    return _db().take_outbox(user_id)
 
 
 # ===== Курсы валют =====
 
 
+@traced()
 def load_rates() -> Dict[str, Any]:
-    return db.load_rates_raw()
+    return _db().load_rates_raw()
 
 
+@traced()
 def save_rates(data: Dict[str, Any]) -> None:
     now = datetime.utcnow().isoformat()
     data["source"] = RATES_SOURCE_NAME
     data["last_refresh"] = now
-    db.save_rates_raw(data)
+    _db().save_rates_raw(data)
 
 def _is_rate_fresh(updated_at_str: str) -> bool:
     """Проверить, не устарел ли курс (по TTL из настроек).
@@ -136,6 +279,7 @@ def _is_rate_fresh(updated_at_str: str) -> bool:
     return age.total_seconds() <= ttl_seconds
 
 
+@traced()
 def get_rate(from_currency: str, to_currency: str) -> Tuple[float, datetime]:
     """Получить курс from -> to с учётом TTL и кэша.
 
@@ -168,10 +312,15 @@ def get_rate(from_currency: str, to_currency: str) -> Tuple[float, datetime]:
     rate = usd_from / usd_to
     now = datetime.utcnow()
 
-    rates_data[pair_key] = {"rate": rate, "updated_at": now.isoformat()}
-    save_rates(rates_data)
+    # перечитываем под блокировкой, чтобы не затереть параллельную запись
+    with _db().locked(_db().rates_file):
+        rates_data = load_rates()
+        rates_data[pair_key] = {"rate": rate, "updated_at": now.isoformat()}
+        save_rates(rates_data)
 
     return rate, now
+
+
 # ==== Вспомогательные функции для проверки свежести курса ====
 
 def _parse_iso_datetime(value: str) -> datetime:
@@ -205,3 +354,71 @@ def _is_rate_fresh(updated_at_str: str) -> bool:
     now = datetime.now(timezone.utc)
     age = now - updated_at
     return age.total_seconds() <= float(ttl_seconds)
+
+
+# ===== Исторические курсы =====
+
+
+def _history_rate_at(
+    index: "HistoryIndex",
+    from_code: str,
+    to_code: str,
+    moment: datetime,
+) -> Optional[Tuple[float, datetime]]:
+    """Курс пары из индекса истории на момент moment: прямой или обратный."""
+    direct = index.rate_at(f"{from_code}_{to_code}", moment)
+    if direct is not None:
+        return direct
+
+    inverse = index.rate_at(f"{to_code}_{from_code}", moment)
+    if inverse is not None and inverse[0]:
+        return 1.0 / inverse[0], inverse[1]
+    return None
+
+
+@traced()
+def get_rate_asof(
+    from_currency: str,
+    to_currency: str,
+    moment: datetime,
+) -> Tuple[float, datetime]:
+    """Курс from -> to на момент moment по истории Parser Service.
+
+    Берётся последнее наблюдение не позже moment. Если прямой пары
+    в истории нет — курс считается кросс-курсом через USD.
+    Возвращает (курс, время наблюдения); для кросс-курса — время
+    более старого из двух наблюдений. Нет наблюдений не позже
+    moment — RateHistoryNotFoundError.
+    """
+    from_code = get_currency(from_currency).code
+    to_code = get_currency(to_currency).code
+
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+
+    if from_code == to_code:
+        return 1.0, moment
+
+    # Parser Service нужен только для исторических запросов
+    from ..parser_service.config import ParserConfig
+    from ..parser_service.storage import RatesStorage
+
+    index = RatesStorage(ParserConfig.from_env()).history_index()
+
+    found = _history_rate_at(index, from_code, to_code, moment)
+    if found is not None:
+        return found
+
+    cross = DEFAULT_BASE_CURRENCY
+    legs = []
+    for code in (from_code, to_code):
+        if code == cross:
+            legs.append((1.0, moment))
+            continue
+        leg = _history_rate_at(index, code, cross, moment)
+        if leg is None:
+            raise RateHistoryNotFoundError(code, cross, moment)
+        legs.append(leg)
+
+    (from_usd, from_ts), (to_usd, to_ts) = legs
+    return from_usd / to_usd, min(from_ts, to_ts)
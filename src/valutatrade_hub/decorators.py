@@ -1,19 +1,35 @@
 from __future__ import annotations
 
+import logging
+import time
 from functools import wraps
 from typing import Any, Callable, Dict
 
-from .logging_config import configure_logging
+from .logging_config import LOGGER_NAME, configure_logging
+from .tracing import current_request_id
 
-logger = configure_logging()
+# Обработчики (файл, консоль) подключаются при первой операции, а не при импорте
+logger = logging.getLogger(LOGGER_NAME)
 
 
 def log_action(action: str, verbose: bool = False) -> Callable:
-    """Декоратор логирования доменных операций."""
+    """Декоратор логирования доменных операций.
+
+    Длительность вызова (монотонные часы) попадает в гистограмму
+    MetricsRegistry по имени action, вместе с исходом OK/ERROR.
+    Подробности уходят в журнал словарём (поле event), без str():
+    строку из них собирает фоновый поток записи, и только если уровень
+    INFO включён. Внутри трассируемого запроса у записи есть поле
+    request_id — то же, что у сводки трассировки.
+    """
 
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> Any:
+            # реестр метрик загружается с первой операцией, а не при импорте
+            from .metrics import MetricsRegistry
+
+            configure_logging()
             # Пытаемся вытащить user / username из аргументов
             user = kwargs.get("user") or (args[0] if args else None)
             username = getattr(user, "username", "unknown")
@@ -21,18 +37,30 @@ def log_action(action: str, verbose: bool = False) -> Callable:
                 "action": action,
                 "username": username,
             }
+            extra: Dict[str, Any] = {"event": details}
+            request_id = current_request_id()
+            if request_id is not None:
+                extra["request_id"] = request_id
+            started = time.perf_counter()
             try:
                 result = func(*args, **kwargs)
+                elapsed = time.perf_counter() - started
+                MetricsRegistry().observe(action, elapsed, ok=True)
                 details["result"] = "OK"
-                if verbose and isinstance(result, dict):
-                    details.update(result)
-                logger.info(str(details))
+                details["duration_ms"] = round(elapsed * 1000, 3)
+                if logger.isEnabledFor(logging.INFO):
+                    if verbose and isinstance(result, dict):
+                        details.update(result)
+                    logger.info("%s OK", action, extra=extra)
                 return result
             except Exception as exc:  # пробрасываем дальше
+                elapsed = time.perf_counter() - started
+                MetricsRegistry().observe(action, elapsed, ok=False)
                 details["result"] = "ERROR"
+                details["duration_ms"] = round(elapsed * 1000, 3)
                 details["error_type"] = exc.__class__.__name__
                 details["error_message"] = str(exc)
-                logger.info(str(details))
+                logger.info("%s ERROR", action, extra=extra)
                 raise
 
         return wrapper
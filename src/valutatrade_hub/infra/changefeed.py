@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .. import profiling
+from ..core.constants import CHANGE_RATES_UPDATED, CHANGES_POLL_LIMIT
+from .journal import AppendJournal
+from .locks import LockManager
+from .settings import SettingsLoader
+
+TAIL_BLOCK_BYTES = 4096  # с какого блока начинать поиск последней строки
+
+
+def change_event(kind: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Событие ленты без offset: его присваивает ChangeFeed.append()."""
+    return {
+        "type": kind,
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "data": data,
+    }
+
+
+def rates_change(
+    old: Dict[str, Any],
+    new: Dict[str, Any],
+) -> Optional[Dict[str, Any]]:
+    """Событие об изменившихся парах rates.json; None — пары не менялись."""
+    pairs = {
+        key: value
+        for key, value in new.items()
+        if isinstance(value, dict) and old.get(key) != value
+    }
+    if not pairs:
+        return None
+    return change_event(
+        CHANGE_RATES_UPDATED,
+        {"pairs": pairs, "last_refresh": new.get("last_refresh")},
+    )
+
+
+class ChangeFeed:
+    """Лента изменений (change data capture): changes.jsonl, только дописывание.
+
+    Каждое событие — строка JSON {"offset", "type", "ts", "data"} и,
+    если событие записано коммитом transaction(), "tx" — общий id
+    событий одного коммита. offset строго растёт на 1 и присваивается
+    под блокировкой файла ленты, поэтому он монотонен и между
+    процессами, а порядок событий совпадает с порядком записей:
+    события пишутся, пока блокировки изменённых файлов ещё держатся.
+    Потребители (ChangeConsumer) читают только события после своего
+    сохранённого offset, не сравнивая снимки целиком.
+    """
+
+    _instance: "ChangeFeed | None" = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls) -> "ChangeFeed":
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._init_feed()
+                    cls._instance = instance
+        return cls._instance
+
+    def _init_feed(self) -> None:
+        settings = SettingsLoader()
+        self.path = Path(settings.get("changes_file"))
+        self._journal = AppendJournal(
+            self.path, fsync=bool(settings.get("fsync_writes", False))
+        )
+        # объект блокировки берётся один раз: сделка пишет в ленту на
+        # каждом коммите, а LockManager.file() каждый раз разрешает путь
+        self._lock = LockManager().file(self.path)
+        # (размер файла, последний offset) после нашей последней записи:
+        # пока файл не вырос, хвост перечитывать не нужно
+        self._tail: Tuple[int, int] = (-1, 0)
+
+    # --- запись ---
+
+    def append(self, events: List[Dict[str, Any]], tx: Optional[str] = None) -> int:
+        """Присвоить событиям offset'ы и дописать их; вернуть последний."""
+        if not events:
+            return self.last_offset()
+        with self._lock:
+            offset = self._last_offset_locked()
+            records = []
+            for event in events:
+                offset += 1
+                record = {"offset": offset, **event}
+                if tx is not None:
+                    record["tx"] = tx
+                records.append(record)
+            ticket = self._journal.write(records)
+            self._tail = (self._journal.size(), offset)
+        self._journal.sync(ticket)
+        return offset
+
+    def last_offset(self) -> int:
+        with self._lock.shared():
+            size = self._journal.size()
+            if size == self._tail[0]:
+                return self._tail[1]
+            return self._read_last_offset(size)
+
+    def _last_offset_locked(self) -> int:
+        size = self._journal.size()
+        if size == self._tail[0]:
+            return self._tail[1]
+        # запись оборвалась посреди строки — хвост отрезается
+        self._journal.drop_torn_tail()
+        return self._read_last_offset(self._journal.size())
+
+    def _read_last_offset(self, size: int) -> int:
+        """offset последней строки: читается только хвост файла."""
+        if not size:
+            return 0
+        block = TAIL_BLOCK_BYTES
+        with open(self.path, "rb") as f:
+            while True:
+                start = max(0, size - block)
+                f.seek(start)
+                tail = f.read(size - start)
+                lines = tail.rstrip(b"\n").rsplit(b"\n", 1)
+                if len(lines) == 2 or start == 0:
+                    break
+                block *= 4
+        if profiling.io_observers:
+            profiling.record_read(self.path, len(tail))
+        last = lines[-1].strip()
+        try:
+            return int(json.loads(last)["offset"]) if last else 0
+        except (ValueError, KeyError, TypeError):
+            raise ValueError(f"{self.path}: повреждена последняя запись") from None
+
+    # --- чтение ---
+
+    def read(
+        self,
+        after: int = 0,
+        position: int = 0,
+        limit: int = CHANGES_POLL_LIMIT,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """До limit событий с offset > after; вернуть (события, позиция).
+
+        position — байтовая позиция, с которой начать чтение (сохраняется
+        вместе с offset, чтобы не просматривать ленту с начала). Если
+        она за концом файла, чтение идёт с начала. Недописанная последняя
+        строка не читается. Возвращённая позиция указывает сразу за
+        последним прочитанным событием.
+        """
+        events: List[Dict[str, Any]] = []
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return events, 0
+        with f:
+            if position > os.fstat(f.fileno()).st_size:
+                position = 0
+            f.seek(position)
+            for line in f:
+                if not line.endswith(b"\n") or len(events) >= limit:
+                    break
+                position += len(line)
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if event["offset"] > after:
+                    events.append(event)
+            if profiling.io_observers:
+                profiling.record_read(self.path, f.tell())
+        return events, position
+
+
+class ChangeConsumer:
+    """Потребитель ленты с устойчивой позицией.
+
+    poll() возвращает события после сохранённого offset, commit()
+    сохраняет offset последнего обработанного события (и байтовую
+    позицию в ленте) в changes_offsets.json. После сбоя до commit()
+    те же события придут снова: доставка «хотя бы один раз», события
+    одного коммита данных узнаются по общему "tx".
+    """
+
+    def __init__(self, name: str) -> None:
+        name = name.strip()
+        if not name:
+            raise ValueError("Имя потребителя не может быть пустым.")
+        self.name = name
+        self._feed = ChangeFeed()
+        self._locks = LockManager()
+        self._path = Path(SettingsLoader().get("changes_offsets_file"))
+        stored = self._load().get(name, {})
+        self.offset: int = stored.get("offset", 0)
+        self._position: int = stored.get("position", 0)
+        # offset и позиция последнего poll(), ещё не сохранённые
+        self._pending: Optional[Tuple[int, int]] = None
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+                if profiling.io_observers:
+                    profiling.record_read(self._path, f.tell())
+                return data
+        except FileNotFoundError:
+            return {}
+
+    def poll(self, limit: int = CHANGES_POLL_LIMIT) -> List[Dict[str, Any]]:
+        """Следующие события после offset; сам offset не сдвигается."""
+        after, position = self._pending or (self.offset, self._position)
+        events, position = self._feed.read(after, position, limit)
+        if events:
+            self._pending = (events[-1]["offset"], position)
+        return events
+
+    def commit(self, offset: Optional[int] = None) -> None:
+        """Сохранить позицию: по умолчанию — после последнего poll().
+
+        С явным offset позиция в файле не запоминается, следующее
+        чтение просмотрит ленту с начала.
+        """
+        if offset is not None:
+            target = (offset, 0)
+        elif self._pending is not None:
+            target = self._pending
+        else:
+            return
+        with self._locks.file(self._path):
+            data = self._load()
+            data[self.name] = {
+                "offset": target[0],
+                "position": target[1],
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            }
+            tmp_path = self._path.with_name(f"{self._path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                if profiling.io_observers:
+                    profiling.record_write(self._path, f.tell())
+            os.replace(tmp_path, self._path)
+        self.offset, self._position = target
+        self._pending = None
+
+    def lag(self) -> int:
+        """Сколько событий ещё не подтверждено."""
+        return max(0, self._feed.last_offset() - self.offset)
@@ -1,22 +1,125 @@
 from __future__ import annotations
 
 import json
+import os
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager, nullcontext
 from pathlib import Path
-from typing import Any, List, Dict
+import threading
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TYPE_CHECKING,
+    Tuple,
+)
 
+from .. import profiling
 from ..core.models import User
+from ..core.constants import (
+    CHANGE_PORTFOLIO_UPDATED,
+    CHANGE_USER_CREATED,
+    CHANGE_USER_DELETED,
+    CHANGE_USER_UPDATED,
+    FIRST_PORTFOLIO_VERSION,
+    PORTFOLIO_STORAGE_MODES,
+)
+from ..core.exceptions import PortfolioConflictError
+from .changefeed import ChangeFeed, change_event, rates_change
+from .journal import AppendJournal
+from .jsonstream import iter_json_elements
+from .locks import LockManager
 from .settings import SettingsLoader
+from ..tracing import cache_hit, cache_miss, traced
+
+if TYPE_CHECKING:
+    from ..core.alerts import AlertBooks, PriceAlert
+    from ..core.orders import LimitOrder, OrderBooks
+
+TX_JOURNAL_PREFIX = ".tx-"
+TX_JOURNAL_SUFFIX = ".json"
+COPY_CHUNK_BYTES = 1 << 20  # блок копирования файла при массовой вставке
+ARRAY_TAIL_BYTES = 4096     # где искать закрывающую "]" JSON-массива
+# поля пользователя в ленте изменений (без хеша пароля и соли)
+USER_CHANGE_FIELDS = ("user_id", "username", "registration_date")
+
+
+def _apply_portfolio_record(items: Dict[int, Dict], record: Dict[str, Any]) -> None:
+    """Применить запись журнала портфелей: {"u": user_id, "v": версия,
+    "w": {код: баланс или None — кошелёк удалён}}.
+
+    Запись с версией не новее текущей пропускается, поэтому повторное
+    применение (повтор после сбоя, журнал поверх свежего снимка)
+    ничего не портит.
+    """
+    user_id, version = record["u"], record["v"]
+    current = items.get(user_id)
+    if current is not None and current.get("version", 0) >= version:
+        return
+    wallets = dict(current.get("wallets", {})) if current is not None else {}
+    for code, balance in record["w"].items():
+        if balance is None:
+            wallets.pop(code, None)
+        else:
+            wallets[code] = {"balance": balance}
+    items[user_id] = {"user_id": user_id, "version": version, "wallets": wallets}
+
+
+def _apply_idempotency_record(
+    entries: Dict[str, Dict[str, Any]],
+    record: Dict[str, Any],
+) -> None:
+    """Применить запись журнала ключей идемпотентности: {"k": ключ,
+    "e": запись ключа или None — ключ удалён}. Ключ переносится в конец
+    (порядок LRU), повторное применение ничего не портит."""
+    entries.pop(record["k"], None)
+    if record["e"] is not None:
+        entries[record["k"]] = record["e"]
+
+
+class _Transaction:
+    """Состояние открытой единицы работы одного потока."""
+
+    def __init__(self) -> None:
+        self.tx_id = os.urandom(16).hex()
+        # path -> данные к записи; порядок вставки = порядок захвата блокировок
+        self.dirty: Dict[Path, Any] = {}
+        self.locked: Dict[Path, None] = {}
+        self.locks = ExitStack()
+        # портфели к записи (user_id -> данные) и версии, с которыми они
+        # были прочитаны: compare-and-swap проверяется при коммите
+        self.portfolios: Dict[int, Dict[str, Any]] = {}
+        self.portfolio_versions: Dict[int, int] = {}
+        # режим "journal": записи журнала портфелей и сброс журнала
+        self.portfolio_records: List[Dict[str, Any]] = []
+        self.reset_portfolio_journal = False
+        self.journal_ticket = 0
+        # записи журнала ключей идемпотентности (результаты сделок)
+        self.idempotency_records: List[Dict[str, Any]] = []
+        # события ленты изменений: пишутся только вместе с коммитом
+        self.changes: List[Dict[str, Any]] = []
 
 
 class DatabaseManager:
     """Singleton-обёртка над JSON-хранилищем."""
 
     _instance: "DatabaseManager | None" = None
+    _instance_lock = threading.Lock()
 
     def __new__(cls) -> "DatabaseManager":
+        # двойная проверка: блокировка нужна только при первом создании;
+        # экземпляр публикуется после полной инициализации
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._init_paths()
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._init_paths()
+                    cls._instance = instance
         return cls._instance
 
     def _init_paths(self) -> None:
@@ -25,43 +128,1070 @@ class DatabaseManager:
         self.users_file = Path(settings.get("users_file"))
         self.portfolios_file = Path(settings.get("portfolios_file"))
         self.rates_file = Path(settings.get("rates_file"))
+        self.orders_file = Path(settings.get("orders_file"))
+        self.orders_snapshot_bytes = int(settings.get("orders_snapshot_bytes"))
+        self.alerts_file = Path(settings.get("alerts_file"))
+        self.alerts_snapshot_bytes = int(settings.get("alerts_snapshot_bytes"))
+        self.alerts_outbox_dir = Path(settings.get("alerts_outbox_dir"))
+        self.idempotency_file = Path(settings.get("idempotency_file"))
+        self.idempotency_snapshot_bytes = int(
+            settings.get("idempotency_snapshot_bytes")
+        )
+        self.fsync_writes = bool(settings.get("fsync_writes", False))
+        self.portfolio_storage = settings.get("portfolio_storage", "snapshot")
+        if self.portfolio_storage not in PORTFOLIO_STORAGE_MODES:
+            raise ValueError(
+                f"Неизвестный режим хранения портфелей: {self.portfolio_storage}"
+            )
+        self.portfolio_snapshot_bytes = int(settings.get("portfolio_snapshot_bytes"))
+        self.portfolio_journal_fsync = bool(settings.get("portfolio_journal_fsync"))
+        self._portfolio_journal = AppendJournal(
+            Path(settings.get("portfolios_journal_file")),
+            fsync=self.portfolio_journal_fsync,
+        )
+        # снимок -> (журнал снятых записей, порог размера журнала для снимка)
+        self._removal_journals: Dict[Path, Tuple[AppendJournal, int]] = {
+            self.orders_file: (
+                AppendJournal(
+                    Path(settings.get("orders_journal_file")),
+                    fsync=self.fsync_writes,
+                ),
+                self.orders_snapshot_bytes,
+            ),
+            self.alerts_file: (
+                AppendJournal(
+                    Path(settings.get("alerts_journal_file")),
+                    fsync=self.fsync_writes,
+                ),
+                self.alerts_snapshot_bytes,
+            ),
+        }
+        self._idempotency_journal = AppendJournal(
+            Path(settings.get("idempotency_journal_file")),
+            fsync=self.fsync_writes,
+        )
         self.data_dir.mkdir(parents=True, exist_ok=True)
+        self._locks = LockManager()
+        self._changes = ChangeFeed()
+        # path -> (сигнатура файла, разобранный JSON)
+        self._cache: Dict[Path, Tuple[Tuple[int, int], Any]] = {}
+        # режим "journal": (сигнатура снимка, прочитано байт журнала, портфели)
+        self._portfolio_state: Optional[
+            Tuple[Optional[Tuple[int, int]], int, Dict[int, Dict]]
+        ] = None
+        # снимок (orders.json, alerts.json) -> (сигнатура снимка,
+        # прочитано байт журнала снятых записей, разобранный набор)
+        self._books_state: Dict[
+            Path, Tuple[Optional[Tuple[int, int]], int, Any]
+        ] = {}
+        # (сигнатура idempotency.json, прочитано байт журнала, ключи)
+        self._idempotency_state: Optional[
+            Tuple[Optional[Tuple[int, int]], int, "OrderedDict[str, Dict[str, Any]]"]
+        ] = None
+        self._local = threading.local()
+        self._recover_transactions()
+        self._recover_portfolio_journal()
+        self._recover_append_journals()
+
+    # --- единица работы ---
+
+    def _tx(self) -> Optional[_Transaction]:
+        return getattr(self._local, "tx", None)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Единица работы: все записи внутри блока — одним коммитом.
+
+        Сохранения не пишутся сразу, а копятся в буфере потока (чтения
+        внутри блока видят буфер). При выходе без исключения каждый
+        изменённый файл записывается ровно один раз; при исключении
+        буфер отбрасывается и на диске ничего не меняется. Вложенный
+        transaction() становится частью внешнего.
+
+        Блокировки файлов, взятые внутри блока (locked() и сохранения),
+        держатся до конца коммита. Блокировка portfolios.json берётся
+        только на время коммита: версии сохраняемых портфелей сверяются
+        с записанными в этот момент (compare-and-swap), при расхождении
+        коммит отменяется с PortfolioConflictError.
+        """
+        if self._tx() is not None:
+            yield
+            return
+
+        tx = self._local.tx = _Transaction()
+        try:
+            with tx.locks:
+                yield
+                self._commit(tx)
+        finally:
+            self._local.tx = None
+        # групповой fsync журнала — уже без блокировок: параллельные
+        # сделки успевают дописать свои записи и сбрасываются вместе
+        if tx.journal_ticket:
+            self._portfolio_journal.sync(tx.journal_ticket)
+
+    def locked(self, path: Path) -> ContextManager[Any]:
+        """Исключительная блокировка файла для чтения-изменения-записи.
+
+        Вне транзакции — обычная блокировка на время блока; внутри —
+        берётся один раз и держится до конца транзакции.
+        """
+        lock = self._locks.file(path)
+        tx = self._tx()
+        if tx is None:
+            return lock
+        if path not in tx.locked:
+            tx.locks.enter_context(lock)
+            tx.locked[path] = None
+        return nullcontext()
+
+    @traced()
+    def _commit(self, tx: _Transaction) -> None:
+        """Записать изменённые файлы транзакции атомарно.
+
+        Один файл — временный файл и os.replace. Несколько — сначала все
+        временные файлы, затем журнал коммита с их списком (точка
+        фиксации), затем os.replace каждого и удаление журнала. Если
+        процесс упадёт после записи журнала, следующий запуск допишет
+        коммит (_recover_transactions); до журнала — изменения теряются
+        целиком. Записи журнала портфелей и события ленты изменений
+        дописываются последними, ещё под блокировками файлов: порядок
+        событий в ленте совпадает с порядком коммитов.
+        """
+        if tx.portfolios:
+            self._stage_portfolios(tx)
+        if not tx.dirty and not tx.portfolio_records and not tx.idempotency_records:
+            if tx.changes:
+                self._changes.append(tx.changes, tx=tx.tx_id)
+            return
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        staged: List[Tuple[Path, Path]] = []
+        journal: Optional[Path] = None
+        draft: Optional[Path] = None
+        try:
+            for path, data in tx.dirty.items():
+                tmp_path = path.with_name(f"{path.name}.tx-{tx.tx_id}.tmp")
+                staged.append((tmp_path, path))
+                self._write_file(tmp_path, data, target=path)
+            journaled = bool(tx.portfolio_records) + bool(tx.idempotency_records)
+            if len(staged) + journaled > 1:
+                # журнал появляется целиком: пишется рядом и переименовывается
+                journal = self._tx_journal_path(tx.tx_id)
+                draft = journal.with_suffix(".part")
+                self._write_file(
+                    draft,
+                    {
+                        "replace": [[str(tmp), str(dst)] for tmp, dst in staged],
+                        "portfolio_records": tx.portfolio_records,
+                        "idempotency_records": tx.idempotency_records,
+                        "changes": tx.changes,
+                    },
+                    indent=None,
+                    target=journal,
+                )
+                os.replace(draft, journal)
+                if self.fsync_writes:
+                    self._fsync_dir(self.data_dir)
+        except BaseException:
+            # до точки фиксации откат — просто удалить черновики
+            for tmp_path, _ in staged:
+                tmp_path.unlink(missing_ok=True)
+            for path in (draft, journal):
+                if path is not None:
+                    path.unlink(missing_ok=True)
+            raise
+
+        for tmp_path, path in staged:
+            os.replace(tmp_path, path)
+            self._cache.pop(path, None)
+        if self.fsync_writes:
+            self._fsync_dir(self.data_dir)
+        if tx.reset_portfolio_journal:
+            self._portfolio_journal.truncate()
+        if tx.portfolio_records:
+            ticket = self._portfolio_journal.write(tx.portfolio_records)
+            if journal is not None:
+                self._portfolio_journal.sync(ticket)
+            else:
+                tx.journal_ticket = ticket
+            if self._portfolio_journal.size() >= self.portfolio_snapshot_bytes:
+                self.snapshot_portfolios()
+        if tx.idempotency_records:
+            self._write_idempotency_records(tx.idempotency_records)
+        if tx.changes:
+            self._changes.append(tx.changes, tx=tx.tx_id)
+        if journal is not None:
+            journal.unlink()
+
+    def _stage_portfolios(self, tx: _Transaction) -> None:
+        """Сверить версии портфелей транзакции и подготовить их запись.
+
+        Выполняется при коммите под блокировкой portfolios.json, которая
+        держится до конца коммита: между проверкой и записью портфель
+        никто не изменит. Пока сделка считается, файл не заблокирован.
+        """
+        self.locked(self.portfolios_file)
+        raw_list: List[Dict] = []
+        if self.portfolio_storage == "journal":
+            stored = self._journal_portfolios()
+        else:
+            raw_list = self._load_json(self.portfolios_file, [])
+            stored = {item["user_id"]: item for item in raw_list}
+        for user_id, expected in tx.portfolio_versions.items():
+            item = stored.get(user_id)
+            actual = FIRST_PORTFOLIO_VERSION
+            if item is not None:
+                actual = item.get("version", FIRST_PORTFOLIO_VERSION)
+            if actual != expected:
+                raise PortfolioConflictError(user_id, expected=expected, actual=actual)
+
+        if self.portfolio_storage == "journal":
+            for user_id, data in tx.portfolios.items():
+                changes = self._wallet_changes(stored.get(user_id), data)
+                tx.portfolio_records.append(
+                    {"u": user_id, "v": data["version"], "w": changes}
+                )
+            return
+        positions = {item.get("user_id"): idx for idx, item in enumerate(raw_list)}
+        for user_id, data in tx.portfolios.items():
+            if user_id in positions:
+                raw_list[positions[user_id]] = data
+            else:
+                raw_list.append(data)
+        tx.dirty[self.portfolios_file] = raw_list
+
+    def _tx_journal_path(self, tx_id: str) -> Path:
+        return self.data_dir / f"{TX_JOURNAL_PREFIX}{tx_id}{TX_JOURNAL_SUFFIX}"
+
+    def _recover_transactions(self) -> None:
+        """Дописать коммиты, прерванные падением процесса.
+
+        Журнал перечисляет пары (временный файл, целевой файл) в порядке
+        захвата блокировок и записи журнала портфелей. Живой процесс
+        держит блокировки всех своих файлов до удаления журнала, поэтому
+        после их захвата журнал либо уже удалён, либо остался от упавшего
+        процесса. Записи портфелей дописываются повторно: лишние копии
+        пропускаются при чтении по версии. События ленты изменений тоже
+        дописываются повторно (доставка «хотя бы один раз», общий "tx").
+        """
+        pattern = f"{TX_JOURNAL_PREFIX}*{TX_JOURNAL_SUFFIX}"
+        for journal in sorted(self.data_dir.glob(pattern)):
+            try:
+                with open(journal, "r", encoding="utf-8") as f:
+                    content = json.load(f)
+                    if profiling.io_observers:
+                        profiling.record_read(journal, f.tell())
+                pairs = [(Path(tmp), Path(dst)) for tmp, dst in content["replace"]]
+                records = content.get("portfolio_records", [])
+                keys = content.get("idempotency_records", [])
+                changes = content.get("changes", [])
+            except FileNotFoundError:
+                continue
+            except (ValueError, TypeError, KeyError):
+                # повреждён (сбой питания без fsync) — коммит не состоялся
+                journal.unlink(missing_ok=True)
+                continue
+
+            with ExitStack() as stack:
+                for _, target in pairs:
+                    stack.enter_context(self._locks.file(target))
+                stack.enter_context(self._locks.file(self.portfolios_file))
+                stack.enter_context(self._locks.file(self.idempotency_file))
+                if not journal.exists():
+                    continue
+                for tmp_path, target in pairs:
+                    if tmp_path.exists():
+                        os.replace(tmp_path, target)
+                        self._fsync_dir(target.parent)
+                if records:
+                    self._portfolio_journal.drop_torn_tail()
+                    ticket = self._portfolio_journal.write(records)
+                    self._portfolio_journal.sync(ticket)
+                if keys:
+                    self._idempotency_journal.drop_torn_tail()
+                    self._write_idempotency_records(keys)
+                if changes:
+                    tx_id = journal.name[len(TX_JOURNAL_PREFIX):-len(TX_JOURNAL_SUFFIX)]
+                    self._changes.append(changes, tx=tx_id)
+                journal.unlink()
+
+        # временные файлы коммитов, не дошедших до журнала
+        for tmp_path in self.data_dir.glob("*.tx-*.tmp"):
+            target = self.data_dir / tmp_path.name.split(".tx-", 1)[0]
+            with self._locks.file(target):
+                tx_id = tmp_path.name.split(".tx-", 1)[1][: -len(".tmp")]
+                if not self._tx_journal_path(tx_id).exists():
+                    tmp_path.unlink(missing_ok=True)
 
     # --- низкоуровневые операции ---
 
+    @staticmethod
+    def _signature(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
     def _load_json(self, path: Path, default: Any) -> Any:
-        if path.exists():
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return default
+        """Прочитать JSON-файл; повторное чтение неизменённого файла — из кеша.
+
+        Кеш сверяется с сигнатурой (mtime_ns, size), поэтому изменения,
+        сделанные другим процессом, видны сразу. Возвращается копия
+        верхнего уровня: вызывающий код может добавлять и заменять
+        элементы, не портя кеш.
+        """
+        tx = self._tx()
+        if tx is not None and path in tx.dirty:
+            cache_hit()
+            return self._shallow_copy(tx.dirty[path])
+
+        signature = self._signature(path)
+        if signature is None:
+            return default
+
+        cached = self._cache.get(path)
+        if cached is not None and cached[0] == signature:
+            cache_hit()
+        else:
+            cache_miss()
+            # читатели не блокируют друг друга, но ждут идущую запись
+            with self._locks.file(path).shared():
+                signature = self._signature(path)
+                if signature is None:
+                    return default
+                with open(path, "r", encoding="utf-8") as f:
+                    cached = (signature, json.load(f))
+                if profiling.io_observers:
+                    profiling.record_read(path, signature[1])
+            self._cache[path] = cached
+
+        return self._shallow_copy(cached[1])
+
+    def _iter_json_array(self, path: Path) -> Iterator[Any]:
+        """Элементы JSON-массива по одному — для обхода больших файлов.
+
+        Данные транзакции и свежий кеш отдаются как есть; иначе файл
+        читается без кеширования, большой — потоком (jsonstream): память
+        не растёт с размером файла. Запись заменяет файл через os.replace, поэтому
+        открытый файл до конца обхода остаётся целым снимком, и
+        блокировка нужна только на время открытия.
+        """
+        tx = self._tx()
+        if tx is not None and path in tx.dirty:
+            cache_hit()
+            yield from self._shallow_copy(tx.dirty[path])
+            return
+        cached = self._cache.get(path)
+        if cached is not None and cached[0] == self._signature(path):
+            cache_hit()
+            yield from self._shallow_copy(cached[1])
+            return
+        cache_miss()
+        with self._locks.file(path).shared():
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                return
+        with f:
+            try:
+                yield from iter_json_elements(f, os.fstat(f.fileno()).st_size)
+            finally:
+                if profiling.io_observers:
+                    profiling.record_read(path, f.tell())
+
+    @staticmethod
+    def _shallow_copy(data: Any) -> Any:
+        if isinstance(data, dict):
+            return dict(data)
+        if isinstance(data, list):
+            return list(data)
+        return data
+
+    def _write_file(
+        self,
+        path: Path,
+        data: Any,
+        indent: Optional[int] = 2,
+        fsync: Optional[bool] = None,
+        target: Optional[Path] = None,
+    ) -> None:
+        """target — файл, вместо которого пишется временный (для профиля)."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+            if profiling.io_observers:
+                profiling.record_write(target or path, f.tell())
+            if self.fsync_writes if fsync is None else fsync:
+                f.flush()
+                os.fsync(f.fileno())
 
     def _save_json(self, path: Path, data: Any) -> None:
+        """Записать JSON через временный файл и os.replace.
+
+        Запись идёт под исключительной блокировкой файла (между потоками
+        и процессами); читатель видит либо старую, либо новую версию, но
+        никогда — наполовину записанную. При fsync_writes данные и
+        каталог сбрасываются на диск до возврата. Внутри transaction()
+        данные только попадают в буфер и пишутся при коммите.
+        """
+        tx = self._tx()
+        if tx is not None:
+            self.locked(path)
+            tx.dirty[path] = data
+            return
+
         self.data_dir.mkdir(parents=True, exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # у каждого потока свой временный файл
+        suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_path = path.with_name(f"{path.name}.{suffix}")
+        with self._locks.file(path):
+            self._write_file(tmp_path, data, target=path)
+            os.replace(tmp_path, path)
+            if self.fsync_writes:
+                self._fsync_dir(path.parent)
+            self._cache.pop(path, None)
+
+    def _append_json_array(
+        self,
+        path: Path,
+        rows: Iterable[Dict],
+        batch_size: int,
+    ) -> int:
+        """Дописать элементы в конец JSON-массива одним os.replace.
+
+        Имеющееся содержимое копируется во временный файл блоками, без
+        разбора; новые элементы пишутся пачками по batch_size (одна
+        запись на пачку), затем массив закрывается и временный файл
+        заменяет исходный. В памяти — одна пачка, сколько бы строк ни
+        было в файле и в rows. Если итерация rows бросит исключение
+        (например, импорт отклонён проверкой), временный файл удаляется
+        и файл данных не меняется. Возвращает число дописанных элементов.
+        """
+        if self._tx() is not None:
+            raise RuntimeError("Массовая вставка недоступна внутри transaction().")
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.bulk-{os.getpid()}.tmp")
+        count = 0
+        with self._locks.file(path):
+            try:
+                with open(tmp_path, "wb") as out:
+                    has_items = self._copy_array_head(path, out)
+                    batch: List[str] = []
+                    for row in rows:
+                        batch.append(json.dumps(row, ensure_ascii=False))
+                        if len(batch) >= batch_size:
+                            self._write_batch(out, batch, has_items or count > 0)
+                            count += len(batch)
+                            batch = []
+                    if batch:
+                        self._write_batch(out, batch, has_items or count > 0)
+                        count += len(batch)
+                    out.write(b"\n]\n")
+                    if profiling.io_observers:
+                        profiling.record_write(path, out.tell())
+                    if self.fsync_writes:
+                        out.flush()
+                        os.fsync(out.fileno())
+            except BaseException:
+                tmp_path.unlink(missing_ok=True)
+                raise
+            os.replace(tmp_path, path)
+            if self.fsync_writes:
+                self._fsync_dir(path.parent)
+            self._cache.pop(path, None)
+        return count
+
+    @staticmethod
+    def _copy_array_head(path: Path, out: Any) -> bool:
+        """Скопировать JSON-массив без закрывающей "]"; True — он не пуст."""
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            out.write(b"[")
+            return False
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            tail_start = max(0, size - ARRAY_TAIL_BYTES)
+            f.seek(tail_start)
+            tail = f.read()
+            end = tail.rfind(b"]")
+            if end < 0:
+                if tail_start == 0 and not tail.strip():  # пустой файл
+                    out.write(b"[")
+                    return False
+                raise ValueError(f"{path}: ожидался JSON-массив")
+            f.seek(0)
+            remaining = tail_start + end
+            last = b""
+            while remaining:
+                chunk = f.read(min(COPY_CHUNK_BYTES, remaining))
+                if not chunk:
+                    break
+                out.write(chunk)
+                remaining -= len(chunk)
+                stripped = chunk.rstrip()
+                if stripped:
+                    last = stripped[-1:]
+            if profiling.io_observers:
+                profiling.record_read(path, tail_start + end)
+            return last != b"["
+
+    @staticmethod
+    def _write_batch(out: Any, batch: List[str], continued: bool) -> None:
+        head = ",\n  " if continued else "\n  "
+        out.write((head + ",\n  ".join(batch)).encode("utf-8"))
+
+    @staticmethod
+    def _fsync_dir(directory: Path) -> None:
+        """Сбросить на диск запись каталога (результат os.replace)."""
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:  # на некоторых ОС каталог так не открыть
+            return
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    # --- лента изменений ---
+
+    def record_change(self, kind: str, data: Dict[str, Any]) -> None:
+        """Событие в ленту изменений: внутри transaction() — при коммите
+        (и не попадёт в ленту при откате), вне — сразу."""
+        self._emit(change_event(kind, data))
+
+    def _emit(self, event: Dict[str, Any]) -> None:
+        tx = self._tx()
+        if tx is not None:
+            tx.changes.append(event)
+        else:
+            self._changes.append([event])
 
     # --- пользователи ---
 
+    @traced()
     def load_users(self) -> List[User]:
         raw = self._load_json(self.users_file, [])
         return [User.from_dict(item) for item in raw]
 
+    @traced()
     def save_users(self, users: List[User]) -> None:
+        """Переписать users.json; в ленту — события о новых, изменённых
+        и удалённых пользователях (сравнение с сохранённым списком)."""
         data = [user.to_dict() for user in users]
-        self._save_json(self.users_file, data)
+        with self.transaction(), self.locked(self.users_file):
+            stored = self._load_json(self.users_file, [])
+            old = {item["user_id"]: item for item in stored}
+            for item in data:
+                previous = old.pop(item["user_id"], None)
+                if previous is None:
+                    kind, changed = CHANGE_USER_CREATED, None
+                elif previous != item:
+                    kind = CHANGE_USER_UPDATED
+                    changed = [key for key in item if previous.get(key) != item[key]]
+                else:
+                    continue
+                event = {key: item.get(key) for key in USER_CHANGE_FIELDS}
+                if changed is not None:
+                    event["changed"] = changed
+                self.record_change(kind, event)
+            for user_id in old:
+                self.record_change(CHANGE_USER_DELETED, {"user_id": user_id})
+            self._save_json(self.users_file, data)
+
+    def iter_users_raw(self) -> Iterator[Dict]:
+        """Пользователи как словари, без создания объектов User.
+
+        Файл читается потоком: экспорт и проверки импорта не держат в
+        памяти весь users.json.
+        """
+        yield from self._iter_json_array(self.users_file)
+
+    @traced()
+    def append_users_raw(self, rows: Iterable[Dict], batch_size: int) -> int:
+        """Дописать новых пользователей пачками (массовый импорт)."""
+        return self._append_json_array(self.users_file, rows, batch_size)
 
     # --- портфели ---
 
+    def _pending_portfolios(self) -> Dict[int, Dict[str, Any]]:
+        """Портфели, сохранённые в открытой транзакции (ещё не записаны)."""
+        tx = self._tx()
+        return tx.portfolios if tx is not None else {}
+
+    @traced()
     def load_portfolios_raw(self) -> List[Dict]:
-        return self._load_json(self.portfolios_file, [])
+        if self.portfolio_storage == "journal":
+            items = list(self._journal_portfolios().values())
+        else:
+            items = self._load_json(self.portfolios_file, [])
+        pending = dict(self._pending_portfolios())
+        if pending:
+            items = [pending.pop(item.get("user_id"), item) for item in items]
+            items.extend(pending.values())
+        return items
+
+    @traced()
+    def load_portfolio_raw(self, user_id: int) -> Optional[Dict]:
+        pending = self._pending_portfolios()
+        if user_id in pending:
+            return pending[user_id]
+        if self.portfolio_storage == "journal":
+            return self._journal_portfolios().get(user_id)
+        for item in self._load_json(self.portfolios_file, []):
+            if item.get("user_id") == user_id:
+                return item
+        return None
 
+    @traced()
     def save_portfolios_raw(self, data: List[Dict]) -> None:
-        self._save_json(self.portfolios_file, data)
+        """Переписать все портфели; в режиме "journal" — новый снимок."""
+        with self.transaction():
+            self._save_json(self.portfolios_file, data)
+            tx = self._tx()
+            if tx is not None and self.portfolio_storage == "journal":
+                tx.portfolio_records.clear()
+                tx.reset_portfolio_journal = True
+
+    @traced()
+    def save_portfolio_raw(self, data: Dict, expected_version: int) -> None:
+        """Сохранить один портфель (compare-and-swap по версии).
+
+        Портфель записывается, только если его версия в хранилище всё
+        ещё expected_version, иначе — PortfolioConflictError. Версия
+        сверяется сразу (конфликт виден до остальной работы сделки) и
+        ещё раз при коммите (_stage_portfolios). В режиме "snapshot"
+        коммит переписывает весь portfolios.json, в режиме "journal" —
+        дописывает строку с изменившимися кошельками. Те же изменения
+        кошельков уходят в ленту изменений.
+        """
+        user_id = data["user_id"]
+        with self.transaction():
+            tx = self._local.tx
+            current = self.load_portfolio_raw(user_id)
+            stored = FIRST_PORTFOLIO_VERSION
+            if current is not None:
+                stored = current.get("version", FIRST_PORTFOLIO_VERSION)
+            if stored != expected_version:
+                raise PortfolioConflictError(
+                    user_id, expected=expected_version, actual=stored
+                )
+            # при коммите сверяется версия первого чтения в транзакции
+            tx.portfolio_versions.setdefault(user_id, expected_version)
+            tx.portfolios[user_id] = data
+            changes = self._wallet_changes(current, data)
+            event = {"user_id": user_id, "version": data["version"]}
+            self.record_change(CHANGE_PORTFOLIO_UPDATED, dict(event, wallets=changes))
+
+    @staticmethod
+    def _wallet_changes(
+        current: Optional[Dict],
+        data: Dict,
+    ) -> Dict[str, Optional[float]]:
+        """Изменившиеся кошельки: {код: новый баланс или None — удалён}."""
+        old = (current or {}).get("wallets", {})
+        new = data.get("wallets", {})
+        changes: Dict[str, Optional[float]] = {
+            code: wallet.get("balance")
+            for code, wallet in new.items()
+            if old.get(code) != wallet
+        }
+        changes.update({code: None for code in old if code not in new})
+        return changes
+
+    def iter_portfolios_raw(self) -> Iterator[Dict]:
+        pending = dict(self._pending_portfolios())
+        if self.portfolio_storage == "journal":
+            items: Iterable[Dict] = self._journal_portfolios().values()
+        else:
+            items = self._iter_json_array(self.portfolios_file)
+        for item in items:
+            yield pending.pop(item.get("user_id"), item)
+        yield from pending.values()
+
+    @traced()
+    def append_portfolios_raw(self, rows: Iterable[Dict], batch_size: int) -> int:
+        """Дописать портфели новых пользователей в portfolios.json.
+
+        В режиме "journal" журнал не меняется: записей об этих
+        пользователях в нём нет, а снимок с новой сигнатурой читатели
+        перечитывают и применяют журнал к нему заново.
+        """
+        return self._append_json_array(self.portfolios_file, rows, batch_size)
+
+    def _journal_portfolios(self) -> Dict[int, Dict]:
+        """user_id -> портфель: снимок portfolios.json плюс журнал.
+
+        Разобранное состояние кешируется; при следующем чтении
+        дочитывается только новый хвост журнала. Снимок перечитывается,
+        если его переписали (после компакции журнала).
+        """
+        journal = self._portfolio_journal
+        state = self._portfolio_state
+        if (
+            state is not None
+            and state[0] == self._signature(self.portfolios_file)
+            and state[1] == journal.size()
+        ):
+            cache_hit()
+        else:
+            cache_miss()
+            with self._locks.file(self.portfolios_file).shared():
+                signature = self._signature(self.portfolios_file)
+                state = self._portfolio_state
+                if state is None or state[0] != signature or state[1] > journal.size():
+                    snapshot = self._load_json(self.portfolios_file, [])
+                    items = {item["user_id"]: item for item in snapshot}
+                    offset = 0
+                else:
+                    items, offset = dict(state[2]), state[1]
+                records, offset = journal.read_from(offset)
+                for record in records:
+                    _apply_portfolio_record(items, record)
+                state = self._portfolio_state = (signature, offset, items)
+        return state[2]
+
+    @traced()
+    def snapshot_portfolios(self) -> None:
+        """Записать снимок портфелей (снимок + журнал) и очистить журнал.
+
+        Снимок сбрасывается на диск до очистки журнала; если процесс
+        упадёт между этими шагами, журнал повторно применится к новому
+        снимку без последствий (записи сверяются по версии).
+        """
+        with self._locks.file(self.portfolios_file):
+            items = self._journal_portfolios()
+            tmp_path = self.portfolios_file.with_name(
+                f"{self.portfolios_file.name}.snapshot.tmp"
+            )
+            durable = self.portfolio_journal_fsync or self.fsync_writes
+            self._write_file(
+                tmp_path,
+                list(items.values()),
+                fsync=durable,
+                target=self.portfolios_file,
+            )
+            os.replace(tmp_path, self.portfolios_file)
+            if durable:
+                self._fsync_dir(self.portfolios_file.parent)
+            self._cache.pop(self.portfolios_file, None)
+            self._portfolio_journal.truncate()
+            self._portfolio_state = None
+
+    def _recover_portfolio_journal(self) -> None:
+        """Отрезать недописанный хвост журнала; в режиме "snapshot"
+        перенести оставшийся журнал в снимок."""
+        if not self._portfolio_journal.size():
+            return
+        with self._locks.file(self.portfolios_file):
+            self._portfolio_journal.drop_torn_tail()
+            if self.portfolio_storage == "snapshot" and self._portfolio_journal.size():
+                self.snapshot_portfolios()
 
     # --- курсы ---
 
+    @traced()
     def load_rates_raw(self) -> Dict[str, Any]:
         return self._load_json(self.rates_file, {})
 
+    @traced()
     def save_rates_raw(self, data: Dict[str, Any]) -> None:
-        self._save_json(self.rates_file, data)
+        with self.transaction(), self.locked(self.rates_file):
+            event = rates_change(self._load_json(self.rates_file, {}), data)
+            if event is not None:
+                self._emit(event)
+            self._save_json(self.rates_file, data)
+
+    # --- лимитные заявки и ценовые подписки ---
+    #
+    # orders.json и alerts.json — снимки, к которым дописываются журналы
+    # снятых записей: срабатывание на обновлении курсов пишет только id
+    # снятых заявок/подписок, а не весь файл.
+
+    @traced()
+    def load_order_books(self) -> OrderBooks:
+        """Стаканы: снимок orders.json плюс журнал снятых заявок (_load_books)."""
+        from ..core.orders import OrderBooks
+
+        return self._load_books(self.orders_file, OrderBooks.from_dict)
+
+    @traced()
+    def save_order_books(self, books: OrderBooks) -> None:
+        self._save_books(self.orders_file, books)
+
+    @traced()
+    def save_removed_orders(
+        self,
+        books: OrderBooks,
+        orders: List[LimitOrder],
+    ) -> None:
+        self._save_removed(self.orders_file, books, [o.order_id for o in orders])
+
+    @traced()
+    def load_alert_books(self) -> AlertBooks:
+        """Подписки: снимок alerts.json плюс журнал снятых подписок."""
+        from ..core.alerts import AlertBooks
+
+        return self._load_books(self.alerts_file, AlertBooks.from_dict)
+
+    @traced()
+    def save_alert_books(self, books: AlertBooks) -> None:
+        self._save_books(self.alerts_file, books)
+
+    @traced()
+    def save_removed_alerts(
+        self,
+        books: AlertBooks,
+        alerts: List[PriceAlert],
+    ) -> None:
+        self._save_removed(self.alerts_file, books, [a.alert_id for a in alerts])
+
+    def _load_books(self, path: Path, from_dict: Callable[[Dict], Any]) -> Any:
+        """Снимок path плюс журнал снятых записей.
+
+        Разобранный набор кешируется: пока снимок не переписан, при
+        следующем чтении применяется только новый хвост журнала, а без
+        изменений файлы не читаются вовсе. Возвращается сам кешированный
+        объект, поэтому и чтение, и изменение — под
+        LockManager().structural(), а изменённый набор сразу сохраняется
+        (_save_books или _save_removed).
+        """
+        journal, _ = self._removal_journals[path]
+        state = self._books_state.get(path)
+        if (
+            state is not None
+            and state[0] == self._signature(path)
+            and state[1] == journal.size()
+        ):
+            cache_hit()
+            return state[2]
+        cache_miss()
+        with self._locks.file(path).shared():
+            signature = self._signature(path)
+            if state is None or state[0] != signature or state[1] > journal.size():
+                books = from_dict(self._read_books_snapshot(path))
+                offset = 0
+            else:
+                books, offset = state[2], state[1]
+            records, offset = journal.read_from(offset)
+            for record in records:
+                for item_id in record["r"]:
+                    books.discard(item_id)
+            self._books_state[path] = (signature, offset, books)
+        return books
+
+    def _read_books_snapshot(self, path: Path) -> Dict[str, Any]:
+        """Снимок без кеша _load_json: разобранный набор и так кешируется
+        в _books_state."""
+        try:
+            f = open(path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return {}
+        with f:
+            data = json.load(f)
+            if profiling.io_observers:
+                profiling.record_read(path, f.tell())
+        return data
+
+    def _save_books(self, path: Path, books: Any) -> None:
+        """Записать снимок набора и очистить его журнал.
+
+        Если процесс упадёт между этими шагами, журнал повторно
+        применится к новому снимку без последствий: снятых записей в
+        снимке уже нет, а id не переиспользуются.
+        """
+        journal, _ = self._removal_journals[path]
+        suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_path = path.with_name(f"{path.name}.{suffix}")
+        with self._locks.file(path):
+            try:
+                self.data_dir.mkdir(parents=True, exist_ok=True)
+                self._write_file(tmp_path, books.to_dict(), target=path)
+                os.replace(tmp_path, path)
+                if self.fsync_writes:
+                    self._fsync_dir(path.parent)
+                journal.truncate()
+            except BaseException:
+                # кешированный набор уже изменён, а файлы — нет
+                self._books_state.pop(path, None)
+                raise
+            self._books_state[path] = (self._signature(path), 0, books)
+
+    def _save_removed(self, path: Path, books: Any, item_ids: List[int]) -> None:
+        """Записать снятие записей: одна строка журнала {"r": [id, ...]}.
+
+        Стоимость зависит от числа снятых записей, а не от размера
+        набора. Когда журнал вырастает больше порога снимка
+        (orders_snapshot_bytes, alerts_snapshot_bytes), набор
+        записывается новым снимком.
+        """
+        if not item_ids:
+            return
+        journal, snapshot_bytes = self._removal_journals[path]
+        with self._locks.file(path):
+            try:
+                journal.sync(journal.write([{"r": item_ids}]))
+            except BaseException:
+                self._books_state.pop(path, None)
+                raise
+            size = journal.size()
+            if size >= snapshot_bytes:
+                self._save_books(path, books)
+            else:
+                self._books_state[path] = (self._signature(path), size, books)
+
+    def _recover_append_journals(self) -> None:
+        """Отрезать недописанные хвосты журналов снятых записей и ключей."""
+        journals = [
+            (journal, path) for path, (journal, _) in self._removal_journals.items()
+        ]
+        journals.append((self._idempotency_journal, self.idempotency_file))
+        for journal, path in journals:
+            if journal.size():
+                with self._locks.file(path):
+                    journal.drop_torn_tail()
+
+    # --- ключи идемпотентности ---
+
+    @traced()
+    def load_idempotency_entries(self) -> "OrderedDict[str, Dict[str, Any]]":
+        """Ключ -> запись в порядке LRU: снимок idempotency.json плюс журнал.
+
+        Разобранное состояние кешируется, при следующем чтении
+        дочитывается только новый хвост журнала; повтор сделки по ключу
+        файлы не перечитывает. Возвращается сам кешированный словарь, без
+        копии: вызывать под locked(idempotency_file), и всякое изменение
+        словаря записывать в журнал (save_idempotency_entries) — хвост
+        журнала применяется к нему же на месте.
+        """
+        journal = self._idempotency_journal
+        state = self._idempotency_state
+        if (
+            state is not None
+            and state[0] == self._signature(self.idempotency_file)
+            and state[1] == journal.size()
+        ):
+            cache_hit()
+            return state[2]
+        cache_miss()
+        # исключительная блокировка: хвост применяется к общему словарю
+        with self._locks.file(self.idempotency_file):
+            signature = self._signature(self.idempotency_file)
+            if state is None or state[0] != signature or state[1] > journal.size():
+                snapshot = self._load_json(self.idempotency_file, {})
+                entries = OrderedDict(snapshot.get("entries", {}))
+                offset = 0
+            else:
+                entries, offset = state[2], state[1]
+            records, offset = journal.read_from(offset)
+            for record in records:
+                _apply_idempotency_record(entries, record)
+            self._idempotency_state = (signature, offset, entries)
+        return entries
+
+    def save_idempotency_entry(self, key: str, entry: Optional[Dict[str, Any]]) -> None:
+        """Записать ключ (None — удалить) одной строкой журнала."""
+        self.save_idempotency_entries([(key, entry)])
+
+    @traced()
+    def save_idempotency_entries(
+        self,
+        items: List[Tuple[str, Optional[Dict[str, Any]]]],
+    ) -> None:
+        """Записать ключи (None — удалить) строками журнала, одной записью.
+
+        Внутри transaction() строки пишутся при коммите, вместе с
+        остальными изменениями транзакции; вне — сразу. Если запись не
+        удалась, кеш ключей сбрасывается: вызывающий мог уже изменить
+        его на месте.
+        """
+        records = [{"k": key, "e": entry} for key, entry in items]
+        tx = self._tx()
+        if tx is not None:
+            tx.idempotency_records.extend(records)
+            return
+        try:
+            self._write_idempotency_records(records)
+        except BaseException:
+            self._idempotency_state = None
+            raise
+
+    def _write_idempotency_records(self, records: List[Dict[str, Any]]) -> None:
+        # под блокировкой файла: снимок не очистит журнал посреди записи
+        with self._locks.file(self.idempotency_file):
+            ticket = self._idempotency_journal.write(records)
+        self._idempotency_journal.sync(ticket)
+
+    def idempotency_snapshot_due(self) -> bool:
+        """Журнал ключей вырос больше idempotency_snapshot_bytes."""
+        return self._idempotency_journal.size() >= self.idempotency_snapshot_bytes
+
+    @traced()
+    def save_idempotency_raw(self, data: Dict[str, Any]) -> None:
+        """Записать снимок ключей в idempotency.json и очистить журнал.
+
+        Если процесс упадёт между этими шагами, журнал повторно
+        применится к новому снимку: записи ключей заменяют друг друга.
+        """
+        path = self.idempotency_file
+        suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_path = path.with_name(f"{path.name}.{suffix}")
+        with self._locks.file(path):
+            self.data_dir.mkdir(parents=True, exist_ok=True)
+            self._write_file(tmp_path, data, target=path)
+            os.replace(tmp_path, path)
+            if self.fsync_writes:
+                self._fsync_dir(path.parent)
+            self._cache.pop(path, None)
+            self._idempotency_journal.truncate()
+            self._idempotency_state = None
+
+    # --- outbox уведомлений ---
+    #
+    # У каждого пользователя свой файл alerts_outbox/user-<id>.jsonl:
+    # вход забирает только свои уведомления и не переписывает чужие.
+
+    def _outbox_path(self, user_id: int) -> Path:
+        return self.alerts_outbox_dir / f"user-{user_id}.jsonl"
+
+    @traced()
+    def append_outbox(self, records: List[Dict[str, Any]]) -> None:
+        """Дописать сработавшие уведомления в outbox получателей
+        (JSON Lines + fsync)."""
+        by_user: Dict[int, List[Dict[str, Any]]] = {}
+        for record in records:
+            by_user.setdefault(record["user_id"], []).append(record)
+        self.alerts_outbox_dir.mkdir(parents=True, exist_ok=True)
+        for user_id, user_records in by_user.items():
+            path = self._outbox_path(user_id)
+            with self._locks.file(path):
+                with open(path, "a", encoding="utf-8") as f:
+                    start = f.tell()
+                    for record in user_records:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                    if profiling.io_observers:
+                        profiling.record_write(path, f.tell() - start)
+
+    @traced()
+    def take_outbox(self, user_id: int) -> List[Dict[str, Any]]:
+        """Забрать (прочитать и удалить) outbox пользователя.
+
+        Стоимость зависит только от числа его уведомлений. Если процесс
+        упадёт до удаления файла, уведомления будут выданы ещё раз.
+        """
+        path = self._outbox_path(user_id)
+        if not path.exists():
+            return []
+        with self._locks.file(path):
+            try:
+                f = open(path, "r", encoding="utf-8")
+            except FileNotFoundError:
+                return []
+            with f:
+                records = [json.loads(line) for line in f if line.strip()]
+                if profiling.io_observers:
+                    profiling.record_read(path, os.fstat(f.fileno()).st_size)
+            path.unlink()
+        return records
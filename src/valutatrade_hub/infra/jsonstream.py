@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import codecs
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator
+
+from .. import profiling
+
+STREAM_CHUNK_BYTES = 1 << 16  # сколько байт читать за раз
+# Файлы не больше этого читаются целиком: json.load вдвое быстрее
+# поэлементного разбора, а память на таком размере не важна.
+WHOLE_FILE_BYTES = 1 << 20
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+def iter_json_array(
+    source: BinaryIO,
+    chunk_size: int = STREAM_CHUNK_BYTES,
+) -> Iterator[Any]:
+    """Элементы JSON-массива из бинарного файла — по одному, по мере чтения.
+
+    Файл читается блоками по chunk_size и декодируется из UTF-8 по
+    частям; каждый элемент разбирается JSONDecoder.raw_decode (C-сканер
+    json), разобранная часть буфера отбрасывается. В памяти — текущий
+    блок и один элемент, а не весь текст файла и весь список, как у
+    json.load. Элемент считается законченным, только когда за ним в
+    буфере уже есть ',' или ']': число на границе блоков не обрежется.
+    Некорректный JSON — ValueError.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        """Дочитать блок в буфер; False — файл закончился."""
+        nonlocal buffer, pos, eof
+        if eof:
+            return False
+        data = source.read(chunk_size)
+        if not data:
+            eof = True
+            buffer = buffer[pos:] + decoder.decode(b"", final=True)
+        else:
+            buffer = buffer[pos:] + decoder.decode(data)
+        pos = 0
+        return True
+
+    def skip_whitespace() -> bool:
+        """Пропустить пробелы; False — буфер и файл кончились."""
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer):
+                return True
+            if not fill():
+                return False
+
+    if not skip_whitespace() or buffer[pos] != "[":
+        raise ValueError("Ожидался JSON-массив")
+    pos += 1
+    if not skip_whitespace():
+        raise ValueError("JSON-массив не закрыт")
+    if buffer[pos] == "]":
+        return
+
+    while True:
+        try:
+            item, end = _DECODER.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if fill():  # элемент не поместился в буфер
+                continue
+            raise ValueError("Некорректный элемент JSON-массива") from None
+        after = _WHITESPACE.match(buffer, end).end()
+        if after == len(buffer) or buffer[after] not in ",]":
+            # "12" из "123", "1." из "1.5": элемент, возможно, не дочитан
+            if fill():
+                continue
+            if after == len(buffer):
+                raise ValueError("JSON-массив не закрыт")
+            raise ValueError(
+                f"Ожидалась ',' или ']' в JSON-массиве: {buffer[after]!r}"
+            )
+        delimiter = buffer[after]
+        pos = after + 1
+        yield item
+        if delimiter == "]":
+            return
+        if not skip_whitespace():
+            raise ValueError("JSON-массив не закрыт")
+
+
+def iter_json_elements(
+    source: BinaryIO,
+    size: int,
+    chunk_size: int = STREAM_CHUNK_BYTES,
+) -> Iterator[Any]:
+    """Элементы JSON-массива из открытого файла размером size байт.
+
+    Небольшой файл разбирается целиком, большой — потоком
+    (iter_json_array): память ограничена независимо от размера файла.
+    """
+    if size > WHOLE_FILE_BYTES:
+        yield from iter_json_array(source, chunk_size)
+        return
+    data = json.load(source)
+    if not isinstance(data, list):
+        raise ValueError("Ожидался JSON-массив")
+    yield from data
+
+
+def iter_json_file(path: Path, chunk_size: int = STREAM_CHUNK_BYTES) -> Iterator[Any]:
+    """Элементы JSON-массива из файла path; нет файла — ничего."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        try:
+            yield from iter_json_elements(f, os.fstat(f.fileno()).st_size, chunk_size)
+        finally:  # и при обходе, прерванном на середине
+            if profiling.io_observers:
+                profiling.record_read(path, f.tell())
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Hashable, Iterator, Optional
+
+from .settings import SettingsLoader
+
+try:
+    import fcntl
+except ImportError:  # Windows: остаются только блокировки между потоками
+    fcntl = None  # type: ignore[assignment]
+
+LOCKS_DIR_NAME = ".locks"
+
+
+def _open_lock_file(path: Path) -> int:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+
+class ProcessLock:
+    """Реентерабельная блокировка между потоками и процессами.
+
+    Внутри процесса — RLock, между процессами — fcntl.flock на файле
+    блокировки. flock берётся только внешним захватом и снимается
+    закрытием дескриптора при выходе из него.
+    """
+
+    def __init__(self, lock_path: Path) -> None:
+        self._path = lock_path
+        self._rlock = threading.RLock()
+        self._owner: Optional[int] = None
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    def __enter__(self) -> "ProcessLock":
+        self._rlock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                fd = _open_lock_file(self._path)
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            except BaseException:
+                self._rlock.release()
+                raise
+            self._fd = fd
+        self._owner = threading.get_ident()
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            self._owner = None
+            if self._fd is not None:
+                os.close(self._fd)  # закрытие снимает flock
+                self._fd = None
+        self._rlock.release()
+
+    def held_by_current_thread(self) -> bool:
+        return self._owner == threading.get_ident()
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        """Разделяемая блокировка для чтения.
+
+        Читатели не мешают друг другу и ждут только писателя. Если
+        текущий поток уже держит исключительную блокировку, повторно
+        ничего не захватывается.
+        """
+        if fcntl is None or self.held_by_current_thread():
+            yield
+            return
+        fd = _open_lock_file(self._path)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            yield
+        finally:
+            os.close(fd)
+
+
+class LockManager:
+    """Singleton с блокировками для параллельного выполнения use case'ов.
+
+    - structural() — глобальная блокировка для записей, меняющих общую
+      структуру данных: регистрация, стаканы заявок, подписки;
+    - file(path) — блокировка чтения-изменения-записи одного файла
+      данных; file(path).shared() — для чтения.
+
+    Все блокировки действуют и между потоками, и между процессами,
+    работающими с одним каталогом данных (файлы в data/.locks/).
+    Порядок захвата, исключающий взаимоблокировки: structural -> file;
+    блокировка portfolios.json в сделке берётся последней, при коммите.
+    Все блокировки реентерабельные.
+    """
+
+    _instance: "LockManager | None" = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls) -> "LockManager":
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._init_locks()
+                    cls._instance = instance
+        return cls._instance
+
+    def _init_locks(self) -> None:
+        data_dir = Path(SettingsLoader().get("data_dir")).resolve()
+        self._dir = data_dir / LOCKS_DIR_NAME
+        self._guard = threading.Lock()
+        self._locks: Dict[Hashable, ProcessLock] = {}
+
+    def _get(self, key: Hashable, file_name: str) -> ProcessLock:
+        lock = self._locks.get(key)
+        if lock is None:
+            with self._guard:
+                lock = self._locks.get(key)
+                if lock is None:
+                    lock = self._locks[key] = ProcessLock(self._dir / file_name)
+        return lock
+
+    def structural(self) -> ProcessLock:
+        return self._get("structural", "structural.lock")
+
+    def file(self, path: Path) -> ProcessLock:
+        return self._get(("file", Path(path).resolve()), f"{Path(path).name}.lock")
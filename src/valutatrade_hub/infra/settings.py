@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import os
+import threading
 from dataclasses import dataclass
 from typing import Any, Dict
 
@@ -20,6 +22,32 @@ class SettingsData:
     rates_ttl_seconds: int
     default_base_currency: str
     history_file: str          # ← вот это поле
+    history_archive_file: str
+    history_archive_codec: str
+    history_archive_chunk_size: int
+    history_dir: str
+    history_segment_granularity: str
+    history_retention_days: int
+    history_retention_action: str
+    orders_file: str
+    orders_journal_file: str
+    orders_snapshot_bytes: int
+    alerts_file: str
+    alerts_journal_file: str
+    alerts_snapshot_bytes: int
+    alerts_outbox_dir: str
+    fsync_writes: bool
+    portfolio_storage: str
+    portfolios_journal_file: str
+    portfolio_journal_fsync: bool
+    portfolio_snapshot_bytes: int
+    idempotency_file: str
+    idempotency_journal_file: str
+    idempotency_snapshot_bytes: int
+    changes_file: str
+    changes_offsets_file: str
+    metrics_file: str
+    metrics_prom_file: str
 
 
 class SettingsLoader:
@@ -29,11 +57,17 @@ class SettingsLoader:
     """
 
     _instance: "SettingsLoader | None" = None
+    _instance_lock = threading.Lock()
 
     def __new__(cls) -> "SettingsLoader":
+        # двойная проверка: блокировка нужна только при первом создании;
+        # экземпляр публикуется после полной инициализации
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._init_settings()
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._init_settings()
+                    cls._instance = instance
         return cls._instance
 
     def _init_settings(self) -> None:
@@ -50,6 +84,34 @@ class SettingsLoader:
             rates_ttl_seconds=constants.RATE_FRESHNESS_SECONDS,
             default_base_currency=constants.DEFAULT_BASE_CURRENCY,
             history_file=str(constants.EXCHANGE_RATES_HISTORY_FILE),  # ← добавили
+            history_archive_file=str(constants.HISTORY_ARCHIVE_FILE),
+            history_archive_codec=constants.HISTORY_ARCHIVE_CODEC,
+            history_archive_chunk_size=constants.HISTORY_ARCHIVE_CHUNK_SIZE,
+            history_dir=str(constants.HISTORY_DIR),
+            history_segment_granularity=constants.HISTORY_SEGMENT_GRANULARITY,
+            history_retention_days=constants.HISTORY_RETENTION_DAYS,
+            history_retention_action=constants.HISTORY_RETENTION_ACTION,
+            orders_file=str(constants.ORDERS_FILE),
+            orders_journal_file=str(constants.ORDERS_JOURNAL_FILE),
+            orders_snapshot_bytes=constants.ORDERS_SNAPSHOT_BYTES,
+            alerts_file=str(constants.ALERTS_FILE),
+            alerts_journal_file=str(constants.ALERTS_JOURNAL_FILE),
+            alerts_snapshot_bytes=constants.ALERTS_SNAPSHOT_BYTES,
+            alerts_outbox_dir=str(constants.ALERTS_OUTBOX_DIR),
+            fsync_writes=constants.DB_FSYNC_WRITES,
+            portfolio_storage=os.getenv(
+                "VALUTATRADE_PORTFOLIO_STORAGE", constants.PORTFOLIO_STORAGE
+            ),
+            portfolios_journal_file=str(constants.PORTFOLIOS_JOURNAL_FILE),
+            portfolio_journal_fsync=constants.PORTFOLIO_JOURNAL_FSYNC,
+            portfolio_snapshot_bytes=constants.PORTFOLIO_SNAPSHOT_BYTES,
+            idempotency_file=str(constants.IDEMPOTENCY_FILE),
+            idempotency_journal_file=str(constants.IDEMPOTENCY_JOURNAL_FILE),
+            idempotency_snapshot_bytes=constants.IDEMPOTENCY_SNAPSHOT_BYTES,
+            changes_file=str(constants.CHANGES_FILE),
+            changes_offsets_file=str(constants.CHANGES_OFFSETS_FILE),
+            metrics_file=str(constants.METRICS_FILE),
+            metrics_prom_file=str(constants.METRICS_PROM_FILE),
         )
 
     def get(self, key: str, default: Any | None = None) -> Any:
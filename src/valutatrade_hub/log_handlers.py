@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Any
+
+from .core.constants import LOG_BACKUP_COUNT, LOG_DIR, LOG_FILE, LOG_MAX_BYTES
+from .infra.locks import ProcessLock
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler без форматирования в вызывающем потоке.
+
+    Стандартный prepare() склеивает msg % args ещё до постановки в
+    очередь; здесь запись уходит как есть, а форматирует её уже
+    QueueListener. Аргументы логирования не должны меняться после
+    вызова logger.*() — так и устроены все вызовы в проекте.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class ProcessSafeRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler для нескольких процессов с одним файлом журнала.
+
+    Каждая запись идёт под межпроцессной блокировкой (файл рядом с
+    журналом). Если файл уже повернул другой процесс, обработчик
+    переоткрывает его, а не продолжает писать в переименованный
+    actions.log.1, и ротация выполняется ровно один раз.
+    """
+
+    def __init__(self, filename: os.PathLike[str] | str, **kwargs: Any) -> None:
+        super().__init__(filename, **kwargs)
+        base = Path(self.baseFilename)
+        self._process_lock = ProcessLock(base.with_name(f".{base.name}.lock"))
+
+    def _reopen_if_rotated(self) -> None:
+        if self.stream is None:
+            return
+        try:
+            on_disk = os.stat(self.baseFilename).st_ino
+        except FileNotFoundError:
+            on_disk = None
+        if on_disk != os.fstat(self.stream.fileno()).st_ino:
+            self.stream.close()
+            self.stream = self._open()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            with self._process_lock:
+                self._reopen_if_rotated()
+                super().emit(record)
+        except Exception:
+            self.handleError(record)
+
+
+class LogPipeline:
+    """Очередь и фоновый QueueListener с файловым и консольным выводом."""
+
+    def __init__(
+        self,
+        file_formatter: logging.Formatter,
+        console_formatter: logging.Formatter,
+    ) -> None:
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+
+        file_handler = ProcessSafeRotatingFileHandler(
+            LOG_FILE,
+            maxBytes=LOG_MAX_BYTES,
+            backupCount=LOG_BACKUP_COUNT,
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(file_formatter)
+
+        # дублируем в консоль при отладке (можно отключить)
+        console = logging.StreamHandler()
+        console.setFormatter(console_formatter)
+        # сводки трассировки (tracing.request) — только в файл
+        console.addFilter(lambda record: not hasattr(record, "trace"))
+
+        self.queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self.handler = DeferredQueueHandler(self.queue)
+        self.listener = QueueListener(
+            self.queue, file_handler, console, respect_handler_level=True
+        )
+        self.listener.start()
+        self._running = True
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Дописать очередь и остановить фоновый поток."""
+        if self._running:
+            self._running = False
+            self.listener.stop()
@@ -1,40 +1,94 @@
 from __future__ import annotations
 
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import threading
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Optional
 
-from .core.constants import (
-    LOG_DIR,
-    LOG_FILE,
-    LOG_FORMAT,
-    LOG_LEVEL,
-    LOG_MAX_BYTES,
-    LOG_BACKUP_COUNT,
-)
+from .core.constants import LOG_FORMAT, LOG_LEVEL
+
+# logging.handlers (а с ним queue, socket, pickle) нужен только при
+# первой записи: см. log_handlers.py
+if TYPE_CHECKING:
+    from .log_handlers import LogPipeline
+
+
+LOGGER_NAME = "valutatrade"
+
+# служебные атрибуты LogRecord: всё остальное пришло через extra=
+_RECORD_FIELDS = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", (), None))
+) | {"message", "asctime"}
+
+_configure_lock = threading.Lock()
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON.
+
+    Поля: ts (UTC, ISO 8601), level, logger, message, process, затем
+    всё, что передано через extra= (например, event из @log_action), и
+    exc_info при исключении. Сообщение собирается из msg % args только
+    здесь, то есть в потоке записи, а не в потоке операции.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=_json_default)
+
+
+class TextFormatter(logging.Formatter):
+    """Человекочитаемый формат для консоли; event выводится словарём."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        event = getattr(record, "event", None)
+        return f"{text} {event}" if event is not None else text
+
+
+_pipeline: Optional["LogPipeline"] = None
 
 
 def configure_logging() -> logging.Logger:
-    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    """Подключить обработчики логгера (один раз на процесс).
+
+    Вызывается лениво — при первой залогированной операции, а не при
+    импорте модулей, чтобы старт CLI не создавал каталогов и файлов.
 
-    logger = logging.getLogger("valutatrade")
+    Логгер пишет только в очередь (DeferredQueueHandler): форматирование
+    в JSON, запись в файл, ротация и вывод в консоль выполняются в
+    фоновом потоке QueueListener, и длительность операции не включает
+    ввод-вывод журнала.
+    """
+    global _pipeline
+    logger = logging.getLogger(LOGGER_NAME)
     if logger.handlers:
         return logger
 
-    logger.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
-
-    handler = RotatingFileHandler(
-        LOG_FILE,
-        maxBytes=LOG_MAX_BYTES,
-        backupCount=LOG_BACKUP_COUNT,
-        encoding="utf-8",
-    )
-    formatter = logging.Formatter(LOG_FORMAT)
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-
-    # дублируем в консоль при отладке (можно отключить)
-    console = logging.StreamHandler()
-    console.setFormatter(formatter)
-    logger.addHandler(console)
+    with _configure_lock:
+        if logger.handlers:
+            return logger
+        from .log_handlers import LogPipeline
 
+        logger.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        _pipeline = LogPipeline(JsonFormatter(), TextFormatter(LOG_FORMAT))
+        logger.addHandler(_pipeline.handler)
     return logger
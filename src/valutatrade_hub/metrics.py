@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from .core.constants import (
+    METRICS_BUCKETS_SECONDS,
+    METRICS_FLUSH_SECONDS,
+)
+
+METRIC_PREFIX = "valutatrade_action"
+
+
+class LatencyHistogram:
+    """Гистограмма длительностей с фиксированными границами корзин.
+
+    Корзина i считает наблюдения <= bounds[i]; последняя (лишняя)
+    корзина — всё, что больше последней границы (+Inf). Перцентили
+    оцениваются линейной интерполяцией внутри корзины, как
+    histogram_quantile в Prometheus.
+    """
+
+    __slots__ = ("bounds", "counts", "total", "count", "ok", "errors")
+
+    def __init__(self, bounds: Tuple[float, ...] = METRICS_BUCKETS_SECONDS) -> None:
+        self.bounds = bounds
+        self.counts: List[int] = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.ok = 0
+        self.errors = 0
+
+    def observe(self, seconds: float, ok: bool = True) -> None:
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        if ok:
+            self.ok += 1
+        else:
+            self.errors += 1
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for i, value in enumerate(other.counts):
+            self.counts[i] += value
+        self.total += other.total
+        self.count += other.count
+        self.ok += other.ok
+        self.errors += other.errors
+
+    def quantile(self, q: float) -> float:
+        """Оценка q-квантиля (0..1) в секундах; 0.0 без наблюдений."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, value in enumerate(self.counts):
+            if cumulative + value >= rank and value:
+                if i == len(self.bounds):
+                    return self.bounds[-1]  # хвост за последней границей
+                lower = self.bounds[i - 1] if i else 0.0
+                fraction = (rank - cumulative) / value
+                return lower + (self.bounds[i] - lower) * fraction
+            cumulative += value
+        return self.bounds[-1]
+
+    def to_dict(self) -> dict:
+        return {
+            "counts": list(self.counts),
+            "sum": self.total,
+            "count": self.count,
+            "ok": self.ok,
+            "errors": self.errors,
+        }
+
+    @classmethod
+    def from_dict(
+        cls,
+        data: dict,
+        bounds: Tuple[float, ...] = METRICS_BUCKETS_SECONDS,
+    ) -> "LatencyHistogram":
+        histogram = cls(bounds)
+        counts = data.get("counts", [])
+        if len(counts) == len(histogram.counts):
+            histogram.counts = [int(value) for value in counts]
+        histogram.total = float(data.get("sum", 0.0))
+        histogram.count = int(data.get("count", 0))
+        histogram.ok = int(data.get("ok", 0))
+        histogram.errors = int(data.get("errors", 0))
+        return histogram
+
+
+def load_histograms(path: Path) -> Dict[str, LatencyHistogram]:
+    """Гистограммы из файла metrics.json; нет файла — пустой словарь."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if tuple(raw.get("bounds", ())) != METRICS_BUCKETS_SECONDS:
+        return {}  # границы корзин поменялись — старые данные несравнимы
+    return {
+        action: LatencyHistogram.from_dict(data)
+        for action, data in raw.get("actions", {}).items()
+    }
+
+
+class MetricsRegistry:
+    """Singleton: гистограммы длительности и счётчики по операциям.
+
+    observe() только обновляет счётчики в памяти (одна блокировка, без
+    ввода-вывода). Накопленное сбрасывается в общий metrics.json (его
+    дополняют все процессы) не чаще раза в METRICS_FLUSH_SECONDS и при
+    выходе из процесса; тогда же обновляется metrics.prom в текстовом
+    формате Prometheus.
+    """
+
+    _instance: "MetricsRegistry | None" = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls) -> "MetricsRegistry":
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._init_registry()
+                    cls._instance = instance
+        return cls._instance
+
+    def _init_registry(self) -> None:
+        from .infra.settings import SettingsLoader
+
+        settings = SettingsLoader()
+        self._lock = threading.Lock()
+        # ещё не сброшенные в файл наблюдения этого процесса
+        self._pending: Dict[str, LatencyHistogram] = {}
+        self._last_flush = time.monotonic()
+        self._atexit_registered = False
+        # пути фиксируются при создании: сброс при выходе из процесса не
+        # должен зависеть от того, куда к тому времени сменился cwd
+        self.metrics_file = Path(settings.get("metrics_file")).resolve()
+        self.prom_file = Path(settings.get("metrics_prom_file")).resolve()
+
+    def observe(self, action: str, seconds: float, ok: bool = True) -> None:
+        with self._lock:
+            histogram = self._pending.get(action)
+            if histogram is None:
+                histogram = self._pending[action] = LatencyHistogram()
+                if not self._atexit_registered:
+                    atexit.register(self.flush)
+                    self._atexit_registered = True
+            histogram.observe(seconds, ok)
+            due = time.monotonic() - self._last_flush >= METRICS_FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def _take_pending(self) -> Dict[str, LatencyHistogram]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        return pending
+
+    def _load_file(self) -> Dict[str, LatencyHistogram]:
+        return load_histograms(self.metrics_file)
+
+    def flush(self) -> None:
+        """Добавить накопленное в metrics.json и переписать metrics.prom."""
+        pending = self._take_pending()
+        if not pending:
+            return
+        from .infra.locks import LockManager
+
+        self.metrics_file.parent.mkdir(parents=True, exist_ok=True)
+        with LockManager().file(self.metrics_file):
+            merged = self._load_file()
+            for action, histogram in pending.items():
+                merged.setdefault(action, LatencyHistogram()).merge(histogram)
+            payload = {
+                "bounds": list(METRICS_BUCKETS_SECONDS),
+                "actions": {a: h.to_dict() for a, h in sorted(merged.items())},
+            }
+            tmp_path = self.metrics_file.with_name(
+                f"{self.metrics_file.name}.{os.getpid()}.tmp"
+            )
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, self.metrics_file)
+            self._write_prometheus(merged)
+
+    def _write_prometheus(self, histograms: Dict[str, LatencyHistogram]) -> None:
+        self.prom_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.prom_file.with_name(
+            f"{self.prom_file.name}.{os.getpid()}.tmp"
+        )
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(render_prometheus(histograms))
+        os.replace(tmp_path, self.prom_file)
+
+    def collect(self) -> Dict[str, LatencyHistogram]:
+        """Все наблюдения: из metrics.json плюс ещё не сброшенные."""
+        merged = self._load_file()
+        with self._lock:
+            for action, histogram in self._pending.items():
+                merged.setdefault(action, LatencyHistogram()).merge(histogram)
+        return merged
+
+    def reset(self) -> None:
+        """Забыть накопленные метрики (в памяти и в файлах)."""
+        from .infra.locks import LockManager
+
+        self._take_pending()
+        with LockManager().file(self.metrics_file):
+            for path in (self.metrics_file, self.prom_file):
+                path.unlink(missing_ok=True)
+
+
+def summarize(histograms: Dict[str, LatencyHistogram]) -> List[Dict[str, Any]]:
+    """Строки для вывода: число вызовов, ошибки, среднее и перцентили в мс."""
+    rows = []
+    for action, histogram in sorted(histograms.items()):
+        mean = histogram.total / histogram.count if histogram.count else 0.0
+        rows.append(
+            {
+                "action": action,
+                "count": histogram.count,
+                "ok": histogram.ok,
+                "errors": histogram.errors,
+                "mean_ms": round(mean * 1000, 3),
+                "p50_ms": round(histogram.quantile(0.50) * 1000, 3),
+                "p95_ms": round(histogram.quantile(0.95) * 1000, 3),
+                "p99_ms": round(histogram.quantile(0.99) * 1000, 3),
+            }
+        )
+    return rows
+
+
+def render_prometheus(histograms: Dict[str, LatencyHistogram]) -> str:
+    """Текстовый формат экспозиции Prometheus (version 0.0.4)."""
+    name = f"{METRIC_PREFIX}_duration_seconds"
+    lines = [
+        f"# HELP {name} Длительность доменных операций (log_action).",
+        f"# TYPE {name} histogram",
+    ]
+    for action, histogram in sorted(histograms.items()):
+        label = f'action="{action}"'
+        cumulative = 0
+        for bound, value in zip(histogram.bounds, histogram.counts):
+            cumulative += value
+            lines.append(f'{name}_bucket{{{label},le="{bound:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{label},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{label}}} {histogram.total:.6f}")
+        lines.append(f"{name}_count{{{label}}} {histogram.count}")
+
+    total = f"{METRIC_PREFIX}s_total"
+    lines.append(f"# HELP {total} Число доменных операций по результату.")
+    lines.append(f"# TYPE {total} counter")
+    for action, histogram in sorted(histograms.items()):
+        label = f'action="{action}"'
+        lines.append(f'{total}{{{label},result="ok"}} {histogram.ok}')
+        lines.append(f'{total}{{{label},result="error"}} {histogram.errors}')
+    return "\n".join(lines) + "\n"
+
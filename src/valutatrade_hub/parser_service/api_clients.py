@@ -4,8 +4,6 @@ import time
 from abc import ABC, abstractmethod
 from typing import Any, Dict
 
-import requests
-
 from ..core.exceptions import ApiRequestError
 from ..core.constants import RATES_TO_USD
 from .config import ParserConfig, COINGECKO_SOURCE_NAME, EXCHANGERATE_SOURCE_NAME
@@ -64,6 +62,8 @@ class CoinGeckoClient(BaseApiClient):
             "vs_currencies": self.config.BASE_CURRENCY.lower(),
         }
 
+        import requests  # тяжёлый импорт — только при реальном запросе
+
         start_ms = int(time.time() * 1000)
         try:
             response = requests.get(
@@ -130,6 +130,8 @@ class ExchangeRateApiClient(BaseApiClient):
             f"{self.config.BASE_CURRENCY}"
         )
 
+        import requests  # тяжёлый импорт — только при реальном запросе
+
         start_ms = int(time.time() * 1000)
         try:
             response = requests.get(
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .. import profiling
+from ..infra.locks import LockManager, ProcessLock
+
+ARCHIVE_FORMAT_VERSION = 1
+
+ARCHIVE_CODECS = ("lzma", "zlib")
+
+
+def _codec(name: str) -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    """(compress, decompress) для кодека; модули сжатия грузятся по требованию."""
+    if name == "lzma":
+        import lzma
+
+        return lzma.compress, lzma.decompress
+    if name == "zlib":
+        import zlib
+
+        return (lambda raw: zlib.compress(raw, 9)), zlib.decompress
+    raise ValueError(f"Неизвестный кодек архива: {name}")
+
+
+def _epoch_us(value: str) -> int:
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return round(dt.timestamp() * 1_000_000)
+
+
+def _iso_from_us(value: int) -> str:
+    seconds, micros = divmod(value, 1_000_000)
+    dt = datetime.fromtimestamp(seconds, tz=timezone.utc)
+    return dt.replace(microsecond=micros).isoformat()
+
+
+def encode_chunk(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Упаковать записи истории в компактную структуру чанка.
+
+    По каждой паре:
+    - t0 + dt: метки времени в микросекундах, дельта-кодирование;
+    - runs: [rate, source_idx, meta_idx, длина] — подряд идущие записи
+      с одинаковыми курсом, источником и meta схлопываются в один run.
+    Источники и meta интернируются в общие для чанка словари.
+    """
+    sources: List[str] = []
+    source_ids: Dict[str, int] = {}
+    metas: List[Any] = []
+    meta_ids: Dict[str, int] = {}
+    by_pair: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+
+    for entry in entries:
+        pair = f"{entry['from_currency']}_{entry['to_currency']}"
+        by_pair.setdefault(pair, []).append((_epoch_us(entry["timestamp"]), entry))
+
+    pairs: Dict[str, Any] = {}
+    for pair, rows in sorted(by_pair.items()):
+        rows.sort(key=lambda row: row[0])
+        deltas: List[int] = []
+        runs: List[List[Any]] = []
+        prev_ts = rows[0][0]
+
+        for ts, entry in rows:
+            if runs:
+                deltas.append(ts - prev_ts)
+            prev_ts = ts
+
+            source = entry.get("source", "")
+            if source not in source_ids:
+                source_ids[source] = len(sources)
+                sources.append(source)
+
+            meta = entry.get("meta", {})
+            meta_key = json.dumps(meta, sort_keys=True, ensure_ascii=False)
+            if meta_key not in meta_ids:
+                meta_ids[meta_key] = len(metas)
+                metas.append(meta)
+
+            value = [float(entry["rate"]), source_ids[source], meta_ids[meta_key]]
+            if runs and runs[-1][:3] == value:
+                runs[-1][3] += 1
+            else:
+                runs.append(value + [1])
+
+        pairs[pair] = {"t0": rows[0][0], "dt": deltas, "runs": runs}
+
+    return {
+        "v": ARCHIVE_FORMAT_VERSION,
+        "sources": sources,
+        "meta": metas,
+        "pairs": pairs,
+    }
+
+
+def decode_chunk(chunk: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Обратное преобразование: выдаёт записи в формате истории."""
+    sources = chunk["sources"]
+    metas = chunk["meta"]
+
+    for pair, data in chunk["pairs"].items():
+        from_code, to_code = pair.split("_", maxsplit=1)
+        ts = data["t0"]
+        deltas = iter(data["dt"])
+        first = True
+
+        for rate, source_idx, meta_idx, length in data["runs"]:
+            for _ in range(length):
+                if not first:
+                    ts += next(deltas)
+                first = False
+                timestamp = _iso_from_us(ts)
+                yield {
+                    "id": f"{from_code}_{to_code}_{timestamp}",
+                    "from_currency": from_code,
+                    "to_currency": to_code,
+                    "rate": rate,
+                    "timestamp": timestamp,
+                    "source": sources[source_idx],
+                    "meta": metas[meta_idx],
+                }
+
+
+class HistoryArchive:
+    """Архив «холодной» истории курсов.
+
+    Данные — последовательность независимо сжатых чанков в одном файле,
+    рядом — JSON-индекс чанков (смещение, длина, кодек, диапазон времени).
+    Чтение диапазона распаковывает только пересекающиеся с ним чанки.
+
+    watermark — граница архивации: все записи истории старше неё уже
+    лежат в архиве (её использует RatesStorage при чтении горячей части).
+
+    Запись — под lock(), блокировкой файла архива между потоками и
+    процессами. Читатели не блокируются: индекс подменяется атомарно и
+    ссылается только на записанные и сброшенные на диск чанки.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        codec: str = "lzma",
+        chunk_size: int = 4096,
+    ) -> None:
+        if codec not in ARCHIVE_CODECS:
+            raise ValueError(f"Неизвестный кодек архива: {codec}")
+        self._path = path
+        self._index_path = path.with_name(path.name + ".index.json")
+        self._codec = codec
+        self._chunk_size = chunk_size
+
+    def lock(self) -> ProcessLock:
+        """Блокировка записи архива (реентерабельная)."""
+        return LockManager().file(self._path)
+
+    # --- индекс ---
+
+    def _load_index(self) -> Dict[str, Any]:
+        if not self._index_path.exists():
+            return {"v": ARCHIVE_FORMAT_VERSION, "watermark": None, "chunks": []}
+        with open(self._index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+            if profiling.io_observers:
+                profiling.record_read(self._index_path, f.tell())
+        return index
+
+    def _save_index(self, index: Dict[str, Any]) -> None:
+        suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_path = self._index_path.with_name(f"{self._index_path.name}.{suffix}")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+            if profiling.io_observers:
+                profiling.record_write(self._index_path, f.tell())
+        tmp_path.replace(self._index_path)
+
+    def signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self._index_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def chunks(self) -> List[Dict[str, Any]]:
+        return self._load_index()["chunks"]
+
+    def watermark(self) -> Optional[str]:
+        """ISO-время: всё, что старше, уже в архиве (или None)."""
+        return self._load_index().get("watermark")
+
+    # --- запись ---
+
+    def append(
+        self,
+        entries: List[Dict[str, Any]],
+        watermark: Optional[str] = None,
+    ) -> int:
+        """Дописать записи новыми чанками и сдвинуть watermark.
+
+        Чанки пишутся в конец файла и fsync-аются до обновления индекса:
+        при сбое «хвост» без записи в индексе просто перезаписывается.
+        Вся последовательность (обрезка хвоста, запись, fsync, индекс) —
+        под lock(): параллельные записи не обрежут чужие чанки.
+        """
+        with self.lock():
+            return self._append_locked(entries, watermark)
+
+    def _append_locked(
+        self,
+        entries: List[Dict[str, Any]],
+        watermark: Optional[str],
+    ) -> int:
+        index = self._load_index()
+        compress, _ = _codec(self._codec)
+        end = 0
+        if index["chunks"]:
+            last = index["chunks"][-1]
+            end = last["offset"] + last["length"]
+
+        ordered = sorted(entries, key=lambda entry: _epoch_us(entry["timestamp"]))
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        mode = "r+b" if self._path.exists() else "wb"
+
+        with open(self._path, mode) as f:
+            f.truncate(end)
+            f.seek(end)
+            for start in range(0, len(ordered), self._chunk_size):
+                part = ordered[start:start + self._chunk_size]
+                raw = json.dumps(
+                    encode_chunk(part),
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                ).encode("utf-8")
+                payload = compress(raw)
+                f.write(payload)
+                if profiling.io_observers:
+                    profiling.record_write(self._path, len(payload))
+                index["chunks"].append(
+                    {
+                        "offset": end,
+                        "length": len(payload),
+                        "codec": self._codec,
+                        "count": len(part),
+                        "start": part[0]["timestamp"],
+                        "end": part[-1]["timestamp"],
+                        "start_us": _epoch_us(part[0]["timestamp"]),
+                        "end_us": _epoch_us(part[-1]["timestamp"]),
+                    }
+                )
+                end += len(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if watermark is not None:
+            current = index.get("watermark")
+            if current is None or _epoch_us(watermark) > _epoch_us(current):
+                index["watermark"] = watermark
+        self._save_index(index)
+        return len(ordered)
+
+    # --- чтение ---
+
+    def iter_entries(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Записи архива в диапазоне [start, end] (ISO-строки, включительно)."""
+        start_us = _epoch_us(start) if start else None
+        end_us = _epoch_us(end) if end else None
+        chunks = self.chunks()
+        if not chunks:
+            return
+
+        with open(self._path, "rb") as f:
+            for meta in chunks:
+                if start_us is not None and meta["end_us"] < start_us:
+                    continue
+                if end_us is not None and meta["start_us"] > end_us:
+                    continue
+                f.seek(meta["offset"])
+                _, decompress = _codec(meta["codec"])
+                payload = f.read(meta["length"])
+                if profiling.io_observers:
+                    profiling.record_read(self._path, len(payload))
+                chunk = json.loads(decompress(payload))
+                for entry in decode_chunk(chunk):
+                    ts = _epoch_us(entry["timestamp"])
+                    if start_us is not None and ts < start_us:
+                        continue
+                    if end_us is not None and ts > end_us:
+                        continue
+                    yield entry
+
+    def __len__(self) -> int:
+        return sum(chunk["count"] for chunk in self.chunks())
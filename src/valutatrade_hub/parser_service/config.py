@@ -33,7 +33,18 @@ class ParserConfig:
 
     # Пути к файлам
     RATES_FILE_PATH: Path
-    HISTORY_FILE_PATH: Path
+    HISTORY_FILE_PATH: Path  # единый файл истории (читается для миграции)
+
+    # История по сегментам и политика хранения
+    HISTORY_DIR_PATH: Path
+    HISTORY_SEGMENT_GRANULARITY: str
+    HISTORY_RETENTION_DAYS: int
+    HISTORY_RETENTION_ACTION: str
+
+    # Архив «холодной» истории
+    HISTORY_ARCHIVE_PATH: Path
+    HISTORY_ARCHIVE_CODEC: str
+    HISTORY_ARCHIVE_CHUNK_SIZE: int
 
     # Сетевые параметры
     REQUEST_TIMEOUT: int
@@ -57,6 +68,15 @@ class ParserConfig:
             },
             RATES_FILE_PATH=Path(settings.get("rates_file")),
             HISTORY_FILE_PATH=Path(settings.get("history_file")),
+            HISTORY_DIR_PATH=Path(settings.get("history_dir")),
+            HISTORY_SEGMENT_GRANULARITY=settings.get(
+                "history_segment_granularity"
+            ),
+            HISTORY_RETENTION_DAYS=settings.get("history_retention_days"),
+            HISTORY_RETENTION_ACTION=settings.get("history_retention_action"),
+            HISTORY_ARCHIVE_PATH=Path(settings.get("history_archive_file")),
+            HISTORY_ARCHIVE_CODEC=settings.get("history_archive_codec"),
+            HISTORY_ARCHIVE_CHUNK_SIZE=settings.get("history_archive_chunk_size"),
             REQUEST_TIMEOUT=10,
         )
 
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def _to_epoch(value: str | datetime) -> float:
+    """ISO-строка или datetime -> секунды UTC (naive считаем UTC)."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class HistoryIndex:
+    """Индекс истории курсов: по паре — отсортированные метки времени.
+
+    Для каждой пары хранятся параллельные массивы timestamps/rates,
+    упорядоченные по времени. Строится один раз по всей истории (записи
+    в файле не обязаны быть отсортированы), дальше дополняется при
+    добавлении новых записей. Запрос «курс на момент ts» — один bisect.
+    """
+
+    def __init__(self) -> None:
+        self._timestamps: Dict[str, List[float]] = {}
+        self._rates: Dict[str, List[float]] = {}
+
+    @classmethod
+    def build(cls, entries: Iterable[Dict[str, Any]]) -> "HistoryIndex":
+        index = cls()
+        rows: Dict[str, List[Tuple[float, float]]] = {}
+        for entry in entries:
+            pair = f"{entry['from_currency']}_{entry['to_currency']}"
+            rows.setdefault(pair, []).append(
+                (_to_epoch(entry["timestamp"]), float(entry["rate"]))
+            )
+        for pair, points in rows.items():
+            points.sort(key=lambda point: point[0])
+            index._timestamps[pair] = [ts for ts, _ in points]
+            index._rates[pair] = [rate for _, rate in points]
+        return index
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        """Добавить запись истории (обычно — в конец массива пары)."""
+        pair = f"{entry['from_currency']}_{entry['to_currency']}"
+        ts = _to_epoch(entry["timestamp"])
+        timestamps = self._timestamps.setdefault(pair, [])
+        rates = self._rates.setdefault(pair, [])
+        if not timestamps or ts >= timestamps[-1]:
+            timestamps.append(ts)
+            rates.append(float(entry["rate"]))
+            return
+        idx = bisect_right(timestamps, ts)
+        timestamps.insert(idx, ts)
+        rates.insert(idx, float(entry["rate"]))
+
+    def extend(self, entries: Iterable[Dict[str, Any]]) -> None:
+        for entry in entries:
+            self.add(entry)
+
+    def rate_at(
+        self,
+        pair: str,
+        moment: datetime,
+    ) -> Optional[Tuple[float, datetime]]:
+        """Последний известный курс пары не позже moment (или None)."""
+        timestamps = self._timestamps.get(pair)
+        if not timestamps:
+            return None
+        idx = bisect_right(timestamps, _to_epoch(moment)) - 1
+        if idx < 0:
+            return None
+        observed_at = datetime.fromtimestamp(timestamps[idx], tz=timezone.utc)
+        return self._rates[pair][idx], observed_at
+
+    def pairs(self) -> List[str]:
+        return sorted(self._timestamps)
+
+    def __len__(self) -> int:
+        return sum(len(timestamps) for timestamps in self._timestamps.values())
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .. import profiling
+from ..infra.jsonstream import iter_json_file
+from ..infra.locks import LockManager, ProcessLock
+
+MANIFEST_VERSION = 1
+SEGMENT_PREFIX = "exchange_rates-"
+
+
+def parse_ts(value: str) -> datetime:
+    """ISO-строка -> UTC-aware datetime (naive считаем UTC)."""
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def segment_period(
+    moment: datetime,
+    granularity: str,
+) -> Tuple[str, datetime, datetime]:
+    """Ключ сегмента и его границы [start, end) для момента времени."""
+    moment = moment.astimezone(timezone.utc)
+    if granularity == "daily":
+        start = datetime(moment.year, moment.month, moment.day, tzinfo=timezone.utc)
+        return start.strftime("%Y-%m-%d"), start, start + timedelta(days=1)
+
+    if granularity == "monthly":
+        start = datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+        if moment.month == 12:
+            end = datetime(moment.year + 1, 1, 1, tzinfo=timezone.utc)
+        else:
+            end = datetime(moment.year, moment.month + 1, 1, tzinfo=timezone.utc)
+        return start.strftime("%Y-%m"), start, end
+
+    raise ValueError(f"Неизвестная гранулярность сегментов: {granularity}")
+
+
+class HistorySegments:
+    """История курсов, разбитая на сегменты по дням или месяцам.
+
+    Каждый сегмент — отдельный JSON-файл; manifest.json хранит для
+    каждого сегмента файл, границы периода и число записей. Запись
+    переписывает только затронутые сегменты, чтение диапазона открывает
+    только пересекающиеся с ним сегменты.
+
+    Изменения manifest и сегментов идут под lock() — блокировкой файла
+    manifest между потоками и процессами; читатели не блокируются:
+    файлы подменяются атомарно.
+    """
+
+    def __init__(self, directory: Path, granularity: str = "monthly") -> None:
+        self._dir = directory
+        self._manifest_path = directory / "manifest.json"
+        self._granularity = granularity
+        # проверяем настройку сразу, а не при первой записи
+        segment_period(datetime.now(timezone.utc), granularity)
+
+    @staticmethod
+    def _atomic_write(path: Path, data: Any) -> None:
+        suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_path = path.with_name(f"{path.name}.{suffix}")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            if profiling.io_observers:
+                profiling.record_write(path, f.tell())
+        tmp_path.replace(path)
+
+    # --- manifest ---
+
+    def lock(self) -> ProcessLock:
+        """Блокировка записи истории (реентерабельная)."""
+        return LockManager().file(self._manifest_path)
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        if not self._manifest_path.exists():
+            return {"v": MANIFEST_VERSION, "segments": {}}
+        with open(self._manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+            if profiling.io_observers:
+                profiling.record_read(self._manifest_path, f.tell())
+        return manifest
+
+    def signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self._manifest_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def segments(self) -> List[Dict[str, Any]]:
+        """Описания сегментов в хронологическом порядке."""
+        manifest = self._load_manifest()
+        items = [
+            dict(meta, key=key) for key, meta in manifest["segments"].items()
+        ]
+        return sorted(items, key=lambda meta: meta["period_start"])
+
+    def imported(self, name: str) -> Optional[List[int]]:
+        """Подпись файла name на момент его импорта в сегменты."""
+        return self._load_manifest().get("imported", {}).get(name)
+
+    def mark_imported(self, name: str, signature: List[int]) -> None:
+        with self.lock():
+            manifest = self._load_manifest()
+            manifest.setdefault("imported", {})[name] = signature
+            self._atomic_write(self._manifest_path, manifest)
+
+    # --- сегменты ---
+
+    def _segment_path(self, meta: Dict[str, Any]) -> Path:
+        return self._dir / meta["file"]
+
+    def load_segment(self, meta: Dict[str, Any]) -> List[Dict[str, Any]]:
+        path = self._segment_path(meta)
+        if not path.exists():
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+            if profiling.io_observers:
+                profiling.record_read(path, f.tell())
+        return entries
+
+    def iter_segment(self, meta: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Записи сегмента по одной; большой сегмент читается потоком."""
+        return iter_json_file(self._segment_path(meta))
+
+    def append(self, entries: List[Dict[str, Any]]) -> None:
+        """Разложить записи по сегментам; дубликаты по id пропускаются."""
+        if not entries:
+            return
+        by_key: Dict[str, List[Dict[str, Any]]] = {}
+        bounds: Dict[str, Tuple[datetime, datetime]] = {}
+        for entry in entries:
+            key, start, end = segment_period(
+                parse_ts(entry["timestamp"]),
+                self._granularity,
+            )
+            by_key.setdefault(key, []).append(entry)
+            bounds[key] = (start, end)
+
+        with self.lock():
+            self._dir.mkdir(parents=True, exist_ok=True)
+            manifest = self._load_manifest()
+
+            for key, new_entries in by_key.items():
+                meta = manifest["segments"].get(key)
+                if meta is None:
+                    start, end = bounds[key]
+                    meta = {
+                        "file": f"{SEGMENT_PREFIX}{key}.json",
+                        "period_start": start.isoformat(),
+                        "period_end": end.isoformat(),
+                        "count": 0,
+                    }
+                existing = self.load_segment(meta)
+                seen = {entry.get("id") for entry in existing}
+                for entry in new_entries:
+                    if entry.get("id") not in seen:
+                        existing.append(entry)
+                        seen.add(entry.get("id"))
+                self._atomic_write(self._segment_path(meta), existing)
+                meta["count"] = len(existing)
+                manifest["segments"][key] = meta
+
+            self._atomic_write(self._manifest_path, manifest)
+
+    def remove(self, keys: List[str]) -> None:
+        """Убрать сегменты из manifest и удалить их файлы."""
+        with self.lock():
+            manifest = self._load_manifest()
+            removed = [
+                manifest["segments"].pop(key)
+                for key in keys
+                if key in manifest["segments"]
+            ]
+            if not removed:
+                return
+            # сначала manifest: файл без записи в manifest никто не прочитает
+            self._atomic_write(self._manifest_path, manifest)
+            for meta in removed:
+                self._segment_path(meta).unlink(missing_ok=True)
+
+    def expired(self, older_than: datetime) -> List[Dict[str, Any]]:
+        """Сегменты, период которых целиком раньше older_than."""
+        return [
+            meta
+            for meta in self.segments()
+            if parse_ts(meta["period_end"]) <= older_than
+        ]
+
+    def iter_entries(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        skip_before: Optional[datetime] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Записи в диапазоне [start, end]; читаются только нужные сегменты.
+
+        skip_before — сегменты, закончившиеся не позже этого момента,
+        пропускаются целиком (они уже в архиве).
+        """
+        for meta in self.segments():
+            period_start = parse_ts(meta["period_start"])
+            period_end = parse_ts(meta["period_end"])
+            if skip_before is not None and period_end <= skip_before:
+                continue
+            if start is not None and period_end <= start:
+                continue
+            if end is not None and period_start > end:
+                continue
+
+            for entry in self.iter_segment(meta):
+                if start is None and end is None:
+                    yield entry
+                    continue
+                ts = parse_ts(entry["timestamp"])
+                if start is not None and ts < start:
+                    continue
+                if end is not None and ts > end:
+                    continue
+                yield entry
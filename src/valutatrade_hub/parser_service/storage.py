@@ -1,51 +1,268 @@
 from __future__ import annotations
 
 import json
+import os
+import threading
 from pathlib import Path
-from typing import Any, Dict, List
-from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 
+from .. import profiling
+from ..core.constants import HISTORY_MIGRATION_BATCH, HISTORY_RETENTION_ACTIONS
+from ..infra.changefeed import ChangeFeed, rates_change
+from ..infra.jsonstream import iter_json_file
+from ..infra.locks import LockManager
+from ..tracing import cache_hit, cache_miss, traced
+from .archive import HistoryArchive
 from .config import ParserConfig
+from .history_index import HistoryIndex
+from .segments import HistorySegments, parse_ts
+
+
+# Индексы истории, построенные в этом процессе: каталог -> (подпись, индекс).
+# Подпись (mtime_ns, size) manifest и архива позволяет заметить запись
+# из другого процесса.
+_HISTORY_INDEXES: Dict[Path, Tuple[Tuple[Any, ...], HistoryIndex]] = {}
 
 
 class RatesStorage:
-    """Хранилище для текущих курсов и истории измерений."""
+    """Хранилище для текущих курсов и истории измерений.
+
+    История пишется в сегменты по дням/месяцам (HistorySegments),
+    старые сегменты по политике хранения уходят в сжатый архив
+    (HistoryArchive) или удаляются. Старый единый файл истории
+    (exchange_rates.json, хранится в git) не изменяется: пока он не
+    импортирован в сегменты (import_single_file_history — при первой
+    записи истории или командой migrate-history), читатели видят его
+    записи вместе с сегментами.
+    """
 
     def __init__(self, config: ParserConfig) -> None:
         self._config = config
         self._rates_path: Path = config.RATES_FILE_PATH
         self._history_path: Path = config.HISTORY_FILE_PATH
+        self._history_dir: Path = config.HISTORY_DIR_PATH
         self._rates_path.parent.mkdir(parents=True, exist_ok=True)
-        self._history_path.parent.mkdir(parents=True, exist_ok=True)
+        self._segments = HistorySegments(
+            self._history_dir,
+            granularity=config.HISTORY_SEGMENT_GRANULARITY,
+        )
+        self._archive = HistoryArchive(
+            config.HISTORY_ARCHIVE_PATH,
+            codec=config.HISTORY_ARCHIVE_CODEC,
+            chunk_size=config.HISTORY_ARCHIVE_CHUNK_SIZE,
+        )
+        # подпись единого файла, импорт которого уже подтверждён manifest
+        self._imported_signature: Optional[List[int]] = None
 
     @staticmethod
     def _atomic_write(path: Path, data: Any) -> None:
-        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_path = path.with_name(f"{path.name}.{suffix}")
         with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
+            if profiling.io_observers:
+                profiling.record_write(path, f.tell())
         tmp_path.replace(path)
 
     # --- история ---
 
+    def _single_file_signature(self) -> Optional[List[int]]:
+        try:
+            stat = self._history_path.stat()
+        except FileNotFoundError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def _single_file_pending(self) -> bool:
+        """Единый файл истории есть и в этом виде ещё не импортирован."""
+        signature = self._single_file_signature()
+        if signature is None or signature == self._imported_signature:
+            return False
+        if signature == self._segments.imported(self._history_path.name):
+            self._imported_signature = signature
+            return False
+        return True
+
+    @traced()
+    def import_single_file_history(self) -> int:
+        """Разложить старый единый файл истории по сегментам; вернуть
+        число прочитанных записей (0 — импортировать нечего).
+
+        Файл читается потоком и раскладывается пачками: память не
+        зависит от размера истории. Сам файл не удаляется — в manifest
+        запоминается его подпись, и при изменении файла (например, после
+        git pull) импорт повторяется. Повтор безопасен: сегменты
+        пропускают записи с уже известным id.
+        """
+        with self._segments.lock():
+            if not self._single_file_pending():
+                return 0
+            signature = self._single_file_signature()
+            count = 0
+            batch: List[Dict[str, Any]] = []
+            for entry in iter_json_file(self._history_path):
+                batch.append(entry)
+                count += 1
+                if len(batch) >= HISTORY_MIGRATION_BATCH:
+                    self._segments.append(batch)
+                    batch = []
+            self._segments.append(batch)
+            self._segments.mark_imported(self._history_path.name, signature)
+            self._imported_signature = signature
+        return count
+
+    def iter_history(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Записи истории в диапазоне [start, end]: архив + сегменты.
+
+        Открываются только сегменты и чанки архива, пересекающие диапазон.
+        Ещё не импортированный единый файл истории читается потоком.
+        """
+        watermark = self._archive.watermark()
+        border = parse_ts(watermark) if watermark else None
+
+        if border is not None and (start is None or start < border):
+            yield from self._archive.iter_entries(
+                start.isoformat() if start else None,
+                end.isoformat() if end else None,
+            )
+        segment_entries = self._segments.iter_entries(start, end, skip_before=border)
+        if not self._single_file_pending():
+            yield from segment_entries
+            return
+
+        # импорт мог прерваться на середине: записи, уже попавшие в
+        # сегменты, не повторяются
+        seen = set()
+        for entry in iter_json_file(self._history_path):
+            ts = parse_ts(entry["timestamp"])
+            if (start is None or ts >= start) and (end is None or ts <= end):
+                seen.add(entry.get("id"))
+                yield entry
+        for entry in segment_entries:
+            if entry.get("id") not in seen:
+                yield entry
+
+    @traced()
     def load_history(self) -> List[Dict[str, Any]]:
-        if not self._history_path.exists():
-            return []
-        with open(self._history_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        """Вся история (прозрачно для читателя: архив + сегменты)."""
+        return list(self.iter_history())
 
+    @traced()
     def append_history_entries(self, entries: List[Dict[str, Any]]) -> None:
-        history = self.load_history()
-        history.extend(entries)
-        self._atomic_write(self._history_path, history)
+        with self._segments.lock():
+            # первая запись истории заодно импортирует единый файл
+            self.import_single_file_history()
+            cached = _HISTORY_INDEXES.get(self._history_dir)
+            index_is_fresh = (
+                cached is not None and cached[0] == self._history_signature()
+            )
+
+            # переписываются только сегменты, в которые попали записи
+            self._segments.append(entries)
+
+            # индекс не перестраиваем, а дополняем новыми записями
+            if index_is_fresh:
+                index = cached[1]
+                index.extend(entries)
+                _HISTORY_INDEXES[self._history_dir] = (
+                    self._history_signature(),
+                    index,
+                )
+
+    def history_segments(self) -> List[Dict[str, Any]]:
+        return self._segments.segments()
+
+    @traced()
+    def compact_history(
+        self,
+        older_than: Optional[datetime] = None,
+        action: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Применить политику хранения к сегментам старше older_than.
+
+        action: "archive" — перенести в сжатый архив, "drop" — удалить.
+        По умолчанию берутся HISTORY_RETENTION_DAYS/HISTORY_RETENTION_ACTION.
+        Сегменты обрабатываются по одному под блокировкой архива: две
+        компактизации (в том числе из разных процессов) не допишут один
+        сегмент дважды. Блокировка сегментов берётся только на удаление
+        сегмента, поэтому обновление курсов во время сжатия не ждёт.
+        Чтение корректно на любом шаге: сегменты, закончившиеся до
+        watermark архива, пропускаются.
+        """
+        action = action or self._config.HISTORY_RETENTION_ACTION
+        if action not in HISTORY_RETENTION_ACTIONS:
+            raise ValueError(f"Неизвестное действие хранения: {action}")
+        if older_than is None:
+            older_than = datetime.now(timezone.utc) - timedelta(
+                days=self._config.HISTORY_RETENTION_DAYS
+            )
+        if older_than.tzinfo is None:
+            older_than = older_than.replace(tzinfo=timezone.utc)
+
+        result = {"action": action, "segments": 0, "entries": 0}
+
+        for meta in self._segments.expired(older_than):
+            with self._archive.lock():
+                # сегмент мог уже обработать другой процесс
+                current = {item["key"] for item in self._segments.segments()}
+                if meta["key"] not in current:
+                    continue
+                watermark = self._archive.watermark()
+                already_archived = watermark is not None and parse_ts(
+                    meta["period_end"]
+                ) <= parse_ts(watermark)
+                if action == "archive" and not already_archived:
+                    entries = self._segments.load_segment(meta)
+                    result["entries"] += self._archive.append(
+                        entries,
+                        watermark=meta["period_end"],
+                    )
+                else:
+                    result["entries"] += meta.get("count", 0)
+
+                self._segments.remove([meta["key"]])
+            result["segments"] += 1
+
+        return result
+
+    def _history_signature(self) -> Tuple[Any, ...]:
+        return (
+            self._segments.signature(),
+            self._archive.signature(),
+            self._single_file_signature(),
+        )
+
+    @traced()
+    def history_index(self) -> HistoryIndex:
+        """Индекс истории по парам (строится один раз на процесс)."""
+        signature = self._history_signature()
+        cached = _HISTORY_INDEXES.get(self._history_dir)
+        if cached is not None and cached[0] == signature:
+            cache_hit()
+            return cached[1]
+        cache_miss()
+        index = HistoryIndex.build(self.iter_history())
+        _HISTORY_INDEXES[self._history_dir] = (signature, index)
+        return index
 
     # --- текущие курсы (кэш для Core Service) ---
 
+    @traced()
     def load_current_rates(self) -> Dict[str, Any]:
         if not self._rates_path.exists():
             return {}
         with open(self._rates_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+            data = json.load(f)
+            if profiling.io_observers:
+                profiling.record_read(self._rates_path, f.tell())
+        return data
 
+    @traced()
     def save_current_rates(
         self,
         pairs: Dict[str, Dict[str, Any]],
@@ -59,4 +276,10 @@ class RatesStorage:
                 "source": info["source"],
             }
         snapshot["last_refresh"] = last_refresh.isoformat()
-        self._atomic_write(self._rates_path, snapshot)
+        # rates.json пишет и Core (DatabaseManager) — общая блокировка файла;
+        # изменившиеся пары — в ленту изменений, пока блокировка держится
+        with LockManager().file(self._rates_path):
+            event = rates_change(self.load_current_rates(), snapshot)
+            self._atomic_write(self._rates_path, snapshot)
+            if event is not None:
+                ChangeFeed().append([event])
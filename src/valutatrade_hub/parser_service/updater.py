@@ -3,7 +3,10 @@ from __future__ import annotations
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Any
 
-from ..logging_config import configure_logging
+import logging
+
+from ..logging_config import LOGGER_NAME, configure_logging
+from ..profiling import Profiler
 from .config import ParserConfig
 from .storage import RatesStorage
 from .api_clients import (
@@ -12,27 +15,37 @@ from .api_clients import (
     ExchangeRateApiClient,
 )
 from ..core.exceptions import ApiRequestError
+from ..core.usecases import execute_triggered_orders, fire_price_alerts
 
 
-logger = configure_logging()
+logger = logging.getLogger(LOGGER_NAME)
 
 
 class RatesUpdater:
     """Координация обновления курсов с нескольких источников."""
 
     def __init__(self, config: ParserConfig) -> None:
+        configure_logging()
         self._config = config
         self._storage = RatesStorage(config)
         self._clients: List[BaseApiClient] = [
             CoinGeckoClient(config),
             ExchangeRateApiClient(config),
         ]
+        # профилирование по VALUTATRADE_PROFILE (для запуска вне CLI)
+        self._profiler = Profiler.from_env()
 
     def run_update(self, source_filter: Optional[str] = None) -> Dict[str, Any]:
         """Основной сценарий обновления курсов.
 
         source_filter: "coingecko", "exchangerate" или None.
         """
+        if self._profiler is None:
+            return self._run_update(source_filter)
+        with self._profiler.profile("update-rates"):
+            return self._run_update(source_filter)
+
+    def _run_update(self, source_filter: Optional[str]) -> Dict[str, Any]:
         logger.info("Starting rates update...")
         all_pairs: Dict[str, Dict[str, Any]] = {}
         history_entries: List[Dict[str, Any]] = []
@@ -46,18 +59,19 @@ class RatesUpdater:
                 # пропускаем, если фильтр не совпадает
                 continue
 
-            logger.info(f"Fetching from {client.source_name}...")
+            logger.info("Fetching from %s...", client.source_name)
             try:
                 client_result = client.fetch_rates()
             except ApiRequestError as exc:
                 msg = f"Failed to fetch from {client.source_name}: {exc}"
-                logger.error(msg)
+                logger.error("%s", msg)
                 errors.append(msg)
                 continue
 
             logger.info(
-                f"Fetching from {client.source_name} OK "
-                f"({len(client_result)} rates)"
+                "Fetching from %s OK (%d rates)",
+                client.source_name,
+                len(client_result),
             )
 
             for pair_key, info in client_result.items():
@@ -75,6 +89,8 @@ class RatesUpdater:
                 }
                 history_entries.append(entry)
 
+        previous_rates = self._current_rate_values()
+
         if all_pairs:
             self._storage.save_current_rates(all_pairs, last_refresh=now)
             self._storage.append_history_entries(history_entries)
@@ -86,13 +102,62 @@ class RatesUpdater:
         else:
             logger.warning("No rates were updated.")
 
+        executed_orders = self._match_limit_orders(all_pairs)
+        fired_alerts = self._fire_alerts(previous_rates, all_pairs)
+
         result: Dict[str, Any] = {
             "total_rates": len(all_pairs),
             "last_refresh": now,
             "errors": errors,
+            "executed_orders": executed_orders,
+            "fired_alerts": fired_alerts,
         }
         if errors:
             logger.info("Update completed with errors.")
         else:
             logger.info("Update successful.")
         return result
+
+    def _match_limit_orders(
+        self,
+        pairs: Dict[str, Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """Исполнить лимитные заявки, пересечённые новыми курсами."""
+        if not pairs:
+            return []
+        rates = {pair: float(info["rate"]) for pair, info in pairs.items()}
+        executed = execute_triggered_orders(rates)
+        for report in executed:
+            logger.info(
+                "Limit order #%s %s %s %s @ %s: %s",
+                report["order_id"],
+                report["side"],
+                report["amount"],
+                report["currency_code"],
+                report["trigger_rate"],
+                report["status"],
+            )
+        return executed
+
+    def _current_rate_values(self) -> Dict[str, float]:
+        """Курсы из кеша до обновления: {"BTC_USD": 91804.0, ...}."""
+        data = self._storage.load_current_rates()
+        return {
+            pair: float(info["rate"])
+            for pair, info in data.items()
+            if isinstance(info, dict) and "rate" in info
+        }
+
+    def _fire_alerts(
+        self,
+        previous_rates: Dict[str, float],
+        pairs: Dict[str, Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """Отправить в outbox уведомления, пороги которых пересечены."""
+        if not pairs or not previous_rates:
+            return []
+        rates = {pair: float(info["rate"]) for pair, info in pairs.items()}
+        fired = fire_price_alerts(previous_rates, rates)
+        if fired:
+            logger.info("Fired %d price alerts.", len(fired))
+        return fired
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+)
+
+from .core.constants import (
+    PROFILE_DIR,
+    PROFILE_ENV,
+    PROFILE_MODES,
+    PROFILE_TOP_ALLOCATIONS,
+    PROFILE_TOP_FUNCTIONS,
+)
+
+# cProfile, pstats и tracemalloc импортируются только при включённом
+# профилировании: без него модуль — это флаг и пустой список подписчиков.
+
+
+class IoCounters:
+    """Файловый ввод-вывод за время профилируемой команды, по файлам."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.files: Dict[str, Dict[str, int]] = {}
+
+    def record(self, path: Any, kind: str, nbytes: int) -> None:
+        """kind: "read" или "write"."""
+        with self._lock:
+            counters = self.files.get(str(path))
+            if counters is None:
+                counters = self.files[str(path)] = {
+                    "reads": 0,
+                    "writes": 0,
+                    "bytes_read": 0,
+                    "bytes_written": 0,
+                }
+            if kind == "write":
+                counters["writes"] += 1
+                counters["bytes_written"] += nbytes
+            else:
+                counters["reads"] += 1
+                counters["bytes_read"] += nbytes
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            files = sorted(
+                ({"path": path, **counters} for path, counters in self.files.items()),
+                key=lambda item: -(item["bytes_read"] + item["bytes_written"]),
+            )
+        totals = {
+            key: sum(item[key] for item in files)
+            for key in ("reads", "writes", "bytes_read", "bytes_written")
+        }
+        return {**totals, "files": files}
+
+
+# Подписчики на события ввода-вывода: (путь, "read" | "write", байты).
+# Места чтения и записи проверяют список сами (if profiling.io_observers:),
+# чтобы без подписчиков не тратить даже вызов функции. Подписываются
+# профиль в режиме io и трассировка запросов (tracing.py).
+IoObserver = Callable[[Any, str, int], None]
+io_observers: List[IoObserver] = []
+
+_active = False
+_active_lock = threading.Lock()
+
+
+def record_read(path: Any, nbytes: int) -> None:
+    for observer in tuple(io_observers):
+        observer(path, "read", nbytes)
+
+
+def record_write(path: Any, nbytes: int) -> None:
+    for observer in tuple(io_observers):
+        observer(path, "write", nbytes)
+
+
+def parse_modes(value: Optional[str]) -> FrozenSet[str]:
+    """'all', '1' или список режимов через запятую -> множество режимов."""
+    value = (value or "").strip().lower()
+    if value in {"", "0", "off", "no", "false"}:
+        return frozenset()
+    if value in {"1", "all", "on", "yes", "true"}:
+        return frozenset(PROFILE_MODES)
+    modes = frozenset(part.strip() for part in value.split(",") if part.strip())
+    unknown = modes.difference(PROFILE_MODES)
+    if unknown:
+        raise ValueError(
+            f"Неизвестный режим профилирования: {', '.join(sorted(unknown))} "
+            f"(доступны: {', '.join(PROFILE_MODES)}, all)"
+        )
+    return modes
+
+
+def _format_bytes(value: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(value) < 1024:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GiB"
+
+
+class Profiler:
+    """Профилирование отдельных команд по запросу.
+
+    Режимы: cpu — cProfile, статистика сохраняется в .pstats (смотреть
+    через python -m pstats или snakeviz); memory — tracemalloc, пик и
+    крупнейшие живые выделения памяти; io — число и объём чтений и
+    записей файлов в DatabaseManager и RatesStorage. Для каждой команды
+    в output_dir пишется JSON-отчёт, краткая сводка — в report (stderr).
+
+    Вложенные вызовы profile() (update-rates внутри CLI) и параллельные
+    команды других потоков не профилируются повторно: активен один
+    профиль на процесс.
+    """
+
+    def __init__(
+        self,
+        modes: Iterable[str] = PROFILE_MODES,
+        output_dir: Path = PROFILE_DIR,
+        report: Optional[TextIO] = None,
+    ) -> None:
+        self.modes = frozenset(modes)
+        self.output_dir = Path(output_dir)
+        self._report = report
+
+    @classmethod
+    def from_env(cls) -> Optional["Profiler"]:
+        """Профайлер по переменной VALUTATRADE_PROFILE; None, если не задана."""
+        modes = parse_modes(os.getenv(PROFILE_ENV))
+        return cls(modes) if modes else None
+
+    @contextmanager
+    def profile(self, label: str) -> Iterator[None]:
+        global _active
+        with _active_lock:
+            nested, _active = _active, True
+        if nested:
+            yield
+            return
+        try:
+            yield from self._profile(label)
+        finally:
+            _active = False
+
+    def _profile(self, label: str) -> Iterator[None]:
+        cpu = None
+        counters: Optional[IoCounters] = None
+        tracing = False
+        if "cpu" in self.modes:
+            import cProfile
+
+            cpu = cProfile.Profile()
+        if "memory" in self.modes:
+            import tracemalloc
+
+            tracing = not tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.start()
+            else:
+                tracemalloc.reset_peak()
+            memory_start = tracemalloc.get_traced_memory()[0]
+        if "io" in self.modes:
+            counters = IoCounters()
+            io_observers.append(counters.record)
+
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        if cpu is not None:
+            cpu.enable()
+        try:
+            yield
+        finally:
+            if cpu is not None:
+                cpu.disable()
+            elapsed = time.perf_counter() - started
+
+            report: Dict[str, Any] = {
+                "command": label,
+                "started_at": started_at.isoformat(),
+                "elapsed_ms": round(elapsed * 1000, 3),
+                "pid": os.getpid(),
+            }
+            if "memory" in self.modes:
+                report["memory"] = self._memory_report(memory_start, tracing)
+            if counters is not None:
+                io_observers.remove(counters.record)
+                report["io"] = counters.to_dict()
+            self._save(label, started_at, report, cpu)
+
+    @staticmethod
+    def _memory_report(memory_start: int, started_tracing: bool) -> Dict[str, Any]:
+        import tracemalloc
+
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*"),
+            )
+        )
+        if started_tracing:
+            tracemalloc.stop()
+        top = [
+            {
+                "where": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_bytes": stat.size,
+                "count": stat.count,
+            }
+            for stat in snapshot.statistics("lineno")[:PROFILE_TOP_ALLOCATIONS]
+        ]
+        return {
+            "start_bytes": memory_start,
+            "end_bytes": current,
+            "peak_bytes": peak,
+            "peak_delta_bytes": peak - memory_start,
+            "top_allocations": top,
+        }
+
+    @staticmethod
+    def _top_functions(cpu: Any) -> List[Dict[str, Any]]:
+        import pstats
+
+        stats = pstats.Stats(cpu)
+        rows = sorted(
+            stats.stats.items(),  # type: ignore[attr-defined]
+            key=lambda item: item[1][3],
+            reverse=True,
+        )
+        return [
+            {
+                "function": f"{Path(filename).name}:{lineno}({name})",
+                "calls": calls,
+                "tottime_ms": round(tottime * 1000, 3),
+                "cumtime_ms": round(cumtime * 1000, 3),
+            }
+            for (filename, lineno, name), (_, calls, tottime, cumtime, _) in rows[
+                :PROFILE_TOP_FUNCTIONS
+            ]
+        ]
+
+    def _save(
+        self,
+        label: str,
+        started_at: datetime,
+        report: Dict[str, Any],
+        cpu: Any,
+    ) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        safe_label = re.sub(r"[^\w-]+", "_", label) or "command"
+        stem = f"{started_at:%Y%m%dT%H%M%S%f}-{safe_label}-{os.getpid()}"
+        if cpu is not None:
+            pstats_path = self.output_dir / f"{stem}.pstats"
+            cpu.dump_stats(pstats_path)
+            report["pstats"] = str(pstats_path)
+            report["top_functions"] = self._top_functions(cpu)
+        report_path = self.output_dir / f"{stem}.json"
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(self._summary(report, report_path), file=self._report or sys.stderr)
+
+    @staticmethod
+    def _summary(report: Dict[str, Any], report_path: Path) -> str:
+        parts = [f"[profile] {report['command']} {report['elapsed_ms']:.1f} ms"]
+        if "memory" in report:
+            memory = report["memory"]
+            parts.append(f"пик памяти +{_format_bytes(memory['peak_delta_bytes'])}")
+        if "io" in report:
+            io = report["io"]
+            parts.append(
+                f"чтений {io['reads']} ({_format_bytes(io['bytes_read'])}), "
+                f"записей {io['writes']} ({_format_bytes(io['bytes_written'])})"
+            )
+        parts.append(f"отчёт: {report_path}")
+        return "; ".join(parts)
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from .core.constants import TRACING_ENABLED
+from .logging_config import LOGGER_NAME, configure_logging
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class SpanStats:
+    """Накопленные показатели одного вида участков (по имени) в запросе."""
+
+    __slots__ = (
+        "calls",
+        "seconds",
+        "reads",
+        "writes",
+        "bytes_read",
+        "bytes_written",
+        "cache_hits",
+        "cache_misses",
+    )
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.seconds = 0.0
+        self.reads = 0
+        self.writes = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def record_io(self, kind: str, nbytes: int) -> None:
+        if kind == "write":
+            self.writes += 1
+            self.bytes_written += nbytes
+        else:
+            self.reads += 1
+            self.bytes_read += nbytes
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "duration_ms": round(self.seconds * 1000, 3),
+            "reads": self.reads,
+            "writes": self.writes,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+
+
+class Trace:
+    """Трассировка одного запроса (команды CLI или запроса HTTP API).
+
+    Участки с одинаковым именем складываются в один SpanStats: сводка
+    остаётся короткой, даже если команда читает портфель в цикле.
+    Ввод-вывод и обращения к кешу относятся к самому внутреннему
+    открытому участку и к запросу в целом (totals).
+    """
+
+    def __init__(self, name: str, request_id: str) -> None:
+        self.name = name
+        self.request_id = request_id
+        self.spans: Dict[str, SpanStats] = {}
+        self.totals = SpanStats()
+
+    def span(self, name: str) -> SpanStats:
+        stats = self.spans.get(name)
+        if stats is None:
+            stats = self.spans[name] = SpanStats()
+        return stats
+
+    def summary(self, seconds: float) -> Dict[str, Any]:
+        self.totals.calls = 1
+        self.totals.seconds = seconds
+        return {
+            "command": self.name,
+            **self.totals.to_dict(),
+            "spans": {name: stats.to_dict() for name, stats in self.spans.items()},
+        }
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("valutatrade_trace", default=None)
+_span: ContextVar[Optional[SpanStats]] = ContextVar(
+    "valutatrade_span", default=None
+)
+
+_hook_lock = threading.Lock()
+_hook_installed = False
+
+
+def new_request_id() -> str:
+    return os.urandom(8).hex()
+
+
+def current_request_id() -> Optional[str]:
+    trace = _trace.get()
+    return trace.request_id if trace is not None else None
+
+
+def _record_io(path: Any, kind: str, nbytes: int) -> None:
+    trace = _trace.get()
+    if trace is None:
+        return
+    trace.totals.record_io(kind, nbytes)
+    span = _span.get()
+    if span is not None:
+        span.record_io(kind, nbytes)
+
+
+def _install_io_hook() -> None:
+    global _hook_installed
+    with _hook_lock:
+        if not _hook_installed:
+            # модуль профилирования (список подписчиков ввода-вывода)
+            # загружается с первым запросом, а не при импорте
+            from . import profiling
+
+            profiling.io_observers.append(_record_io)
+            _hook_installed = True
+
+
+def cache_hit() -> None:
+    """Данные взяты из кеша (без чтения и разбора файла)."""
+    trace = _trace.get()
+    if trace is None:
+        return
+    trace.totals.cache_hits += 1
+    span = _span.get()
+    if span is not None:
+        span.cache_hits += 1
+
+
+def cache_miss() -> None:
+    trace = _trace.get()
+    if trace is None:
+        return
+    trace.totals.cache_misses += 1
+    span = _span.get()
+    if span is not None:
+        span.cache_misses += 1
+
+
+@contextmanager
+def request(name: str, request_id: Optional[str] = None) -> Iterator[Optional[Trace]]:
+    """Трассировать запрос; по завершении — одна сводная запись в журнал.
+
+    Сводка (длительность, чтения и записи, байты, попадания в кеш, по
+    участкам) пишется в журнал операций полем trace, с тем же
+    request_id, что и записи @log_action внутри запроса; в консоль она
+    не выводится. Вложенный request() (команда
+    внутри уже трассируемого запроса) не начинает новую трассировку.
+    """
+    if not TRACING_ENABLED or _trace.get() is not None:
+        yield _trace.get()
+        return
+    _install_io_hook()
+    trace = Trace(name, request_id or new_request_id())
+    token = _trace.set(trace)
+    started = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        elapsed = time.perf_counter() - started
+        _trace.reset(token)
+        configure_logging()
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "%s TRACE",
+                name,
+                extra={"request_id": trace.request_id, "trace": trace.summary(elapsed)},
+            )
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Декоратор участка трассировки: длительность, ввод-вывод, кеш.
+
+    Вне трассируемого запроса — одна проверка contextvar и прямой вызов.
+    Имя по умолчанию: «модуль.функция» или «Класс.метод».
+    """
+
+    def decorator(func: Callable) -> Callable:
+        qualname = func.__qualname__
+        span_name = name or (
+            qualname
+            if "." in qualname
+            else f"{func.__module__.rsplit('.', 1)[-1]}.{qualname}"
+        )
+
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            trace = _trace.get()
+            if trace is None:
+                return func(*args, **kwargs)
+            stats = trace.span(span_name)
+            stats.calls += 1
+            token = _span.set(stats)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.seconds += time.perf_counter() - started
+                _span.reset(token)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import logging
+from typing import Callable, Iterator
+
+import pytest
+
+from valutatrade_hub.infra.changefeed import ChangeFeed
+from valutatrade_hub.infra.database import DatabaseManager
+from valutatrade_hub.infra.locks import LockManager
+from valutatrade_hub.infra.settings import SettingsLoader
+from valutatrade_hub.logging_config import configure_logging
+from valutatrade_hub.metrics import MetricsRegistry
+
+STORAGE_ENV = "VALUTATRADE_PORTFOLIO_STORAGE"
+# порядок важен только для читаемости: все пересоздаются при первом обращении
+SINGLETONS = (SettingsLoader, LockManager, ChangeFeed, DatabaseManager, MetricsRegistry)
+
+
+def _restart() -> DatabaseManager:
+    """Забыть синглтоны, как при новом запуске процесса, и открыть хранилище.
+
+    Новый DatabaseManager при создании дописывает прерванные коммиты и
+    отрезает недописанные хвосты журналов — как после падения процесса.
+    """
+    for cls in SINGLETONS:
+        cls._instance = None
+    return DatabaseManager()
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch) -> Iterator:
+    """Каждый тест — в пустом каталоге: data/ и logs/ создаются в нём."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv(STORAGE_ENV, raising=False)
+    configure_logging().setLevel(logging.WARNING)
+    _restart()
+    yield tmp_path
+    for cls in SINGLETONS:
+        cls._instance = None
+
+
+@pytest.fixture(params=["snapshot", "journal"])
+def storage(request, monkeypatch) -> str:
+    """Прогнать тест в обоих режимах хранения портфелей."""
+    monkeypatch.setenv(STORAGE_ENV, request.param)
+    _restart()
+    return request.param
+
+
+@pytest.fixture
+def restart() -> Callable[[], DatabaseManager]:
+    """Перезапуск «процесса»: restart() -> свежий DatabaseManager."""
+    return _restart
+
+
+@pytest.fixture
+def no_backoff(monkeypatch) -> None:
+    """Повторы сделок без пауз."""
+    from valutatrade_hub.core import usecases
+
+    monkeypatch.setattr(usecases.time, "sleep", lambda seconds: None)
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import pytest
+
+from valutatrade_hub.core import usecases
+from valutatrade_hub.infra.database import DatabaseManager
+
+
+@pytest.fixture
+def users():
+    return (
+        usecases.register_user("alice", "password123"),
+        usecases.register_user("bob", "password123"),
+    )
+
+
+def test_fired_alerts_are_journaled_without_rewriting_snapshot(users, restart):
+    alice, bob = users
+    usecases.create_price_alert(alice, "BTC", "above", 60000.0)
+    usecases.create_price_alert(bob, "BTC", "above", 70000.0)
+    db = DatabaseManager()
+    snapshot = db.alerts_file.read_bytes()
+
+    fired = usecases.fire_price_alerts({"BTC_USD": 50000.0}, {"BTC_USD": 65000.0})
+
+    assert [note["user_id"] for note in fired] == [alice.user_id]
+    assert db.alerts_file.read_bytes() == snapshot
+    assert usecases.list_price_alerts(alice) == []
+
+    restart()
+    assert usecases.list_price_alerts(alice) == []
+    assert len(usecases.list_price_alerts(bob)) == 1
+
+
+def test_rate_update_without_crossings_reads_nothing(users, monkeypatch):
+    alice, _ = users
+    usecases.create_price_alert(alice, "BTC", "above", 60000.0)
+    usecases.list_price_alerts(alice)  # наполнить кеш подписок
+    db = DatabaseManager()
+
+    def fail(path):
+        raise AssertionError(f"перечитан снимок {path}")
+
+    monkeypatch.setattr(db, "_read_books_snapshot", fail)
+    assert usecases.fire_price_alerts({"BTC_USD": 50000.0}, {"BTC_USD": 55000.0}) == []
+
+
+def test_notifications_are_taken_per_user(users):
+    alice, bob = users
+    usecases.create_price_alert(alice, "BTC", "below", 40000.0)
+    usecases.create_price_alert(bob, "BTC", "below", 45000.0)
+    usecases.fire_price_alerts({"BTC_USD": 50000.0}, {"BTC_USD": 30000.0})
+    db = DatabaseManager()
+    bob_outbox = db.alerts_outbox_dir / f"user-{bob.user_id}.jsonl"
+    before = bob_outbox.read_bytes()
+
+    notes = usecases.take_alert_notifications(alice)
+
+    assert [note["threshold"] for note in notes] == [40000.0]
+    assert usecases.take_alert_notifications(alice) == []
+    assert bob_outbox.read_bytes() == before
+    assert len(usecases.take_alert_notifications(bob)) == 1
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import json
+
+from valutatrade_hub.parser_service.archive import (
+    HistoryArchive,
+    decode_chunk,
+    encode_chunk,
+)
+
+
+def _entry(pair: str, rate: float, moment: str, source: str = "test") -> dict:
+    base, quote = pair.split("_")
+    return {
+        "id": f"{pair}_{moment}",
+        "from_currency": base,
+        "to_currency": quote,
+        "rate": rate,
+        "timestamp": moment,
+        "source": source,
+        "meta": {"raw": rate} if source == "meta" else {},
+    }
+
+
+ENTRIES = [
+    _entry("BTC_USD", 50000.0, "2025-01-01T00:00:00+00:00"),
+    _entry("BTC_USD", 50000.0, "2025-01-01T00:00:01.000500+00:00"),
+    _entry("BTC_USD", 50000.0, "2025-01-01T00:05:00+00:00"),
+    _entry("BTC_USD", 50500.0, "2025-01-01T01:00:00+00:00"),
+    _entry("BTC_USD", 50500.0, "2025-01-01T02:00:00+00:00", source="other"),
+    _entry("ETH_USD", 3000.0, "2025-01-01T00:00:00+00:00", source="meta"),
+    _entry("ETH_USD", 3000.0, "2025-01-02T00:00:00+00:00", source="meta"),
+]
+
+
+def _by_id(entries) -> dict:
+    return {entry["id"]: entry for entry in entries}
+
+
+def test_chunk_round_trip():
+    # порядок записей не важен: внутри пары они сортируются по времени
+    chunk = json.loads(json.dumps(encode_chunk(list(reversed(ENTRIES)))))
+
+    assert _by_id(decode_chunk(chunk)) == _by_id(ENTRIES)
+
+
+def test_chunk_stores_time_deltas_and_rate_runs():
+    chunk = encode_chunk(ENTRIES)
+    btc = chunk["pairs"]["BTC_USD"]
+    eth = chunk["pairs"]["ETH_USD"]
+
+    assert btc["dt"] == [1_000_500, 298_999_500, 3_300_000_000, 3_600_000_000]
+    # одинаковые курс, источник и meta подряд — один run
+    assert [(run[0], run[3]) for run in btc["runs"]] == [
+        (50000.0, 3),
+        (50500.0, 1),
+        (50500.0, 1),
+    ]
+    assert [run[3] for run in eth["runs"]] == [2]
+    assert chunk["sources"] == ["test", "other", "meta"]
+
+
+def test_archive_round_trip_across_chunks(tmp_path):
+    archive = HistoryArchive(tmp_path / "archive.bin", codec="zlib", chunk_size=2)
+
+    assert archive.append(ENTRIES) == len(ENTRIES)
+
+    assert len(archive.chunks()) == 4
+    assert _by_id(archive.iter_entries()) == _by_id(ENTRIES)
+    # границы диапазона включительно
+    selected = archive.iter_entries(
+        "2025-01-01T00:05:00+00:00", "2025-01-01T02:00:00+00:00"
+    )
+    assert sorted(entry["timestamp"] for entry in selected) == [
+        "2025-01-01T00:05:00+00:00",
+        "2025-01-01T01:00:00+00:00",
+        "2025-01-01T02:00:00+00:00",
+    ]
+
+
+def test_watermark_only_moves_forward(tmp_path):
+    archive = HistoryArchive(tmp_path / "archive.bin", codec="zlib")
+    assert archive.watermark() is None
+
+    archive.append(ENTRIES[:2], watermark="2025-01-01T12:00:00+00:00")
+    archive.append(ENTRIES[2:4], watermark="2025-01-01T06:00:00+00:00")
+    assert archive.watermark() == "2025-01-01T12:00:00+00:00"
+
+    archive.append(ENTRIES[4:])
+    assert archive.watermark() == "2025-01-01T12:00:00+00:00"
+
+    archive.append([], watermark="2025-01-02T00:00:00Z")
+    assert archive.watermark() == "2025-01-02T00:00:00Z"
+    # новый объект читает то же с диска
+    reopened = HistoryArchive(tmp_path / "archive.bin", codec="zlib")
+    assert reopened.watermark() == "2025-01-02T00:00:00Z"
+    assert len(reopened) == len(ENTRIES)
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from valutatrade_hub.core.alerts import AlertBook, PriceAlert
+from valutatrade_hub.core.orders import LimitOrder, OrderBook
+
+
+def _order_book(*orders) -> OrderBook:
+    book = OrderBook("BTC_USD")
+    for order_id, side, price in orders:
+        book.add(LimitOrder(order_id, 1, side, "BTC", 1.0, price))
+    return book
+
+
+def _alert_book(*alerts) -> AlertBook:
+    book = AlertBook("BTC_USD")
+    for alert_id, direction, threshold in alerts:
+        book.add(PriceAlert(alert_id, 1, "BTC", direction, threshold))
+    return book
+
+
+def _ids(items, attr: str) -> list:
+    return sorted(getattr(item, attr) for item in items)
+
+
+def test_orders_at_limit_price_are_triggered_on_both_sides():
+    book = _order_book(
+        (1, "buy", 99.0),
+        (2, "buy", 100.0),
+        (3, "buy", 100.0),
+        (4, "buy", 101.0),
+        (5, "sell", 99.0),
+        (6, "sell", 100.0),
+        (7, "sell", 101.0),
+    )
+
+    # buy — курс <= лимита, sell — курс >= лимита, равенство включительно
+    assert _ids(book.pop_triggered(100.0), "order_id") == [2, 3, 4, 5, 6]
+    assert _ids(book.orders(), "order_id") == [1, 7]
+    assert book.pop_triggered(100.0) == []
+
+
+def test_most_aggressive_orders_come_first():
+    book = _order_book((1, "buy", 100.0), (2, "buy", 105.0), (3, "sell", 90.0))
+
+    assert [o.order_id for o in book.pop_triggered(100.0)] == [2, 1, 3]
+
+
+def test_alert_above_fires_for_old_exclusive_new_inclusive():
+    book = _alert_book(
+        (1, "above", 100.0),
+        (2, "above", 101.0),
+        (3, "above", 102.0),
+        (4, "above", 102.0),
+        (5, "above", 103.0),
+        (6, "below", 101.0),
+    )
+
+    # old < threshold <= new
+    assert _ids(book.pop_fired(100.0, 102.0), "alert_id") == [2, 3, 4]
+    assert _ids(book.alerts(), "alert_id") == [1, 5, 6]
+
+
+def test_alert_below_fires_for_new_inclusive_old_exclusive():
+    book = _alert_book(
+        (1, "below", 97.0),
+        (2, "below", 98.0),
+        (3, "below", 98.0),
+        (4, "below", 99.0),
+        (5, "below", 100.0),
+        (6, "above", 99.0),
+    )
+
+    # new <= threshold < old
+    assert _ids(book.pop_fired(100.0, 98.0), "alert_id") == [2, 3, 4]
+    assert _ids(book.alerts(), "alert_id") == [1, 5, 6]
+
+
+def test_unchanged_rate_fires_nothing():
+    book = _alert_book((1, "above", 100.0), (2, "below", 100.0))
+
+    assert book.pop_fired(100.0, 100.0) == []
+    assert len(book) == 2
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import pytest
+
+from valutatrade_hub.core import usecases
+from valutatrade_hub.core.exceptions import BulkImportError
+from valutatrade_hub.infra.database import DatabaseManager
+from valutatrade_hub.metrics import MetricsRegistry
+
+USER = {"username": "alice", "hashed_password": "ab" * 32, "salt": "s"}
+# вторая строка повторяет имя первой
+ROWS = [(2, dict(USER)), (3, dict(USER))]
+
+
+def test_rejected_import_raises_with_report_and_counts_as_error():
+    db = DatabaseManager()
+    before = list(db.iter_users_raw())
+
+    with pytest.raises(BulkImportError) as info:
+        usecases.import_records("users", ROWS)
+
+    report = info.value.report
+    assert (report["invalid"], report["imported"]) == (1, 0)
+    assert report["errors"][0]["line"] == 3
+    assert "batches" in report and "seconds" in report
+    assert list(db.iter_users_raw()) == before
+    histogram = MetricsRegistry().collect()["IMPORT"]
+    assert (histogram.ok, histogram.errors) == (0, 1)
+
+
+def test_clean_import_counts_as_success():
+    report = usecases.import_records("users", ROWS[:1])
+
+    assert report["imported"] == 1
+    histogram = MetricsRegistry().collect()["IMPORT"]
+    assert (histogram.ok, histogram.errors) == (1, 0)
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from valutatrade_hub.infra.changefeed import ChangeConsumer, ChangeFeed, change_event
+
+
+def _events(*values) -> list:
+    return [change_event("test", {"n": value}) for value in values]
+
+
+def _values(events) -> list:
+    return [event["data"]["n"] for event in events]
+
+
+def test_offsets_grow_by_one_across_appends_and_restart(restart):
+    feed = ChangeFeed()
+
+    assert feed.append(_events(1, 2)) == 2
+    assert feed.append(_events(3), tx="tx-1") == 3
+
+    events, _ = feed.read()
+    assert [event["offset"] for event in events] == [1, 2, 3]
+    assert [event.get("tx") for event in events] == [None, None, "tx-1"]
+    assert _values(feed.read(after=2)[0]) == [3]
+
+    restart()
+    feed = ChangeFeed()
+    assert feed.last_offset() == 3
+    assert feed.append(_events(4)) == 4
+
+
+def test_read_returns_position_after_last_event():
+    feed = ChangeFeed()
+    feed.append(_events(1, 2, 3))
+
+    events, position = feed.read(limit=2)
+    assert _values(events) == [1, 2]
+
+    rest, end = feed.read(after=2, position=position)
+    assert _values(rest) == [3]
+    assert end == feed.path.stat().st_size
+    # позиция за концом файла — чтение с начала
+    assert _values(feed.read(after=2, position=end + 100)[0]) == [3]
+
+
+def test_consumer_resumes_after_committed_offset(restart):
+    feed = ChangeFeed()
+    feed.append(_events(1, 2, 3, 4))
+    _, after_third = feed.read(limit=3)
+    consumer = ChangeConsumer("worker")
+
+    assert _values(consumer.poll(limit=2)) == [1, 2]
+    assert _values(consumer.poll(limit=1)) == [3]
+    consumer.commit()
+    assert consumer.offset == 3
+    assert consumer.lag() == 1
+
+    restart()
+    ChangeFeed().append(_events(5))
+    resumed = ChangeConsumer("worker")
+    # чтение продолжается с байтовой позиции за событием 3, а не с начала
+    assert resumed._position == after_third
+    assert _values(resumed.poll()) == [4, 5]
+
+
+def test_uncommitted_events_are_delivered_again(restart):
+    ChangeFeed().append(_events(1, 2))
+    consumer = ChangeConsumer("worker")
+    consumer.poll()
+
+    restart()
+    assert _values(ChangeConsumer("worker").poll()) == [1, 2]
+
+
+def test_explicit_commit_offset_rescans_from_start(restart):
+    ChangeFeed().append(_events(1, 2, 3))
+    consumer = ChangeConsumer("worker")
+    consumer.poll()
+    consumer.commit(offset=1)
+
+    restart()
+    resumed = ChangeConsumer("worker")
+    assert resumed.offset == 1
+    assert _values(resumed.poll()) == [2, 3]
+    # у другого потребителя своя позиция
+    assert _values(ChangeConsumer("audit").poll()) == [1, 2, 3]
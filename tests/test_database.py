@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import json
+import os
+
+import pytest
+
+from valutatrade_hub.core.exceptions import PortfolioConflictError
+from valutatrade_hub.infra.database import DatabaseManager
+
+RATES = {"BTC_USD": {"rate": 50000.0, "updated_at": "2025-01-01T00:00:00"}}
+PORTFOLIOS = [
+    {"user_id": 1, "version": 1, "wallets": {"BTC": {"balance": 1.0}}}
+]
+
+
+def _portfolio(user_id: int, version: int, balance: float) -> dict:
+    return {
+        "user_id": user_id,
+        "version": version,
+        "wallets": {"BTC": {"balance": balance}},
+    }
+
+
+def _crash_on(monkeypatch, predicate) -> None:
+    """os.replace падает (как процесс) на первом вызове, где predicate(src)."""
+    real_replace = os.replace
+    crashed = []
+
+    def replace(src, dst):
+        if not crashed and predicate(str(src)):
+            crashed.append(src)
+            raise OSError("simulated crash")
+        return real_replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", replace)
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _leftovers(db: DatabaseManager):
+    return sorted(p.name for p in db.data_dir.iterdir() if ".tx-" in p.name)
+
+
+def test_commit_interrupted_after_journal_is_finished_on_restart(
+    monkeypatch, restart
+):
+    db = DatabaseManager()
+    # точка фиксации пройдена (журнал записан), файлы ещё не подменены
+    _crash_on(monkeypatch, lambda src: src.endswith(".tmp"))
+    with pytest.raises(OSError):
+        with db.transaction():
+            db.save_rates_raw(RATES)
+            db.save_portfolios_raw(PORTFOLIOS)
+    assert not db.rates_file.exists()
+    assert _leftovers(db)
+
+    db = restart()
+    assert _read(db.rates_file) == RATES
+    assert _read(db.portfolios_file) == PORTFOLIOS
+    assert _leftovers(db) == []
+
+
+def test_commit_interrupted_before_journal_is_rolled_back(monkeypatch):
+    db = DatabaseManager()
+    db.save_rates_raw(RATES)
+    _crash_on(monkeypatch, lambda src: src.endswith(".part"))
+    with pytest.raises(OSError):
+        with db.transaction():
+            db.save_rates_raw({})
+            db.save_portfolios_raw(PORTFOLIOS)
+    assert _read(db.rates_file) == RATES
+    assert not db.portfolios_file.exists()
+    assert _leftovers(db) == []
+
+
+def test_orphaned_temp_file_is_removed_on_restart(restart):
+    db = DatabaseManager()
+    db.save_rates_raw(RATES)
+    # процесс упал, записав временный файл, но не журнал коммита
+    orphan = db.rates_file.with_name(f"{db.rates_file.name}.tx-deadbeef.tmp")
+    orphan.write_text("{}", encoding="utf-8")
+
+    db = restart()
+    assert not orphan.exists()
+    assert db.load_rates_raw() == RATES
+
+
+def test_journal_is_replayed_on_top_of_snapshot(storage, restart):
+    db = DatabaseManager()
+    db.save_portfolios_raw([_portfolio(1, 1, 1.0), _portfolio(2, 1, 5.0)])
+    db.save_portfolio_raw(_portfolio(1, 2, 2.0), expected_version=1)
+    db.save_portfolio_raw(_portfolio(1, 3, 3.0), expected_version=2)
+
+    db = restart()
+    assert db.load_portfolio_raw(1) == _portfolio(1, 3, 3.0)
+    assert db.load_portfolio_raw(2) == _portfolio(2, 1, 5.0)
+    if storage == "journal":
+        # снимок не переписывался: изменения живут только в журнале
+        stored = {item["user_id"]: item for item in _read(db.portfolios_file)}
+        assert stored[1]["version"] == 1
+
+
+def test_stale_journal_records_are_skipped_after_snapshot(monkeypatch, restart):
+    monkeypatch.setenv("VALUTATRADE_PORTFOLIO_STORAGE", "journal")
+    db = restart()
+    db.save_portfolios_raw([_portfolio(1, 1, 1.0)])
+    db.save_portfolio_raw(_portfolio(1, 2, 2.0), expected_version=1)
+    journal = db.data_dir / "portfolios.journal"
+    records = journal.read_bytes()
+    assert records
+
+    # падение между записью снимка и очисткой журнала
+    db.snapshot_portfolios()
+    db.save_portfolio_raw(_portfolio(1, 3, 3.0), expected_version=2)
+    db.snapshot_portfolios()
+    journal.write_bytes(records)
+
+    db = restart()
+    assert db.load_portfolio_raw(1) == _portfolio(1, 3, 3.0)
+
+
+def test_torn_journal_tail_is_dropped(monkeypatch, restart):
+    monkeypatch.setenv("VALUTATRADE_PORTFOLIO_STORAGE", "journal")
+    db = restart()
+    db.save_portfolios_raw([_portfolio(1, 1, 1.0)])
+    db.save_portfolio_raw(_portfolio(1, 2, 2.0), expected_version=1)
+    journal = db.data_dir / "portfolios.journal"
+    with open(journal, "ab") as f:
+        f.write(b'{"u": 1, "v": 3, "w": {"BTC"')
+
+    db = restart()
+    assert db.load_portfolio_raw(1) == _portfolio(1, 2, 2.0)
+    assert journal.read_bytes().endswith(b"\n")
+
+
+def test_save_with_stale_version_conflicts(storage):
+    db = DatabaseManager()
+    db.save_portfolios_raw([_portfolio(1, 1, 1.0)])
+    db.save_portfolio_raw(_portfolio(1, 2, 2.0), expected_version=1)
+    with pytest.raises(PortfolioConflictError):
+        db.save_portfolio_raw(_portfolio(1, 2, 9.0), expected_version=1)
+    assert db.load_portfolio_raw(1) == _portfolio(1, 2, 2.0)
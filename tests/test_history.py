@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import json
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+from valutatrade_hub.parser_service import storage as storage_module
+from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.storage import RatesStorage
+
+
+def _entry(pair: str, rate: float, moment: str) -> dict:
+    base, quote = pair.split("_")
+    return {
+        "id": f"{pair}_{moment}",
+        "from_currency": base,
+        "to_currency": quote,
+        "rate": rate,
+        "timestamp": moment,
+        "source": "test",
+        "meta": {},
+    }
+
+
+SEED = [
+    _entry("BTC_USD", 50000.0, "2025-01-01T00:00:00+00:00"),
+    _entry("BTC_USD", 51000.0, "2025-01-02T00:00:00+00:00"),
+]
+
+
+@pytest.fixture
+def history(monkeypatch):
+    """Хранилище истории с исходным единым файлом, как в репозитории."""
+    # индексы истории кешируются на процесс по относительному пути каталога
+    monkeypatch.setattr(storage_module, "_HISTORY_INDEXES", {})
+    config = ParserConfig.from_env()
+    config.HISTORY_FILE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    config.HISTORY_FILE_PATH.write_text(json.dumps(SEED), encoding="utf-8")
+    return config
+
+
+def _ids(entries) -> list:
+    return sorted(entry["id"] for entry in entries)
+
+
+def test_reads_see_single_file_without_changing_it(history):
+    seed = history.HISTORY_FILE_PATH.read_bytes()
+    storage = RatesStorage(history)
+
+    assert _ids(storage.iter_history()) == _ids(SEED)
+    moment = datetime(2025, 1, 1, 12, tzinfo=timezone.utc)
+    assert storage.history_index().rate_at("BTC_USD", moment)[0] == 50000.0
+
+    assert history.HISTORY_FILE_PATH.read_bytes() == seed
+    assert storage.history_segments() == []
+
+
+def test_first_write_imports_single_file_once(history):
+    storage = RatesStorage(history)
+    new = _entry("BTC_USD", 52000.0, "2025-01-03T00:00:00+00:00")
+
+    storage.append_history_entries([new])
+
+    assert history.HISTORY_FILE_PATH.exists()
+    assert _ids(storage.iter_history()) == _ids(SEED + [new])
+    assert sum(meta["count"] for meta in storage.history_segments()) == 3
+    assert RatesStorage(history).import_single_file_history() == 0
+
+
+def test_partial_import_is_not_read_twice(history):
+    storage = RatesStorage(history)
+    # импорт прервался: первая запись уже в сегментах, подпись не записана
+    storage._segments.append(SEED[:1])
+
+    assert _ids(storage.iter_history()) == _ids(SEED)
+    assert storage.import_single_file_history() == len(SEED)
+    assert _ids(storage.iter_history()) == _ids(SEED)
+
+
+def test_parallel_compactions_archive_each_segment_once(history):
+    storage = RatesStorage(history)
+    old = [
+        _entry("ETH_USD", 3000.0 + day, f"2024-0{month}-{day:02d}T00:00:00+00:00")
+        for month in (1, 2, 3)
+        for day in range(1, 11)
+    ]
+    storage.append_history_entries(old)
+    cutoff = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+    results = []
+    workers = [
+        threading.Thread(
+            target=lambda: results.append(
+                RatesStorage(history).compact_history(cutoff, action="archive")
+            )
+        )
+        for _ in range(2)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sum(result["entries"] for result in results) == len(old)
+    assert len(storage._archive) == len(old)
+    assert _ids(storage.iter_history()) == _ids(SEED + old)
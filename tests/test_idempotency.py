@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import pytest
+
+from valutatrade_hub.core import usecases
+from valutatrade_hub.core.exceptions import IdempotencyKeyInUseError
+from valutatrade_hub.core.idempotency import IdempotencyCache
+from valutatrade_hub.core.utils import load_portfolio_for_user
+from valutatrade_hub.infra.database import DatabaseManager
+
+REQUEST = {"action": "buy", "currency": "BTC", "amount": 1.0, "base_currency": "USD"}
+
+
+def _state(db: DatabaseManager):
+    """Содержимое всех файлов данных: повтор не должен ничего менять."""
+    return {
+        path.name: path.read_bytes()
+        for path in sorted(db.data_dir.iterdir())
+        if path.is_file()
+    }
+
+
+@pytest.fixture
+def user():
+    return usecases.register_user("alice", "password123")
+
+
+def test_replay_returns_stored_result_without_writes(storage, user):
+    first = usecases.buy_currency(user, "BTC", 1.0, idempotency_key="k1")
+    db = DatabaseManager()
+    before = _state(db)
+
+    again = usecases.buy_currency(user, "BTC", 1.0, idempotency_key="k1")
+
+    assert again == first
+    assert _state(db) == before
+    assert load_portfolio_for_user(user).wallets["BTC"].balance == 1.0
+
+
+def test_replay_survives_restart(restart, user):
+    first = usecases.buy_currency(user, "BTC", 1.0, idempotency_key="k1")
+    restart()
+    assert usecases.buy_currency(user, "BTC", 1.0, idempotency_key="k1") == first
+    assert load_portfolio_for_user(user).wallets["BTC"].balance == 1.0
+
+
+def test_same_key_for_another_request_is_rejected(user):
+    usecases.buy_currency(user, "BTC", 1.0, idempotency_key="k1")
+    with pytest.raises(ValueError):
+        usecases.buy_currency(user, "BTC", 2.0, idempotency_key="k1")
+
+
+def test_failed_trade_releases_key(user):
+    usecases.buy_currency(user, "BTC", 1.0)
+    with pytest.raises(ValueError, match="Недостаточно средств"):
+        usecases.sell_currency(user, "BTC", 2.0, idempotency_key="k1")
+    # ключ свободен: с ним можно выполнить и другую сделку
+    result = usecases.buy_currency(user, "BTC", 1.0, idempotency_key="k1")
+    assert result["new_balance"] == 2.0
+
+
+def test_pending_key_is_in_use_until_it_expires():
+    cache = IdempotencyCache(pending_seconds=60)
+    cache.put(1, "k1", REQUEST, None, now=1000.0)
+    with pytest.raises(IdempotencyKeyInUseError):
+        cache.get(1, "k1", REQUEST, now=1030.0)
+    # отметка брошена упавшим процессом — ключ снова свободен
+    assert cache.get(1, "k1", REQUEST, now=1061.0) is None
+
+
+def test_keys_are_scoped_per_user():
+    cache = IdempotencyCache()
+    cache.put(1, "k1", REQUEST, {"new_balance": 1.0}, now=1000.0)
+    assert cache.get(2, "k1", REQUEST, now=1000.0) is None
+    assert cache.get(1, "k1", REQUEST, now=1000.0) == {"new_balance": 1.0}
+
+
+def test_keyed_trades_update_stored_keys_in_place(user):
+    usecases.buy_currency(user, "BTC", 1.0, idempotency_key="k1")
+    db = DatabaseManager()
+    entries = db.load_idempotency_entries()
+
+    usecases.buy_currency(user, "BTC", 1.0, idempotency_key="k2")
+
+    assert db.load_idempotency_entries() is entries
+    assert list(entries) == [f"{user.user_id}:k1", f"{user.user_id}:k2"]
+
+
+def test_evicted_keys_stay_evicted_after_restart(restart, user, monkeypatch):
+    wrap = IdempotencyCache.wrap
+    monkeypatch.setattr(
+        IdempotencyCache,
+        "wrap",
+        classmethod(lambda cls, entries: wrap(entries, max_keys=2)),
+    )
+    for key in ("k1", "k2", "k3"):
+        usecases.buy_currency(user, "BTC", 1.0, idempotency_key=key)
+
+    db = restart()
+    assert list(db.load_idempotency_entries()) == [
+        f"{user.user_id}:k2",
+        f"{user.user_id}:k3",
+    ]
+
+
+def test_expired_keys_are_removed_and_reported():
+    cache = IdempotencyCache(ttl_seconds=100)
+    cache.put(1, "k1", REQUEST, {"new_balance": 1.0}, now=1000.0)
+    cache.put(1, "k2", REQUEST, {"new_balance": 2.0}, now=1050.0)
+    # k1 поднят в конец LRU, но его возраст считается от записи
+    assert cache.get(1, "k1", REQUEST, now=1060.0) == {"new_balance": 1.0}
+
+    assert cache.get(1, "k1", REQUEST, now=1101.0) is None
+    assert cache.take_removed() == ["1:k1"]
+    assert cache.evict_expired(now=1151.0) == 1
+    assert cache.take_removed() == ["1:k2"]
+    assert len(cache) == 0
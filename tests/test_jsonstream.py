@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import io
+import json
+
+import pytest
+
+from valutatrade_hub.infra.jsonstream import (
+    iter_json_array,
+    iter_json_elements,
+    iter_json_file,
+)
+
+ITEMS = [123456, -1.5e-7, "строка ünicode", {"a": [1.25, None]}, True, None, []]
+
+
+def _stream(text: str, chunk_size: int) -> list:
+    return list(iter_json_array(io.BytesIO(text.encode("utf-8")), chunk_size))
+
+
+def test_values_straddling_chunk_boundaries():
+    text = json.dumps(ITEMS, ensure_ascii=False)
+    # каждый размер блока режет числа, строки и многобайтные символы по-своему
+    for chunk_size in range(1, len(text.encode("utf-8")) + 2):
+        assert _stream(text, chunk_size) == ITEMS, chunk_size
+
+
+def test_whitespace_and_commas_at_boundaries():
+    text = " \n[ 1 ,\n\t22 , \r\n 333\n ]  \n"
+    for chunk_size in range(1, len(text) + 1):
+        assert _stream(text, chunk_size) == [1, 22, 333], chunk_size
+
+
+@pytest.mark.parametrize("text", ["[]", "  [ \n ]  "])
+def test_empty_array(text):
+    for chunk_size in (1, 2, 64):
+        assert _stream(text, chunk_size) == []
+
+
+@pytest.mark.parametrize("text", ["[1, 2", "[1, 2,", '[1, {"a": ', "[", "[1 2]"])
+def test_truncated_or_broken_array_is_rejected(text):
+    for chunk_size in (1, 3, 64):
+        with pytest.raises(ValueError):
+            _stream(text, chunk_size)
+
+
+@pytest.mark.parametrize("text", ['{"a": [1]}', "42", '"[1]"', ""])
+def test_non_array_top_level_is_rejected(text):
+    with pytest.raises(ValueError):
+        _stream(text, 4)
+    # небольшой файл разбирается целиком — та же ошибка
+    data = text.encode("utf-8")
+    with pytest.raises(ValueError):
+        list(iter_json_elements(io.BytesIO(data), len(data)))
+
+
+def test_missing_file_yields_nothing(tmp_path):
+    assert list(iter_json_file(tmp_path / "missing.json")) == []
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from valutatrade_hub.core import usecases
+from valutatrade_hub.core.constants import TRADE_MAX_RETRIES, TRADE_RETRY_ACTION
+from valutatrade_hub.core.exceptions import PortfolioConflictError
+from valutatrade_hub.core.utils import load_portfolio_for_user, save_portfolio
+from valutatrade_hub.infra.database import DatabaseManager
+from valutatrade_hub.metrics import MetricsRegistry
+
+
+def _retries():
+    return MetricsRegistry().collect().get(TRADE_RETRY_ACTION)
+
+
+def _balance(user, code="BTC") -> float:
+    wallet = load_portfolio_for_user(user).wallets.get(code)
+    return wallet.balance if wallet is not None else 0.0
+
+
+def test_conflict_is_retried_and_counted(no_backoff):
+    attempts = []
+
+    def operation():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise PortfolioConflictError(1, expected=1, actual=2)
+        return {"ok": True}
+
+    assert usecases._retry_on_conflict(operation) == {"ok": True}
+    assert len(attempts) == 3
+    retries = _retries()
+    assert (retries.ok, retries.errors) == (2, 0)
+
+
+def test_exhausted_retries_raise(no_backoff):
+    def operation():
+        raise PortfolioConflictError(1, expected=1, actual=2)
+
+    with pytest.raises(PortfolioConflictError):
+        usecases._retry_on_conflict(operation)
+    retries = _retries()
+    assert (retries.ok, retries.errors) == (TRADE_MAX_RETRIES - 1, 1)
+
+
+def test_version_is_checked_again_at_commit(storage):
+    user = usecases.register_user("alice", "password123")
+    db = DatabaseManager()
+    concurrent = threading.Thread(
+        target=usecases.buy_currency, args=(user, "BTC", 1.0)
+    )
+
+    with pytest.raises(PortfolioConflictError):
+        with db.transaction():
+            portfolio = load_portfolio_for_user(user)
+            portfolio.add_currency("ETH").deposit(5.0)
+            save_portfolio(portfolio)
+            # другой поток успевает закоммитить сделку того же пользователя
+            concurrent.start()
+            concurrent.join()
+
+    portfolio = load_portfolio_for_user(user)
+    assert "ETH" not in portfolio.wallets
+    assert portfolio.wallets["BTC"].balance == 1.0
+
+
+def test_trade_retries_after_commit_conflict(storage, no_backoff, monkeypatch):
+    user = usecases.register_user("alice", "password123")
+    usecases.buy_currency(user, "BTC", 1.0)
+    real_record_change = usecases.record_change
+    interfered = []
+
+    def record_change(kind, data):
+        # первая попытка: портфель меняется между расчётом и коммитом
+        if not interfered:
+            interfered.append(kind)
+            thread = threading.Thread(
+                target=usecases.buy_currency, args=(user, "BTC", 2.0)
+            )
+            thread.start()
+            thread.join()
+        real_record_change(kind, data)
+
+    monkeypatch.setattr(usecases, "record_change", record_change)
+    result = usecases.buy_currency(user, "BTC", 0.5)
+
+    assert result["old_balance"] == 3.0
+    assert _balance(user) == 3.5
+    assert _retries().ok == 1